@@ -1,4 +1,5 @@
 from .local_manager import LocalContainerManager
+from .async_manager import AsyncLocalContainerManager
 from .models import BrowserSession
 from .sdk import MarinaboxSDK
 from .langgraph import mb_start_computer, mb_stop_computer, mb_use_computer_tool, mb_start_browser, mb_stop_browser, mb_use_browser_tool
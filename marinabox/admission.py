@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Union
+
+from .pool import _summarize
+
+_UNITS = {"b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_bytes(value: Union[int, str]) -> int:
+    """Convert a docker-style size such as 512m or 2g to bytes"""
+    if isinstance(value, int):
+        return value
+    value = value.strip().lower()
+    if value and value[-1] in _UNITS:
+        return int(float(value[:-1]) * _UNITS[value[-1]])
+    return int(value)
+
+
+@dataclass
+class ResourceProfile:
+    """Resource limits applied to every container of an env_type"""
+    cpus: float
+    mem_limit: Union[int, str]
+    shm_size: Union[int, str]
+    pids_limit: int
+
+    @property
+    def memory_bytes(self) -> int:
+        return parse_bytes(self.mem_limit)
+
+    def run_kwargs(self) -> dict:
+        """Keyword arguments for docker-py's containers.run"""
+        return {
+            "nano_cpus": int(self.cpus * 1e9),
+            "mem_limit": self.mem_limit,
+            "shm_size": self.shm_size,
+            "pids_limit": self.pids_limit,
+        }
+
+    def host_config(self) -> dict:
+        """HostConfig fields for the Docker Engine API"""
+        return {
+            "NanoCpus": int(self.cpus * 1e9),
+            "Memory": self.memory_bytes,
+            "ShmSize": parse_bytes(self.shm_size),
+            "PidsLimit": self.pids_limit,
+        }
+
+
+DEFAULT_RESOURCE_PROFILES: Dict[str, ResourceProfile] = {
+    "browser": ResourceProfile(cpus=1.0, mem_limit="2g", shm_size="1g", pids_limit=1024),
+    "desktop": ResourceProfile(cpus=2.0, mem_limit="4g", shm_size="1g", pids_limit=2048),
+}
+
+
+class AdmissionError(RuntimeError):
+    """Raised when a container cannot be admitted within the host's capacity"""
+
+
+class Admission:
+    """Capacity held for a container that is starting, released once it is accounted for elsewhere"""
+
+    def __init__(self, controller: "AdmissionController", profile: ResourceProfile, wait_seconds: float):
+        self.controller = controller
+        self.profile = profile
+        self.wait_seconds = wait_seconds
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Admits new containers only while the host has uncommitted CPU and memory.
+
+    Committed capacity is the resource profiles of everything usage() reports
+    (running sessions and warm pool containers) plus admissions that are still
+    starting. Requests that do not fit wait in FIFO order for up to queue_timeout
+    seconds and are then rejected with AdmissionError.
+    """
+
+    def __init__(
+        self,
+        total_cpus: float,
+        total_memory: int,
+        usage: Callable[[], Iterable[ResourceProfile]],
+        overcommit: float = 1.0,
+        queue_timeout: float = 60.0,
+        max_queued: int = 64,
+        poll_interval: float = 1.0,
+        latency_window: int = 1000
+    ):
+        """
+        Args:
+            total_cpus: CPUs available to containers
+            total_memory: Bytes of memory available to containers
+            usage: Returns the profiles of containers already running
+            overcommit: Factor applied to the host totals, e.g. 1.5 to allow 50% oversubscription
+            queue_timeout: Seconds a request may wait for capacity, 0 to reject immediately
+            max_queued: Requests beyond this many waiters are rejected immediately
+            poll_interval: Seconds between re-checks of usage while waiting, to notice
+                capacity freed by other processes
+        """
+        self.total_cpus = total_cpus
+        self.total_memory = total_memory
+        self.usage = usage
+        self.overcommit = overcommit
+        self.queue_timeout = queue_timeout
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self._condition = threading.Condition()
+        self._pending: List[Admission] = []
+        self._queue: Deque[object] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self._waits: Deque[float] = deque(maxlen=latency_window)
+
+    @classmethod
+    def from_docker(cls, client, usage: Callable[[], Iterable[ResourceProfile]], **kwargs) -> "AdmissionController":
+        """Build a controller sized to the Docker host's NCPU and MemTotal"""
+        info = client.info()
+        return cls(info["NCPU"], info["MemTotal"], usage, **kwargs)
+
+    @property
+    def cpu_capacity(self) -> float:
+        return self.total_cpus * self.overcommit
+
+    @property
+    def memory_capacity(self) -> float:
+        return self.total_memory * self.overcommit
+
+    def _committed(self) -> tuple[float, int]:
+        profiles = list(self.usage()) + [admission.profile for admission in self._pending]
+        return sum(p.cpus for p in profiles), sum(p.memory_bytes for p in profiles)
+
+    def _fits(self, profile: ResourceProfile) -> bool:
+        cpus, memory = self._committed()
+        return (
+            cpus + profile.cpus <= self.cpu_capacity
+            and memory + profile.memory_bytes <= self.memory_capacity
+        )
+
+    def admit(self, profile: ResourceProfile, timeout: Optional[float] = None) -> Admission:
+        """
+        Wait until the profile fits within the host's capacity and reserve it.
+
+        Raises:
+            AdmissionError: If the profile can never fit, the queue is full or the
+                wait exceeds the timeout
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        if profile.cpus > self.cpu_capacity or profile.memory_bytes > self.memory_capacity:
+            with self._condition:
+                self.rejected += 1
+            raise AdmissionError("Resource profile exceeds the host's total capacity")
+
+        started = time.monotonic()
+        deadline = started + timeout
+        ticket = object()
+        with self._condition:
+            if len(self._queue) >= self.max_queued:
+                self.rejected += 1
+                raise AdmissionError(f"Admission queue is full ({self.max_queued} waiting)")
+            self._queue.append(ticket)
+            try:
+                while not (self._queue[0] is ticket and self._fits(profile)):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        cpus, memory = self._committed()
+                        raise AdmissionError(
+                            f"Host capacity exhausted after waiting {time.monotonic() - started:.1f}s "
+                            f"({cpus:g}/{self.cpu_capacity:g} CPUs, "
+                            f"{memory / 1024 ** 3:.1f}/{self.memory_capacity / 1024 ** 3:.1f} GiB committed)"
+                        )
+                    self._condition.wait(min(remaining, self.poll_interval))
+            finally:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+
+            admission = Admission(self, profile, time.monotonic() - started)
+            self._pending.append(admission)
+            self.admitted += 1
+            self._waits.append(admission.wait_seconds)
+            return admission
+
+    def _release(self, admission: Admission):
+        with self._condition:
+            self._pending.remove(admission)
+            self._condition.notify_all()
+
+    def notify(self):
+        """Wake waiters after capacity was freed outside of an admission release"""
+        with self._condition:
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """Return committed and total capacity, queue length, admission counts and queue wait times"""
+        with self._condition:
+            cpus, memory = self._committed()
+            return {
+                "committed_cpus": cpus,
+                "committed_memory": memory,
+                "cpu_capacity": self.cpu_capacity,
+                "memory_capacity": self.memory_capacity,
+                "starting": len(self._pending),
+                "queued": len(self._queue),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "queue_wait": _summarize(self._waits),
+            }
@@ -1,25 +1,114 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
-from fastapi.responses import FileResponse, StreamingResponse
+from typing import Dict, List, Optional, Tuple
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pathlib import Path
 import os
+import re
 from datetime import datetime
 import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 
 # Add these imports to your existing imports
 from fastapi.responses import StreamingResponse
 import asyncio
-import aiofiles
 
+from marinabox.admission import AdmissionError
+from marinabox.lineindex import LineIndex
 from marinabox.local_manager import LocalContainerManager
+from marinabox.logtail import LogBroadcaster
 from marinabox.models import BrowserSession
+from marinabox.preview import STRIP_NAME, nearest_keyframe, thumbnail_name
+from marinabox.ranges import RangeFileResponse
+from marinabox.segments import PLAYLIST_NAME
 import uvicorn
 from .config import Config
 from .computer_use.cli import main as computer_use_main
 from samthropic import setup_output_directories, samthropic_agent, mb
 
-app = FastAPI(title="Marinabox API", root_path="/api")
+# Maximum number of blocking Docker / filesystem calls running at the same time
+API_WORKERS = int(os.environ.get("MARINABOX_API_WORKERS", "32"))
+# Largest page of console log lines returned by one request
+MAX_CONSOLE_LINES = 10000
+
+
+def parse_warm_pool(spec: Optional[str]) -> Optional[Dict[Tuple[str, str], int]]:
+    """Parse a warm pool spec like 'browser:1280x800x24=2,desktop:1280x800x24=1'"""
+    if not spec:
+        return None
+    sizes = {}
+    for entry in spec.split(","):
+        key, _, size = entry.strip().partition("=")
+        env_type, _, resolution = key.partition(":")
+        sizes[(env_type, resolution or "1280x800x24")] = int(size or 1)
+    return sizes
+
+
+def parse_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse an optional number of seconds from an environment variable"""
+    return float(value) if value else None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the process-wide manager, config and executor, and release them at shutdown"""
+    app.state.executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="marinabox-api")
+    app.state.config = Config()
+    app.state.console = LogBroadcaster()
+    loop = asyncio.get_running_loop()
+    app.state.manager = await loop.run_in_executor(
+        app.state.executor,
+        functools.partial(
+            LocalContainerManager,
+            warm_pool=parse_warm_pool(os.environ.get("MARINABOX_WARM_POOL")),
+            watch_events=True,
+            admission_timeout=float(os.environ.get("MARINABOX_ADMISSION_TIMEOUT", "60")),
+            overcommit=float(os.environ.get("MARINABOX_OVERCOMMIT", "1.0")),
+            idle_timeout=parse_seconds(os.environ.get("MARINABOX_IDLE_TIMEOUT")),
+            idle_ttl=parse_seconds(os.environ.get("MARINABOX_IDLE_TTL")),
+            resume_exports=True,
+            video_budget=os.environ.get("MARINABOX_VIDEO_BUDGET"),
+            video_max_age=parse_seconds(os.environ.get("MARINABOX_VIDEO_MAX_AGE")),
+            archive_after=parse_seconds(os.environ.get("MARINABOX_ARCHIVE_AFTER"))
+        )
+    )
+    try:
+        yield
+    finally:
+        app.state.console.close()
+        await loop.run_in_executor(app.state.executor, app.state.manager.close)
+        app.state.executor.shutdown(wait=True)
+
+
+app = FastAPI(title="Marinabox API", root_path="/api", lifespan=lifespan)
+
+
+@app.exception_handler(AdmissionError)
+async def admission_error_handler(request, exc: AdmissionError):
+    """The host is out of capacity for new sessions"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "10"})
+
+
+def get_manager() -> LocalContainerManager:
+    return app.state.manager
+
+
+def get_api_key() -> Optional[str]:
+    """Return the configured Anthropic key, re-reading the config file if it was set after startup"""
+    config = app.state.config
+    api_key = config.get_anthropic_key()
+    if not api_key:
+        config.config = config._load_config()
+        api_key = config.get_anthropic_key()
+    return api_key
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the bounded API executor instead of the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(app.state.executor, functools.partial(func, *args, **kwargs))
 
 # Add CORS middleware configuration
 app.add_middleware(
@@ -30,24 +119,18 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# manager = LocalContainerManager()
-
 # Store running samthropic processes
 samthropic_processes = {}
 
 def run_samthropic_session(session_id: str):
     """Run the samthropic agent for a session"""
     try:
-        # Set up logging
-        log_console = f"marinabox/data/console_logs/{session_id}.txt"
-        Path(log_console).parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(log_console, 'w') as f_session:
-            # Redirect stdout to file
-            import sys
-            original_stdout = sys.stdout
-            sys.stdout = f_session
-
+        # The agent's output goes to the structured log, which mirrors it to the console log
+        import sys
+        stream = get_manager().logs.stream(session_id, source="agent")
+        original_stdout = sys.stdout
+        sys.stdout = stream
+        try:
             # Initialize the agent state
             samthropic_agent.invoke({
                 "input_task": "", 
@@ -57,100 +140,280 @@ def run_samthropic_session(session_id: str):
                 "steps_taken_by_computer_guy": "",
                 "session_id": session_id
             }, {"recursion_limit": 500})
-
+        finally:
             # Restore stdout
             sys.stdout = original_stdout
+            stream.close()
 
     except Exception as e:
         print(f"Error in samthropic session: {e}")
 
 @app.post("/sessions", response_model=BrowserSession)
-async def create_session(env_type: str = "browser", resolution: str = "1280x800x24", tag: Optional[str] = None):
+async def create_session(env_type: str = "browser", resolution: str = "1280x800x24", tag: Optional[str] = None, recording_format: str = "mp4", recording: str = "full"):
     """Create a new session with specified environment type"""
-    manager = LocalContainerManager()
-    return manager.create_session(env_type=env_type, resolution=resolution, tag=tag)
+    try:
+        return await run_blocking(
+            get_manager().create_session, env_type=env_type, resolution=resolution, tag=tag,
+            recording_format=recording_format, recording=recording
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/sessions/batch", response_model=List[BrowserSession])
+async def create_sessions(count: int = Query(..., ge=1), env_type: str = "browser", resolution: str = "1280x800x24", tag: Optional[str] = None, max_workers: int = Query(8, ge=1), recording_format: str = "mp4", recording: str = "full"):
+    """Create several sessions concurrently"""
+    try:
+        return await run_blocking(
+            get_manager().create_sessions, count, env_type=env_type, resolution=resolution, tag=tag,
+            max_workers=max_workers, recording_format=recording_format, recording=recording
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/sessions/{session_id}/clone", response_model=List[BrowserSession])
+async def clone_session(session_id: str, count: int = Query(1, ge=1), tag: Optional[str] = None, max_workers: int = Query(8, ge=1)):
+    """Start sessions from a snapshot of a running browser session"""
+    manager = get_manager()
+    if not await run_blocking(manager.get_session, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        return await run_blocking(manager.clone_session, session_id, count, tag=tag, max_workers=max_workers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/admission")
+async def admission_stats():
+    """Committed host capacity, admission queue length and queue wait times"""
+    return get_manager().admission_stats()
+
+@app.get("/recording")
+async def recording_stats():
+    """Measured recorder CPU cost per recording profile"""
+    return await run_blocking(get_manager().recording_stats)
+
+@app.get("/retention")
+async def retention_stats():
+    """Recordings evicted and archived by the retention policy, bytes freed and throughput"""
+    return get_manager().retention_stats()
+
+@app.get("/logs/search")
+async def search_logs(
+    q: Optional[str] = None,
+    session_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    level: Optional[str] = None,
+    source: Optional[str] = None,
+    before: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Search the structured logs of all sessions, newest first.
+
+    q is a full-text query such as 'timeout AND click'; start and end bound the
+    record times. Pass the response's next as before to read the following page.
+    """
+    try:
+        records = await run_blocking(
+            get_manager().search_logs, query=q, session_id=session_id, start=start, end=end,
+            level=level, source=source, before=before, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"records": records, "next": records[-1]["id"] if len(records) == limit else None}
+
+@app.get("/logs/stats")
+async def log_stats():
+    """Structured log records written and dropped, flushes and rotations"""
+    return get_manager().log_stats()
+
+@app.get("/hosts")
+async def placement_stats():
+    """Docker hosts sessions are placed on, with their capacity and active sessions"""
+    return await run_blocking(get_manager().placement_stats)
 
 @app.get("/sessions", response_model=List[BrowserSession])
 async def list_sessions():
     """List all active sessions"""
-    manager = LocalContainerManager()
-    sessions = manager.list_sessions()
+    sessions = await run_blocking(get_manager().list_sessions)
     # Update runtime_seconds for each active session
-    for i, session in enumerate(sessions):
-        if session.status == "running":
-            sessions[i] = session.to_dict()
-
-    print(sessions)
+    sessions = [session.to_dict() for session in sessions]
     return sessions
 
 @app.get("/sessions/closed", response_model=List[BrowserSession])
 async def list_closed_sessions():
     """List all closed sessions"""
-    manager = LocalContainerManager()
-    return manager.list_closed_sessions()
+    return await run_blocking(get_manager().list_closed_sessions)
 
 @app.get("/sessions/{session_id}", response_model=BrowserSession)
 async def get_session(session_id: str):
     """Get details for a specific session"""
-    manager = LocalContainerManager()
-    session = manager.get_session(session_id)
+    session = await run_blocking(get_manager().get_session, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    if session.status == "running":
-        session.runtime_seconds = session.get_current_runtime()
-    return session
+    # Report the live runtime without mutating the shared session object
+    return session.to_dict()
 
 @app.delete("/sessions/{session_id}")
 async def stop_session(session_id: str):
-    """Stop a browser session"""
-    manager = LocalContainerManager()
-    success = manager.stop_session(session_id)
+    """Stop a browser session, returning once its compute is released; the recording is exported in the background"""
+    success = await run_blocking(get_manager().stop_session, session_id)
     if not success:
         raise HTTPException(status_code=404, detail="Session not found")
+    session = await run_blocking(get_manager().get_closed_session, session_id)
+    return {"status": "success", "export_status": session.export_status if session else None}
+
+@app.post("/sessions/{session_id}/pause")
+async def pause_session(session_id: str):
+    """Pause a running session"""
+    if not await run_blocking(get_manager().pause_session, session_id):
+        raise HTTPException(status_code=404, detail="Running session not found")
+    return {"status": "success"}
+
+@app.post("/sessions/{session_id}/resume")
+async def resume_session(session_id: str):
+    """Resume a paused session"""
+    if not await run_blocking(get_manager().resume_session, session_id):
+        raise HTTPException(status_code=404, detail="Paused session not found")
     return {"status": "success"}
 
 @app.get("/sessions/closed/{session_id}", response_model=BrowserSession)
 async def get_closed_session(session_id: str):
     """Get details for a specific closed session"""
-    manager = LocalContainerManager()
-    session = manager.get_closed_session(session_id)
+    session = await run_blocking(get_manager().get_closed_session, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Closed session not found")
     return session
 
-@app.get("/videos/{session_id}")
-async def get_session_video(session_id: str):
-    """Get the video recording for a session"""
-    manager = LocalContainerManager()
+# Session IDs and the file names ffmpeg gives HLS segments
+SAFE_NAME = re.compile(r"^[\w.-]+$")
+
+def find_video(session_id: str) -> Optional[Path]:
+    """MP4 recording of a session, in videos_path or wherever its closed session record points"""
+    manager = get_manager()
     video_path = manager.videos_path / f"{session_id}.mp4"
-    if not video_path.exists():
-        raise HTTPException(status_code=404, detail="Video not found")
+    if video_path.is_file():
+        return video_path
+    session = manager.get_closed_session(session_id)
+    if session and session.video_path and session.video_path.endswith(".mp4") and Path(session.video_path).is_file():
+        return Path(session.video_path)
+    return None
 
-    def iterfile():
-        with open(video_path, "rb") as file:
-            yield from file
+@app.api_route("/videos/{session_id}", methods=["GET", "HEAD"])
+async def get_session_video(session_id: str):
+    """Get the video recording for a session, with byte range and conditional request support"""
+    if not SAFE_NAME.match(session_id) or session_id.startswith("."):
+        raise HTTPException(status_code=404, detail="Video not found")
+    video_path = await run_blocking(find_video, session_id)
+    if video_path is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    await run_blocking(get_manager().record_view, session_id)
+    return RangeFileResponse(video_path, media_type="video/mp4", headers={"Cache-Control": "public, max-age=3600"})
 
-    # Get file size for Content-Length header
-    file_size = os.path.getsize(video_path)
+def get_segments_path(session_id: str) -> Path:
+    if not SAFE_NAME.match(session_id) or session_id.startswith("."):
+        raise HTTPException(status_code=404, detail="Recording not found")
+    return get_manager().get_segments_path(session_id)
 
-    headers = {
-        "Accept-Ranges": "bytes",
-        "Content-Length": str(file_size),
-        "Content-Type": "video/mp4",
-        "Cache-Control": "public, max-age=3600"
+@app.get("/videos/{session_id}/status")
+async def get_video_status(session_id: str):
+    """Export status of a session's recording: pending, copying, done or failed"""
+    manager = get_manager()
+    session = await run_blocking(manager.get_session, session_id)
+    if session is None:
+        session = await run_blocking(manager.get_closed_session, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {
+        "session_id": session.session_id,
+        "session_status": session.status,
+        "recording": session.recording,
+        "export_status": session.export_status,
+        "export_attempts": session.export_attempts,
+        "export_error": session.export_error,
+        "video_path": session.video_path if session.export_status == "done" else None,
     }
 
-    return StreamingResponse(
-        iterfile(),
-        headers=headers,
-        media_type="video/mp4"
+@app.get("/videos/{session_id}/hls/index.m3u8")
+async def get_session_playlist(session_id: str):
+    """HLS playlist of a segmented recording, growing while the session runs"""
+    playlist_path = get_segments_path(session_id) / PLAYLIST_NAME
+    try:
+        playlist = await run_blocking(playlist_path.read_bytes)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    await run_blocking(get_manager().record_view, session_id)
+    return Response(
+        content=playlist,
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@app.get("/videos/{session_id}/hls/{segment}")
+async def get_session_segment(session_id: str, segment: str):
+    """A segment of a segmented recording, which never changes once listed in the playlist"""
+    segment_path = get_segments_path(session_id) / segment
+    if not SAFE_NAME.match(segment) or segment.startswith(".") or not segment_path.is_file():
+        raise HTTPException(status_code=404, detail="Segment not found")
+    return FileResponse(
+        segment_path,
+        media_type="video/iso.segment" if segment.endswith(".m4s") else "video/mp4",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
     )
 
+async def get_preview(session_id: str) -> Tuple[Path, dict]:
+    if not SAFE_NAME.match(session_id) or session_id.startswith("."):
+        raise HTTPException(status_code=404, detail="Preview not found")
+    preview = await run_blocking(get_manager().get_preview, session_id)
+    if preview is None:
+        raise HTTPException(status_code=404, detail="Preview not found")
+    return preview
+
+@app.get("/videos/{session_id}/preview")
+async def get_session_preview(session_id: str):
+    """Duration, thumbnail layout and keyframe count of a closed session's recording"""
+    _, index = await get_preview(session_id)
+    return {
+        "video": index["video"],
+        "duration": index["duration"],
+        "thumbnails": index["thumbnails"],
+        "keyframe_count": len(index["keyframes"]),
+    }
+
+@app.get("/videos/{session_id}/thumbnails")
+async def get_session_thumbnail_strip(session_id: str):
+    """All thumbnails of a recording side by side in one image"""
+    directory, _ = await get_preview(session_id)
+    return FileResponse(directory / STRIP_NAME, media_type="image/jpeg", headers={"Cache-Control": "public, max-age=3600"})
+
+@app.get("/videos/{session_id}/thumbnails/{index}")
+async def get_session_thumbnail(session_id: str, index: int):
+    """A single thumbnail, taken index * interval seconds into the recording"""
+    directory, preview = await get_preview(session_id)
+    if not 0 <= index < preview["thumbnails"]["count"]:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return FileResponse(directory / thumbnail_name(index), media_type="image/jpeg", headers={"Cache-Control": "public, max-age=3600"})
+
+@app.get("/videos/{session_id}/keyframes")
+async def get_session_keyframes(session_id: str, t: Optional[float] = Query(None, ge=0)):
+    """
+    Keyframe index of a recording.
+
+    With t, only the keyframe to start playback from to show second t: its time and
+    byte offset in the MP4, or its segment for segmented recordings.
+    """
+    _, index = await get_preview(session_id)
+    if t is None:
+        return index["keyframes"]
+    keyframe = nearest_keyframe(index["keyframes"], t)
+    if keyframe is None:
+        raise HTTPException(status_code=404, detail="Recording has no keyframes")
+    return keyframe
+
 @app.put("/sessions/{session_id}/tag")
 async def update_session_tag(session_id: str, tag: str):
     """Update tag for a session"""
-    manager = LocalContainerManager()
-    session = manager.update_tag(session_id, tag)
+    session = await run_blocking(get_manager().update_tag, session_id, tag)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     return session
@@ -158,68 +421,73 @@ async def update_session_tag(session_id: str, tag: str):
 @app.post("/sessions/{session_id}/computer-use")
 async def execute_computer_use(session_id: str, command: str):
     """Execute computer use command on a session"""
-    config = Config()
-    api_key = config.get_anthropic_key()
+    api_key = get_api_key()
     if not api_key:
         raise HTTPException(status_code=400, detail="Anthropic API key not configured")
 
-    manager = LocalContainerManager()
-    session = manager.get_session(session_id)
+    # Resumes the session if it was paused for being idle
+    session = await run_blocking(get_manager().record_activity, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
     try:
-        await computer_use_main(command, api_key, session.computer_use_port)
+        await computer_use_main(command, api_key, session.computer_use_port, session.get_host())
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/console/{session_id}")
-async def get_console_output(session_id: str):
-    # Ensure the path exists
+async def get_console_output(
+    session_id: str,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_CONSOLE_LINES),
+    tail: Optional[int] = Query(None, ge=1, le=MAX_CONSOLE_LINES)
+):
+    """
+    Read a page of a session's console log.
+
+    Lines are numbered from 0 and read from offset, or the last tail lines are
+    returned. Pass the response's next as offset to read the lines that follow.
+    Without limit or tail the whole log is returned.
+    """
+    if not SAFE_NAME.match(session_id):
+        raise HTTPException(status_code=404, detail="Console log file not found")
     output_file = Path("marinabox/data/console_logs") / f"{session_id}.txt"
-    print(f"Attempting to read log file: {output_file}")
-    
+    if not output_file.exists():
+        return {"output": [], "offset": 0, "next": 0, "total": 0}
+
     try:
-        if not output_file.exists():
-            print(f"Log file not found: {output_file}")
-            return {"output": []}
-            
-        with open(output_file, "r") as f:
-            lines = f.readlines()
-            print(f"Read {len(lines)} lines from log file")
-            
-        return {"output": lines}
-        
-    except Exception as e:
-        print(f"Error reading console output: {e}")
+        lines, start, next_line, total = await run_blocking(LineIndex(output_file).read, offset, limit, tail)
+    except OSError as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
-# Add this new endpoint
+    return {"output": lines, "offset": start, "next": next_line, "total": total}
+
 @app.get("/console/stream/{session_id}")
-async def stream_console_output(session_id: str):
+async def stream_console_output(session_id: str, request: Request):
+    """
+    Stream a session's console log as server-sent events, existing lines first.
+
+    Each event's id is the byte offset after its last line, so a reconnecting
+    client's Last-Event-ID resumes where it left off. Lines a slow client missed
+    are sent as one event with several data lines.
+    """
     output_file = Path(f"marinabox/data/console_logs/{session_id}.txt")
     
-    if not output_file.exists():
+    if not SAFE_NAME.match(session_id) or not output_file.exists():
         raise HTTPException(status_code=404, detail="Console log file not found")
+
+    last_event_id = request.headers.get("last-event-id", "")
+    start = int(last_event_id) if last_event_id.isdigit() else 0
+    console = app.state.console
+    subscription = console.subscribe(output_file, start)
     
     async def log_generator():
-        async with aiofiles.open(output_file, mode='r') as file:
-            # First, read existing content
-            content = await file.read()
-            for line in content.splitlines():
-                print(line)
-                yield f"data: {line}\n\n"
-            
-            # Seek to end of file
-            await file.seek(0, 2)
-            
-            while True:
-                line = await file.readline()
-                if line:
-                    yield f"data: {line.strip()}\n\n"
-                else:
-                    await asyncio.sleep(0.1)  # Small delay before next check
+        try:
+            async for end, lines in subscription.events():
+                data = "".join(f"data: {line}\n" for line in lines)
+                yield f"id: {end}\n{data}\n"
+        finally:
+            console.unsubscribe(subscription)
     
     return StreamingResponse(
         log_generator(),
@@ -233,27 +501,45 @@ async def stream_console_output(session_id: str):
 @app.post("/sessions/{session_id}/chat")
 async def send_chat_message(session_id: str, message: str = Query(...)):
     """Send a chat message to a running session"""
-    try:
-        # Create directory if it doesn't exist
-        Path("marinabox/data/input_queue").mkdir(parents=True, exist_ok=True)
-        
-        # Write the message to the session's input queue
-        input_file = Path(f"marinabox/data/input_queue/{session_id}.txt")
-        
-        with open(input_file, "a") as f:
-            f.write(f"{message}\n")
-        
-        return {"status": "success", "message": message}
-    except Exception as e:
-        print(f"Error in chat endpoint: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    queued = await run_blocking(get_manager().send_input, session_id, message)
+    if queued is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "success", "message": message, "id": queued["id"]}
+
+@app.get("/sessions/{session_id}/input")
+async def read_input(
+    session_id: str,
+    timeout: float = Query(30.0, ge=0, le=300),
+    visibility_timeout: float = Query(60.0, gt=0)
+):
+    """
+    Long-poll for the next message sent to a session.
+
+    Returns 204 if nothing arrives within timeout seconds. A message that is not
+    acknowledged within visibility_timeout seconds is delivered again.
+    """
+    session = await run_blocking(get_manager().get_session, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    message = await get_manager().input_queue.dequeue_async(
+        session_id, timeout=timeout, visibility_timeout=visibility_timeout
+    )
+    if message is None:
+        return Response(status_code=204)
+    return message
+
+@app.post("/sessions/{session_id}/input/{message_id}/ack")
+async def ack_input(session_id: str, message_id: int):
+    """Acknowledge a message so it is not delivered again"""
+    if not await run_blocking(get_manager().ack_input, session_id, message_id):
+        raise HTTPException(status_code=404, detail="Message not found")
+    return {"status": "success"}
 
 @app.post("/sessions/{session_id}/start-samthropic")
 async def start_samthropic(session_id: str):
     """Start a samthropic session"""
     try:
-        manager = LocalContainerManager()
-        session = manager.get_session(session_id)
+        session = await run_blocking(get_manager().get_session, session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+API_VERSION = "v1.41"
+
+
+class AsyncDockerError(Exception):
+    """Error response from the Docker Engine API"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+
+
+class AsyncDockerClient:
+    """
+    Minimal asyncio client for the Docker Engine API built on httpx.
+
+    Covers the calls the async manager needs: run, list, exec, stop, remove and
+    streaming archive downloads. Connects to DOCKER_HOST, or the local unix socket.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = 60.0):
+        base_url = base_url or os.environ.get("DOCKER_HOST", "unix:///var/run/docker.sock")
+        self.base_url = base_url
+        if base_url.startswith("unix://"):
+            transport = httpx.AsyncHTTPTransport(uds=base_url[len("unix://"):])
+            url = "http://docker"
+        else:
+            transport = None
+            url = base_url.replace("tcp://", "http://", 1)
+        self._client = httpx.AsyncClient(base_url=f"{url}/{API_VERSION}", transport=transport, timeout=timeout)
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        response = await self._client.request(method, path, **kwargs)
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("message", response.text)
+            except ValueError:
+                message = response.text
+            raise AsyncDockerError(response.status_code, message)
+        return response
+
+    async def run_container(
+        self,
+        image: str,
+        environment: Optional[Dict[str, str]] = None,
+        ports: Optional[Dict[str, int]] = None,
+        volumes: Optional[Dict[str, dict]] = None,
+        labels: Optional[Dict[str, str]] = None,
+        host_config: Optional[dict] = None
+    ) -> str:
+        """Create and start a detached container, returning its id. host_config adds HostConfig fields such as resource limits"""
+        ports = ports or {}
+        config = {
+            "Image": image,
+            "Env": [f"{key}={value}" for key, value in (environment or {}).items()],
+            "Labels": labels or {},
+            "ExposedPorts": {container_port: {} for container_port in ports},
+            "HostConfig": {
+                "PortBindings": {
+                    container_port: [{"HostPort": str(host_port)}] for container_port, host_port in ports.items()
+                },
+                "Binds": [f"{host}:{spec['bind']}:{spec.get('mode', 'rw')}" for host, spec in (volumes or {}).items()],
+                **(host_config or {}),
+            },
+        }
+        response = await self._request("POST", "/containers/create", json=config)
+        container_id = response.json()["Id"]
+        try:
+            await self._request("POST", f"/containers/{container_id}/start")
+        except Exception:
+            await self.remove_container(container_id, force=True)
+            raise
+        return container_id
+
+    async def list_containers(self, all: bool = False, filters: Optional[Dict[str, List[str]]] = None) -> List[dict]:
+        params = {"all": "1" if all else "0"}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        response = await self._request("GET", "/containers/json", params=params)
+        return response.json()
+
+    async def exec_run(self, container_id: str, cmd: List[str], timeout: float = 30.0, poll_interval: float = 0.05) -> Optional[int]:
+        """Run a command in a container and wait for it to finish, returning its exit code"""
+        response = await self._request(
+            "POST", f"/containers/{container_id}/exec",
+            json={"Cmd": cmd, "AttachStdout": False, "AttachStderr": False}
+        )
+        exec_id = response.json()["Id"]
+        await self._request("POST", f"/exec/{exec_id}/start", json={"Detach": True, "Tty": False})
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            state = (await self._request("GET", f"/exec/{exec_id}/json")).json()
+            if not state.get("Running"):
+                return state.get("ExitCode")
+            if loop.time() >= deadline:
+                return None
+            await asyncio.sleep(poll_interval)
+
+    async def stop_container(self, container_id: str, timeout: int = 10):
+        try:
+            await self._request("POST", f"/containers/{container_id}/stop", params={"t": timeout}, timeout=timeout + 30)
+        except AsyncDockerError as e:
+            # 304 means the container was already stopped
+            if e.status_code != 304:
+                raise
+
+    async def unpause_container(self, container_id: str):
+        await self._request("POST", f"/containers/{container_id}/unpause")
+
+    async def remove_container(self, container_id: str, force: bool = False):
+        await self._request("DELETE", f"/containers/{container_id}", params={"force": "1" if force else "0"})
+
+    @asynccontextmanager
+    async def get_archive(self, container_id: str, path: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[AsyncIterator[bytes]]:
+        """Stream a tar archive of a path inside a container"""
+        async with self._client.stream(
+            "GET", f"/containers/{container_id}/archive", params={"path": path}, timeout=None
+        ) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                raise AsyncDockerError(response.status_code, response.text)
+            yield response.aiter_bytes(chunk_size)
+
+    async def close(self):
+        await self._client.aclose()
@@ -0,0 +1,530 @@
+import asyncio
+import io
+import os
+import queue
+import socket
+import tarfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from .admission import DEFAULT_RESOURCE_PROFILES, ResourceProfile
+from .async_docker import AsyncDockerClient, AsyncDockerError
+from .models import BrowserSession, StopResult
+from .placement import LOCAL_HOST, host_address
+from .ports import PORT_CONFLICT_RETRIES, PortAllocator, is_port_conflict
+from .readiness import ReadinessResult, async_wait_until_ready
+from .recording import CHUNK_SIZE, LocalFileSink, VideoSink, extract_archive
+from .segments import HLS_DIR, MP4_PATH, PLAYLIST_NAME, STOP_FFMPEG_CMD, STOP_RECORDER_CMD, _write_atomic, playlist_entries
+from .store import ACTIVE_STATUSES, SessionStore, SQLiteSessionStore, migrate_pickles
+
+
+async def _stream_into_sink(chunks: AsyncIterator[bytes], sink: VideoSink, filename: str, max_buffered_chunks: int = 8) -> Path:
+    """
+    Untar an async chunk stream into a sink.
+
+    Chunks are handed to a worker thread through a bounded queue, so at most
+    max_buffered_chunks are held in memory while the sink writes.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=max_buffered_chunks)
+    consumer = asyncio.ensure_future(
+        asyncio.to_thread(extract_archive, iter(buffer.get, None), sink, filename)
+    )
+
+    async def put(item):
+        while not consumer.done():
+            try:
+                buffer.put_nowait(item)
+                return True
+            except queue.Full:
+                await asyncio.sleep(0.01)
+        return False
+
+    try:
+        async for chunk in chunks:
+            if not await put(chunk):
+                break
+    except BaseException:
+        await put(None)
+        await asyncio.gather(consumer, return_exceptions=True)
+        raise
+    await put(None)
+    return await consumer
+
+
+class AsyncLocalContainerManager:
+    """
+    asyncio counterpart of LocalContainerManager.
+
+    Talks to the Docker Engine API and the session endpoints with httpx, so thousands
+    of lifecycle operations can interleave on one event loop. Sessions, port
+    reservations and recordings share their storage with LocalContainerManager.
+    Use as an async context manager, or call close() when done.
+    """
+
+    def __init__(
+        self,
+        base_debug_port: int = 4002,
+        base_vnc_port: int = 5002,
+        base_computer_use_port: int = 8002,
+        videos_path: Optional[Path] = None,
+        ready_timeout: float = 30.0,
+        video_sink: Optional[VideoSink] = None,
+        session_store: Optional[SessionStore] = None,
+        docker_url: Optional[str] = None,
+        resource_profiles: Optional[Dict[str, ResourceProfile]] = None,
+        docker_host: str = LOCAL_HOST
+    ):
+        """
+        Args:
+            docker_url: Docker daemon to talk to, defaults to DOCKER_HOST or the local socket
+            docker_host: Name of that daemon among the hosts LocalContainerManager places
+                sessions on. Only sessions on this host are reconciled and created here
+        """
+        self.docker = AsyncDockerClient(docker_url)
+        self.docker_host = docker_host
+        self.address = host_address(self.docker.base_url)
+        self.http = httpx.AsyncClient()
+        self.ready_timeout = ready_timeout
+        self.resource_profiles = {**DEFAULT_RESOURCE_PROFILES, **(resource_profiles or {})}
+        self.sessions: Dict[str, BrowserSession] = {}
+        self._tag_index: Dict[str, set] = {}
+        self._stopping = set()
+        self._loaded = False
+        self.storage_path = Path.home() / ".marinabox" / "sessions.db"
+        self._owns_store = session_store is None
+        self.store = session_store or SQLiteSessionStore(self.storage_path)
+        migrate_pickles(
+            self.store,
+            Path.home() / ".marinabox" / "sessions.pkl",
+            Path.home() / ".marinabox" / "closed_sessions.pkl"
+        )
+        self.videos_path = videos_path or (Path.home() / ".marinabox" / "videos")
+        self.videos_path.mkdir(parents=True, exist_ok=True)
+        self.video_sink = video_sink or LocalFileSink(self.videos_path)
+        self.console_logs_path = Path("marinabox/data/console_logs")
+        self.console_logs_path.mkdir(parents=True, exist_ok=True)
+        self.input_queue_path = Path("marinabox/data/input_queue")
+        self.input_queue_path.mkdir(parents=True, exist_ok=True)
+        self._process_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.port_allocator = PortAllocator(
+            Path.home() / ".marinabox" / "ports.json",
+            bases={"debug": base_debug_port, "vnc": base_vnc_port, "computer_use": base_computer_use_port},
+            # Probing ports on this machine only tells something about a local daemon
+            probe=self.docker.base_url.startswith("unix://")
+        )
+
+    async def __aenter__(self) -> "AsyncLocalContainerManager":
+        await self._ensure_loaded()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _ensure_loaded(self):
+        if not self._loaded:
+            await self.reconcile()
+
+    async def reconcile(self):
+        """Load active sessions from the store and mark those whose container is gone as stale"""
+        try:
+            sessions = {s.session_id: s for s in await asyncio.to_thread(self.store.list, active=True)}
+            active_containers = {c["Id"] for c in await self.docker.list_containers()}
+            # Sessions on other Docker hosts are not visible from this daemon, so leave them alone
+            stale_sessions = [
+                s for s in sessions.values()
+                if self._host_name(s) == self.docker_host and s.container_id not in active_containers
+            ]
+            for session in stale_sessions:
+                del sessions[session.session_id]
+                session.status = "stale"
+                session.closed_at = datetime.now(timezone.utc)
+                session.runtime_seconds = (session.closed_at - session.created_at).total_seconds()
+            if stale_sessions:
+                await asyncio.to_thread(self.store.put_many, stale_sessions)
+                await asyncio.to_thread(self.port_allocator.release, [
+                    port for s in stale_sessions for port in (s.debug_port, s.vnc_port, s.computer_use_port)
+                ])
+        except Exception as e:
+            print(f"Error loading sessions: {e}")
+            sessions = {}
+        self.sessions = sessions
+        self._tag_index = {}
+        for session in sessions.values():
+            self._index_tag(session)
+        self._loaded = True
+
+    def _host_name(self, session: BrowserSession) -> str:
+        """Name of the Docker host running a session, sessions created before placement run on the local host"""
+        return session.docker_host or LOCAL_HOST
+
+    def _index_tag(self, session: BrowserSession):
+        if session.tag:
+            self._tag_index.setdefault(session.tag, set()).add(session.session_id)
+
+    def _unindex_tag(self, session: BrowserSession):
+        session_ids = self._tag_index.get(session.tag)
+        if session_ids is not None:
+            session_ids.discard(session.session_id)
+            if not session_ids:
+                del self._tag_index[session.tag]
+
+    async def _reserve_ports(self, env_type: str, count: int = 1) -> List[tuple[Optional[int], int, int]]:
+        return await asyncio.to_thread(self.port_allocator.allocate, env_type, f"pending:{self._process_id}", count)
+
+    async def _release_ports(self, ports, busy: bool = False):
+        await asyncio.to_thread(self.port_allocator.release, ports, busy)
+
+    def _resolve_volumes(self, mount_path: Optional[Path]) -> dict:
+        volumes = {}
+        if mount_path:
+            mount_path = Path(mount_path).resolve()
+            if not mount_path.exists():
+                raise ValueError(f"Mount path does not exist: {mount_path}")
+            volumes[str(mount_path)] = {
+                'bind': '/mnt/host',
+                'mode': 'rw'
+            }
+        return volumes
+
+    async def _wait_until_ready(self, env_type: str, debug_port: Optional[int], vnc_port: int, computer_use_port: int) -> ReadinessResult:
+        result = await async_wait_until_ready(
+            env_type,
+            vnc_port=vnc_port,
+            computer_use_port=computer_use_port,
+            debug_port=debug_port,
+            host=self.address,
+            timeout=self.ready_timeout,
+            client=self.http
+        )
+        if not result.ready:
+            pending = [name for name, elapsed in result.ready_times.items() if elapsed is None]
+            print(f"Warning: endpoints not ready after {self.ready_timeout}s: {', '.join(pending)}")
+        return result
+
+    async def _launch_session(
+        self,
+        env_type: str,
+        resolution: str,
+        tag: Optional[str],
+        volumes: dict,
+        kiosk: bool,
+        initial_url: Optional[str],
+        ports: tuple[Optional[int], int, int]
+    ) -> BrowserSession:
+        """Start a container on reserved ports and wait until it is ready, releasing the ports on failure"""
+        image = "marinabox/marinabox-browser" if env_type == "browser" else "marinabox/marinabox-desktop"
+        environment_vars = {
+            "RESOLUTION": resolution,
+            "KIOSK_OPTS": "--kiosk --start-fullscreen" if kiosk and env_type == "browser" else "",
+            "INITIAL_URL": initial_url if initial_url else ""
+        }
+        for attempt in range(PORT_CONFLICT_RETRIES + 1):
+            debug_port, vnc_port, computer_use_port = ports
+            port_bindings = {
+                '6081/tcp': vnc_port,
+                '8000/tcp': computer_use_port
+            }
+            if env_type == 'browser':
+                port_bindings['9222/tcp'] = debug_port
+            try:
+                container_id = await self.docker.run_container(
+                    image, environment=environment_vars, ports=port_bindings, volumes=volumes,
+                    host_config=self.resource_profiles[env_type].host_config()
+                )
+                break
+            except Exception as e:
+                if attempt < PORT_CONFLICT_RETRIES and is_port_conflict(e):
+                    # Something on the Docker host holds a port the reservation table does not know about
+                    busy, ports = ports, (await self._reserve_ports(env_type))[0]
+                    await self._release_ports(busy, busy=True)
+                    continue
+                await self._release_ports(ports)
+                raise
+        try:
+            readiness = await self._wait_until_ready(env_type, debug_port, vnc_port, computer_use_port)
+        except BaseException:
+            await self.docker.remove_container(container_id, force=True)
+            await self._release_ports(ports)
+            raise
+        return BrowserSession(
+            session_id=container_id[:12],
+            container_id=container_id,
+            debug_port=debug_port,
+            vnc_port=vnc_port,
+            computer_use_port=computer_use_port,
+            created_at=datetime.now(timezone.utc),
+            websocket_url=readiness.websocket_url,
+            resolution=resolution,
+            env_type=env_type,
+            tag=tag,
+            ready_times=readiness.ready_times,
+            docker_host=self.docker_host,
+            host=self.address
+        )
+
+    async def _register_sessions(self, sessions: List[BrowserSession]):
+        for session in sessions:
+            self.sessions[session.session_id] = session
+            self._index_tag(session)
+
+        def persist():
+            self.store.put_many(sessions)
+            for session in sessions:
+                self.port_allocator.assign(
+                    (session.debug_port, session.vnc_port, session.computer_use_port), session.session_id
+                )
+                (self.console_logs_path / f"{session.session_id}.txt").touch()
+                (self.input_queue_path / f"{session.session_id}.txt").touch()
+
+        await asyncio.to_thread(persist)
+
+    async def create_session(
+        self,
+        env_type: str = "browser",
+        resolution: str = "1280x800x24",
+        tag: Optional[str] = None,
+        mount_path: Optional[Path] = None,
+        kiosk: bool = False,
+        initial_url: Optional[str] = None
+    ) -> BrowserSession:
+        if env_type not in ["browser", "desktop"]:
+            raise ValueError("env_type must be either 'browser' or 'desktop'")
+        await self._ensure_loaded()
+        volumes = self._resolve_volumes(mount_path)
+        ports = (await self._reserve_ports(env_type))[0]
+        session = await self._launch_session(env_type, resolution, tag, volumes, kiosk, initial_url, ports)
+        await self._register_sessions([session])
+        return session
+
+    async def create_sessions(
+        self,
+        count: int,
+        env_type: str = "browser",
+        resolution: str = "1280x800x24",
+        tag: Optional[str] = None,
+        mount_path: Optional[Path] = None,
+        kiosk: bool = False,
+        initial_url: Optional[str] = None,
+        max_concurrency: int = 32
+    ) -> List[BrowserSession]:
+        """
+        Create several sessions concurrently on the event loop.
+
+        When a tag is given, each session is tagged "<tag>-<index>".
+
+        Returns:
+            List of the sessions that were created successfully
+        """
+        if env_type not in ["browser", "desktop"]:
+            raise ValueError("env_type must be either 'browser' or 'desktop'")
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        await self._ensure_loaded()
+        volumes = self._resolve_volumes(mount_path)
+        reservations = await self._reserve_ports(env_type, count)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def launch(index: int, ports):
+            async with semaphore:
+                session_tag = f"{tag}-{index}" if tag else None
+                return await self._launch_session(env_type, resolution, session_tag, volumes, kiosk, initial_url, ports)
+
+        outcomes = await asyncio.gather(
+            *(launch(index, ports) for index, ports in enumerate(reservations)), return_exceptions=True
+        )
+        sessions = []
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                print(f"Error creating session: {outcome}")
+            else:
+                sessions.append(outcome)
+        if sessions:
+            await self._register_sessions(sessions)
+        return sessions
+
+    async def list_sessions(self) -> List[BrowserSession]:
+        await self.reconcile()
+        return list(self.sessions.values())
+
+    async def get_session(self, session_id: str) -> Optional[BrowserSession]:
+        await self._ensure_loaded()
+        return self.sessions.get(session_id)
+
+    async def get_session_by_identifier(self, identifier: str, reconcile: bool = False) -> Optional[BrowserSession]:
+        """
+        Get an active session by ID or tag.
+
+        Raises:
+            ValueError: If more than one active session carries the tag
+        """
+        if reconcile:
+            await self.reconcile()
+        session = await self.get_session(identifier)
+        if session:
+            return session
+        session_ids = self._tag_index.get(identifier, ())
+        if len(session_ids) > 1:
+            raise ValueError(f"Multiple sessions found with tag '{identifier}'")
+        return self.sessions[next(iter(session_ids))] if session_ids else None
+
+    async def _teardown_session(self, session: BrowserSession, video_filename: Optional[str] = None) -> StopResult:
+        timings = {}
+        self._stopping.add(session.session_id)
+        try:
+            if session.status == "paused":
+                await self.docker.unpause_container(session.container_id)
+
+            copy_error = None
+            if session.recording != "off":
+                # Gracefully stop the recorder so the recording is complete on disk,
+                # exec_run returns once the command has exited
+                stage_started = time.monotonic()
+                if session.recording == "full" and session.recording_format == "mp4":
+                    await self.docker.exec_run(session.container_id, STOP_FFMPEG_CMD)
+                else:
+                    await self.docker.exec_run(session.container_id, ["sh", "-c", STOP_RECORDER_CMD])
+                timings["ffmpeg_stop"] = time.monotonic() - stage_started
+
+            stage_started = time.monotonic()
+            await self.docker.stop_container(session.container_id)
+            await self._release_ports((session.debug_port, session.vnc_port, session.computer_use_port))
+            timings["stop"] = time.monotonic() - stage_started
+
+            if session.recording != "off":
+                stage_started = time.monotonic()
+                session.export_attempts += 1
+                try:
+                    session.video_path = str(await self._export_recording(session, video_filename))
+                    session.export_status = "done"
+                except Exception as e:
+                    copy_error = f"Error copying video: {e}"
+                    print(copy_error)
+                    session.export_status = "failed"
+                    session.export_error = str(e)
+                timings["copy"] = time.monotonic() - stage_started
+
+            # A failed export keeps the stopped container, so the recording can be recovered by hand
+            if session.export_status != "failed":
+                stage_started = time.monotonic()
+                await self.docker.remove_container(session.container_id)
+                timings["remove"] = time.monotonic() - stage_started
+
+            session.status = "stopped"
+            session.closed_at = datetime.now(timezone.utc)
+            session.runtime_seconds = (session.closed_at - session.created_at).total_seconds()
+            session.stop_timings = timings
+
+            self.sessions.pop(session.session_id, None)
+            self._unindex_tag(session)
+            return StopResult(success=True, timings=timings, error=copy_error)
+        except Exception as e:
+            print(f"Error stopping session: {e}")
+            return StopResult(success=False, timings=timings, error=str(e))
+        finally:
+            self._stopping.discard(session.session_id)
+
+    def get_segments_path(self, session_id: str) -> Path:
+        """Directory a session's HLS playlist and segments are copied to"""
+        return self.videos_path / session_id
+
+    async def _read_file(self, container_id: str, path: str) -> bytes:
+        """Read a small file out of a container through the archive API"""
+        async with self.docker.get_archive(container_id, path, CHUNK_SIZE) as chunks:
+            data = b"".join([chunk async for chunk in chunks])
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r") as archive:
+            for member in archive:
+                if member.isfile():
+                    return archive.extractfile(member).read()
+        raise FileNotFoundError(f"No file found in archive for {path}")
+
+    async def _export_recording(self, session: BrowserSession, video_filename: Optional[str] = None) -> Path:
+        """Copy a stopped session's recording out of its container, in the session's recording format"""
+        if session.recording_format == "hls":
+            directory = self.get_segments_path(session.session_id)
+            directory.mkdir(parents=True, exist_ok=True)
+            try:
+                playlist = await self._read_file(session.container_id, f"{HLS_DIR}/{PLAYLIST_NAME}")
+            except AsyncDockerError as e:
+                if e.status_code != 404:
+                    raise
+                # The recorder never wrote its first segment
+                return directory / PLAYLIST_NAME
+            # Segments synced while the session ran by LocalContainerManager are already here
+            sink = LocalFileSink(directory)
+            for name in playlist_entries(playlist.decode(errors="replace")):
+                if "/" in name or (directory / name).exists():
+                    continue
+                async with self.docker.get_archive(session.container_id, f"{HLS_DIR}/{name}", CHUNK_SIZE) as chunks:
+                    await _stream_into_sink(chunks, sink, name)
+            await asyncio.to_thread(_write_atomic, directory / PLAYLIST_NAME, playlist)
+            return directory / PLAYLIST_NAME
+
+        video_filename = video_filename or f"{session.session_id}.mp4"
+        async with self.docker.get_archive(session.container_id, MP4_PATH, CHUNK_SIZE) as chunks:
+            return await _stream_into_sink(chunks, self.video_sink, video_filename)
+
+    async def stop_session(self, session_id: str, video_filename: Optional[str] = None) -> bool:
+        await self._ensure_loaded()
+        session = self.sessions.get(session_id)
+        if session is None or session_id in self._stopping:
+            return False
+        result = await self._teardown_session(session, video_filename)
+        if result:
+            await asyncio.to_thread(self.store.put, session)
+        return result.success
+
+    async def stop_all_sessions(self, max_concurrency: int = 32) -> Dict[str, StopResult]:
+        """
+        Stop all active sessions concurrently.
+
+        Returns:
+            Dictionary mapping session IDs to a StopResult, which is truthy on success
+        """
+        await self._ensure_loaded()
+        sessions = [s for s in self.sessions.values() if s.session_id not in self._stopping]
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def stop(session: BrowserSession) -> StopResult:
+            async with semaphore:
+                return await self._teardown_session(session)
+
+        outcomes = await asyncio.gather(*(stop(session) for session in sessions))
+        results = {session.session_id: outcome for session, outcome in zip(sessions, outcomes)}
+        stopped = [session for session in sessions if results[session.session_id]]
+        if stopped:
+            await asyncio.to_thread(self.store.put_many, stopped)
+        return results
+
+    async def list_closed_sessions(self) -> List[BrowserSession]:
+        return await asyncio.to_thread(self.store.list, active=False)
+
+    async def get_closed_session(self, session_id: str) -> Optional[BrowserSession]:
+        session = await asyncio.to_thread(self.store.get, session_id)
+        if session and session.status not in ACTIVE_STATUSES:
+            return session
+        return None
+
+    async def update_tag(self, session_id: str, tag: str) -> Optional[BrowserSession]:
+        session = await self.get_session(session_id)
+        if session:
+            self._unindex_tag(session)
+            session.tag = tag
+            self._index_tag(session)
+        else:
+            session = await self.get_closed_session(session_id)
+            if not session:
+                return None
+            session.tag = tag
+        await asyncio.to_thread(self.store.put, session)
+        return session
+
+    async def close(self):
+        """Close the Docker and HTTP clients"""
+        await self.docker.close()
+        await self.http.aclose()
+        if self._owns_store:
+            self.store.close()
@@ -5,7 +5,7 @@ from anthropic import Anthropic
 from .tools import ToolCollection, ComputerTool, BashTool, EditTool
 from .loop import sampling_loop
 
-async def main(prompt: str, api_key: str, port: int = 8002):
+async def main(prompt: str, api_key: str, port: int = 8002, host: str = "localhost"):
     responses = []  # Create a list to store responses
     
     def output_callback(content):
@@ -33,9 +33,9 @@ async def main(prompt: str, api_key: str, port: int = 8002):
 
     messages = [{"role": "user", "content": [{"type": "text", "text": prompt}]}]
 
-    computer_tool = ComputerTool(port=port)
-    bash_tool = BashTool(port=port)
-    edit_tool = EditTool(port=port)
+    computer_tool = ComputerTool(port=port, host=host)
+    bash_tool = BashTool(port=port, host=host)
+    edit_tool = EditTool(port=port, host=host)
     
     tools = ToolCollection(computer_tool, bash_tool, edit_tool)
 
@@ -127,9 +127,9 @@ class BashTool(BaseAnthropicTool):
     name: ClassVar[Literal["bash"]] = "bash"
     api_type: ClassVar[Literal["bash_20250124"]] = "bash_20250124"
 
-    def __init__(self, port: int = 8002):
+    def __init__(self, port: int = 8002, host: str = "localhost"):
         self._session = None
-        self.api_base_url = f"http://localhost:{port}"
+        self.api_base_url = f"http://{host}:{port}"
         self.client = httpx.AsyncClient()
         super().__init__()
 
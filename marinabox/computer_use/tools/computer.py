@@ -91,9 +91,9 @@ class ComputerTool(BaseAnthropicTool):
     width: int = 1280
     height: int = 800
     
-    def __init__(self, port: int = 8002):
+    def __init__(self, port: int = 8002, host: str = "localhost"):
         super().__init__()
-        self.api_base_url = f"http://localhost:{port}"
+        self.api_base_url = f"http://{host}:{port}"
         # Increase default timeout to handle slower actions from the tool server
         self.request_timeout_s: float = 30.0
         self.client = httpx.AsyncClient(timeout=self.request_timeout_s)
@@ -41,8 +41,8 @@ class EditTool(BaseAnthropicTool):
 
     _file_history: dict[Path, list[str]]
 
-    def __init__(self, port: int = 8002):
-        self.api_base_url = f"http://localhost:{port}"
+    def __init__(self, port: int = 8002, host: str = "localhost"):
+        self.api_base_url = f"http://{host}:{port}"
         self.client = httpx.AsyncClient()
         self._file_history = defaultdict(list)
         super().__init__()
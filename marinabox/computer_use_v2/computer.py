@@ -25,6 +25,10 @@ class Computer:
     - base_url: explicit API base URL (e.g., http://localhost:2000)
     
     If both are provided, base_url takes precedence.
+
+    When bound to a session, every request first records activity on it, which
+    resumes the session if it was paused for being idle and keeps it from being
+    paused or reaped while in use. Call close() when done.
     """
 
     def __init__(
@@ -33,33 +37,47 @@ class Computer:
         session_identifier: Optional[str] = None,
         base_url: Optional[str] = None,
         timeout_s: float = 30.0,
+        sdk: Optional[MarinaboxSDK] = None,
     ) -> None:
+        self._http = requests.Session()
+        self._sdk: Optional[MarinaboxSDK] = None
+        self._owns_sdk = False
+        self._session_id: Optional[str] = None
         if base_url:
             resolved_url = base_url.rstrip("/")
         elif session_identifier:
-            sdk = MarinaboxSDK()
-            session = sdk.get_session_by_identifier(session_identifier)
+            self._owns_sdk = sdk is None
+            self._sdk = sdk or MarinaboxSDK()
+            session = self._sdk.get_session_by_identifier(session_identifier)
             if not session:
+                self.close()
                 raise ValueError(f"No session found for identifier: {session_identifier}")
+            self._session_id = session.session_id
             # v2 API is exposed from the container on the computer_use_port
-            resolved_url = f"http://localhost:{session.computer_use_port}"
+            resolved_url = f"http://{session.get_host()}:{session.computer_use_port}"
         else:
             # Fallback for manual sandboxes
             resolved_url = "http://localhost:2000"
 
         self._config = ComputerConfig(base_url=resolved_url, request_timeout_s=timeout_s)
-        self._http = requests.Session()
 
     # ----------------------------
     # Internal HTTP helpers
     # ----------------------------
+    def _record_activity(self) -> None:
+        if self._sdk is not None and self._session_id is not None:
+            if self._sdk.manager.record_activity(self._session_id) is None:
+                raise ValueError(f"Session {self._session_id} is no longer active")
+
     def _get(self, path: str) -> Dict[str, Any]:
+        self._record_activity()
         url = f"{self._config.base_url}{path}"
         resp = self._http.get(url, timeout=self._config.request_timeout_s)
         resp.raise_for_status()
         return resp.json()
 
     def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self._record_activity()
         url = f"{self._config.base_url}{path}"
         resp = self._http.post(url, json=payload, timeout=self._config.request_timeout_s)
         resp.raise_for_status()
@@ -72,6 +90,12 @@ class Computer:
     def base_url(self) -> str:
         return self._config.base_url
 
+    def close(self) -> None:
+        """Close the HTTP session, and the SDK if this Computer created it"""
+        self._http.close()
+        if self._owns_sdk and self._sdk is not None:
+            self._sdk.close()
+
     def screenshot_base64(self) -> str:
         """Return a base64-encoded PNG screenshot."""
         data = self._get("/screenshot")
@@ -133,7 +157,9 @@ class Computer:
     # Convenience constructors
     # ----------------------------
     @classmethod
-    def from_session(cls, session_identifier: str, *, timeout_s: float = 30.0) -> "Computer":
+    def from_session(
+        cls, session_identifier: str, *, timeout_s: float = 30.0, sdk: Optional[MarinaboxSDK] = None
+    ) -> "Computer":
         """Create a Computer bound to a running session by ID or tag."""
         return cls(session_identifier=session_identifier, timeout_s=timeout_s, sdk=sdk)
 
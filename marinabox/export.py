@@ -0,0 +1,110 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import List, Optional
+
+EXPORT_STATUSES = ("pending", "copying", "done", "failed")
+
+
+class ExportQueue:
+    """
+    Copies recordings out of stopped containers in background threads.
+
+    stop_session only finalizes the recording and stops the container, which frees
+    its CPU, memory and ports. The copy runs here afterwards and the container is
+    removed once it succeeds. Failed copies are retried with exponential backoff; a
+    session that still fails after max_attempts is marked failed and its container
+    is kept, so the recording can be recovered by hand.
+    """
+
+    def __init__(self, manager, workers: int = 2, max_attempts: int = 3, retry_delay: float = 2.0):
+        self.manager = manager
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.exported = 0
+        self.retried = 0
+        self.failed = 0
+        self._jobs: List[tuple] = []  # Heap of (ready_at, sequence, session_id)
+        self._sequence = itertools.count()
+        self._active = set()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._threads: List[threading.Thread] = []
+
+    def submit(self, session_id: str, delay: float = 0.0):
+        """Queue a stopped session's recording for export"""
+        with self._condition:
+            if self._closed:
+                self._active.discard(session_id)
+                self._condition.notify_all()
+                return
+            heapq.heappush(self._jobs, (time.monotonic() + delay, next(self._sequence), session_id))
+            self._active.add(session_id)
+            if not self._threads:
+                for index in range(self.workers):
+                    thread = threading.Thread(target=self._run, name=f"marinabox-export-{index}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            self._condition.notify_all()
+
+    def wait(self, session_id: str, timeout: Optional[float] = None) -> bool:
+        """Wait until a session's export has finished or failed, returning False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: session_id not in self._active, timeout)
+
+    def close(self):
+        """Finish the exports being copied; queued ones stay pending in the session store"""
+        with self._condition:
+            self._closed = True
+            self._active.difference_update(session_id for _, _, session_id in self._jobs)
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=60)
+
+    def stats(self) -> dict:
+        with self._condition:
+            queued = len(self._jobs)
+        return {"queued": queued, "exported": self.exported, "retried": self.retried, "failed": self.failed}
+
+    def _next_job(self) -> Optional[str]:
+        with self._condition:
+            while not self._closed:
+                if self._jobs:
+                    wait = self._jobs[0][0] - time.monotonic()
+                    if wait <= 0:
+                        return heapq.heappop(self._jobs)[2]
+                    self._condition.wait(wait)
+                else:
+                    self._condition.wait()
+            return None
+
+    def _finish(self, session_id: str):
+        with self._condition:
+            self._active.discard(session_id)
+            self._condition.notify_all()
+
+    def _run(self):
+        while (session_id := self._next_job()) is not None:
+            try:
+                self.manager._export_session(session_id)
+                self.exported += 1
+                self._finish(session_id)
+            except Exception as e:
+                print(f"Error exporting recording of {session_id}: {e}")
+                session = self.manager.store.get(session_id)
+                if session is None:
+                    self._finish(session_id)
+                elif session.export_attempts < self.max_attempts:
+                    session.export_status = "pending"
+                    session.export_error = str(e)
+                    self.manager.store.put(session)
+                    self.retried += 1
+                    self.submit(session_id, delay=self.retry_delay * 2 ** (session.export_attempts - 1))
+                else:
+                    session.export_status = "failed"
+                    session.export_error = str(e)
+                    self.manager.store.put(session)
+                    self.failed += 1
+                    self._finish(session_id)
@@ -0,0 +1,59 @@
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class IdleReaper:
+    """
+    Pauses sessions that have been idle for idle_timeout seconds and stops sessions
+    that have been idle for ttl seconds.
+
+    A session is idle when neither a computer-use request nor console or input queue
+    activity has been seen for it. Paused sessions are resumed by the manager on the
+    next tool call; stopped sessions go through the normal stop_session path, so
+    their recordings are kept.
+    """
+
+    def __init__(self, manager, idle_timeout: Optional[float] = None, ttl: Optional[float] = None, interval: float = 30.0):
+        if idle_timeout is None and ttl is None:
+            raise ValueError("At least one of idle_timeout and ttl is required")
+        self.manager = manager
+        self.idle_timeout = idle_timeout
+        self.ttl = ttl
+        self.interval = interval
+        self.paused = 0
+        self.stopped = 0
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start checking for idle sessions in a background thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="marinabox-idle-reaper", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop checking for idle sessions"""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._closed.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error checking for idle sessions: {e}")
+
+    def check(self):
+        """Pause or stop every session that has been idle for too long"""
+        now = datetime.now(timezone.utc)
+        for session in self.manager.list_sessions():
+            idle_seconds = (now - self.manager.last_activity(session)).total_seconds()
+            if self.ttl is not None and idle_seconds >= self.ttl:
+                if self.manager.stop_session(session.session_id):
+                    self.stopped += 1
+            elif self.idle_timeout is not None and idle_seconds >= self.idle_timeout and session.status == "running":
+                if self.manager.pause_session(session.session_id):
+                    self.paused += 1
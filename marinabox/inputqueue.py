@@ -0,0 +1,193 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+VISIBILITY_TIMEOUT = 60.0
+# Upper bound on a wait, so messages enqueued by other processes are still picked up
+RECHECK_INTERVAL = 1.0
+
+
+class InputQueue:
+    """
+    Durable per-session message queues in SQLite.
+
+    A dequeued message stays in the queue, invisible for visibility_timeout
+    seconds, until it is acknowledged. Messages that are not acknowledged in time
+    are delivered again, with their attempts count increased. Waiting consumers
+    in this process are woken as soon as a message is enqueued; messages
+    enqueued by other processes are noticed within RECHECK_INTERVAL.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._async_waiters: Dict[str, Set[asyncio.Future]] = {}
+        self._version = 0  # Bumped on every enqueue, so a wait never misses one that raced the claim
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                body TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                visible_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, visible_at)")
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        return {"id": row[0], "session_id": row[1], "body": row[2], "enqueued_at": row[3], "attempts": row[4]}
+
+    def enqueue(self, session_id: str, body: str) -> dict:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO messages (session_id, body, enqueued_at, visible_at) VALUES (?, ?, ?, ?)",
+                (session_id, body, now, now)
+            )
+        self._notify(session_id)
+        return {"id": cursor.lastrowid, "session_id": session_id, "body": body, "enqueued_at": now, "attempts": 0}
+
+    def claim(self, session_id: str, visibility_timeout: float = VISIBILITY_TIMEOUT) -> Optional[dict]:
+        """Take the oldest visible message without waiting, or None if there is none"""
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so two processes cannot claim the same message
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    """
+                    SELECT id, session_id, body, enqueued_at, attempts FROM messages
+                    WHERE session_id = ? AND visible_at <= ? ORDER BY id LIMIT 1
+                    """,
+                    (session_id, now)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE messages SET visible_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (now + visibility_timeout, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        message = self._to_dict(row)
+        message["attempts"] += 1
+        return message
+
+    def _next_wait(self, session_id: str, deadline: float) -> float:
+        """Seconds until the next check: a message becoming visible again, the deadline or RECHECK_INTERVAL"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(visible_at) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        now = time.time()
+        wait = min(deadline - now, RECHECK_INTERVAL)
+        if row[0] is not None:
+            wait = min(wait, row[0] - now)
+        return max(wait, 0.0)
+
+    def dequeue(
+        self, session_id: str, timeout: float = 30.0, visibility_timeout: float = VISIBILITY_TIMEOUT
+    ) -> Optional[dict]:
+        """Wait up to timeout seconds for a message, returning None if none arrives"""
+        deadline = time.time() + timeout
+        while True:
+            version = self._version
+            message = self.claim(session_id, visibility_timeout)
+            if message is not None or time.time() >= deadline:
+                return message
+            wait = self._next_wait(session_id, deadline)
+            with self._condition:
+                self._condition.wait_for(lambda: self._version != version, wait)
+
+    async def dequeue_async(
+        self, session_id: str, timeout: float = 30.0, visibility_timeout: float = VISIBILITY_TIMEOUT
+    ) -> Optional[dict]:
+        """dequeue for event loops: waiting holds no thread, only the SQLite calls run in one"""
+        loop = asyncio.get_running_loop()
+        deadline = time.time() + timeout
+        while True:
+            version = self._version
+            message = await loop.run_in_executor(None, self.claim, session_id, visibility_timeout)
+            if message is not None or time.time() >= deadline:
+                return message
+            wait = await loop.run_in_executor(None, self._next_wait, session_id, deadline)
+            waiter = loop.create_future()
+            with self._condition:
+                self._async_waiters.setdefault(session_id, set()).add(waiter)
+                if self._version != version:
+                    waiter.set_result(None)
+            try:
+                await asyncio.wait_for(waiter, wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._condition:
+                    waiters = self._async_waiters.get(session_id)
+                    if waiters is not None:
+                        waiters.discard(waiter)
+                        if not waiters:
+                            del self._async_waiters[session_id]
+
+    def _notify(self, session_id: str):
+        with self._condition:
+            self._version += 1
+            self._condition.notify_all()
+            waiters = list(self._async_waiters.get(session_id, ()))
+        for waiter in waiters:
+            waiter.get_loop().call_soon_threadsafe(self._wake, waiter)
+
+    @staticmethod
+    def _wake(waiter: asyncio.Future):
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def ack(self, session_id: str, message_id: int) -> bool:
+        """Remove a delivered message for good, returning False if it is unknown"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM messages WHERE id = ? AND session_id = ? AND attempts > 0", (message_id, session_id)
+            )
+        return cursor.rowcount > 0
+
+    def release(self, session_id: str, message_id: int) -> bool:
+        """Make a delivered message visible again right away instead of after its visibility timeout"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE messages SET visible_at = ? WHERE id = ? AND session_id = ? AND attempts > 0",
+                (time.time(), message_id, session_id)
+            )
+        if cursor.rowcount:
+            self._notify(session_id)
+        return cursor.rowcount > 0
+
+    def pending(self, session_id: str) -> List[dict]:
+        """Messages not acknowledged yet, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, session_id, body, enqueued_at, attempts FROM messages WHERE session_id = ? ORDER BY id",
+                (session_id,)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def purge(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
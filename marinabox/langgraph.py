@@ -10,36 +10,50 @@ from langchain_core.messages import HumanMessage, ToolMessage
 
 def mb_start_computer(state: Annotated[dict, InjectedState()]):
     manager = LocalContainerManager()
-    env_type = "desktop"
-    resolution = "1280x800x24"
-    session_details = manager.create_session(env_type=env_type, resolution=resolution)
+    try:
+        env_type = "desktop"
+        resolution = "1280x800x24"
+        session_details = manager.create_session(env_type=env_type, resolution=resolution)
+    finally:
+        manager.close()
     state["session_details"] = session_details
     state["session_id"] = session_details.session_id
     return state
 
 def mb_stop_computer(state: Annotated[dict, InjectedState()]):
     manager = LocalContainerManager()
-    session_id = state.get("session_id")
-
-    manager.stop_session(session_id)
+    try:
+        session_id = state.get("session_id")
+        # The recording is exported by this manager, so wait for it before closing
+        if manager.stop_session(session_id):
+            manager.wait_for_export(session_id)
+    finally:
+        manager.close()
     
     state["session_details"] = None
     return state
 
 def mb_start_browser(state: Annotated[dict, InjectedState()]):
     manager = LocalContainerManager()
-    env_type = "browser"
-    resolution = "1280x800x24"
-    session_details = manager.create_session(env_type=env_type, resolution=resolution)
+    try:
+        env_type = "browser"
+        resolution = "1280x800x24"
+        session_details = manager.create_session(env_type=env_type, resolution=resolution)
+    finally:
+        manager.close()
     state["session_details"] = session_details
     state["session_id"] = session_details.session_id
     return state
 
 def mb_stop_browser(state: Annotated[dict, InjectedState()]):
     manager = LocalContainerManager()
-    session_id = state.get("session_id")
-    
-    manager.stop_session(session_id)
+    try:
+        session_id = state.get("session_id")
+        # The recording is exported by this manager, so wait for it before closing
+        if manager.stop_session(session_id):
+            manager.wait_for_export(session_id)
+    finally:
+        manager.close()
     
     state["session_details"] = None
     return state
@@ -49,7 +63,10 @@ def mb_use_computer_tool(tool_call_id: Annotated[str, InjectedToolCallId],state:
     """A tool used to execute commands on a computer using Natural Language"""
     mb_sdk = MarinaboxSDK()
     session_id = state.get("session_id")
-    mb_sdk.computer_use_command(state.get("session_id"), command)
+    try:
+        mb_sdk.computer_use_command(state.get("session_id"), command)
+    finally:
+        mb_sdk.close()
     
     return Command(goto="agent")
 
@@ -59,6 +76,9 @@ def mb_use_browser_tool(tool_call_id: Annotated[str, InjectedToolCallId], state:
     session_id = state.get("session_id")
     mb_sdk = MarinaboxSDK()
     session_id = state.get("session_id")
-    mb_sdk.computer_use_command(state.get("session_id"), command)
+    try:
+        mb_sdk.computer_use_command(state.get("session_id"), command)
+    finally:
+        mb_sdk.close()
     
     return Command(goto="agent")
@@ -0,0 +1,126 @@
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .segments import _write_atomic
+
+INDEX_SUFFIX = ".idx"
+INDEX_INTERVAL = 1024  # Lines between checkpoints
+CHUNK_SIZE = 1024 * 1024
+_HEADER = struct.Struct("<QQ")  # Bytes and complete lines covered by the index
+_ENTRY = struct.Struct("<Q")
+
+_locks: Dict[Path, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path: Path) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+class LineIndex:
+    """
+    Sparse index of line start offsets for an append-only log file.
+
+    The byte offset of every INDEX_INTERVAL-th line is kept in <log>.idx next to
+    the log, so line n is found by seeking to the checkpoint before it and
+    scanning at most INDEX_INTERVAL lines. The index is extended with whatever was
+    appended since the last call, and rebuilt when the log was truncated.
+    Only complete lines are indexed.
+    """
+
+    def __init__(self, log_path: Path):
+        self.log_path = Path(log_path)
+        self.index_path = self.log_path.with_name(self.log_path.name + INDEX_SUFFIX)
+        self.indexed_bytes = 0
+        self.lines = 0
+        self.checkpoints: List[int] = [0]
+
+    def _load(self, log_fd: int, size: int):
+        try:
+            data = self.index_path.read_bytes()
+        except FileNotFoundError:
+            return
+        if len(data) < _HEADER.size:
+            return
+        indexed_bytes, lines = _HEADER.unpack_from(data)
+        count = (len(data) - _HEADER.size) // _ENTRY.size
+        checkpoints = [_ENTRY.unpack_from(data, _HEADER.size + i * _ENTRY.size)[0] for i in range(count)]
+        # A shorter log, or one no longer ending a line where the index stopped, was rewritten
+        if indexed_bytes > size or len(checkpoints) != lines // INDEX_INTERVAL + 1:
+            return
+        if indexed_bytes and os.pread(log_fd, 1, indexed_bytes - 1) != b"\n":
+            return
+        self.indexed_bytes, self.lines, self.checkpoints = indexed_bytes, lines, checkpoints
+
+    def _save(self):
+        data = _HEADER.pack(self.indexed_bytes, self.lines) + b"".join(_ENTRY.pack(c) for c in self.checkpoints)
+        _write_atomic(self.index_path, data)
+
+    def _extend(self, log_fd: int, size: int):
+        start_bytes = self.indexed_bytes
+        position = self.indexed_bytes
+        while position < size:
+            chunk = os.pread(log_fd, min(CHUNK_SIZE, size - position), position)
+            if not chunk:
+                break
+            newline = chunk.find(b"\n")
+            while newline != -1:
+                self.lines += 1
+                self.indexed_bytes = position + newline + 1
+                if self.lines % INDEX_INTERVAL == 0:
+                    self.checkpoints.append(self.indexed_bytes)
+                newline = chunk.find(b"\n", newline + 1)
+            position += len(chunk)
+        if self.indexed_bytes != start_bytes:
+            self._save()
+
+    def _seek_line(self, log_fd: int, line: int) -> int:
+        """Byte offset where a line starts, line being at most the number of indexed lines"""
+        checkpoint = line // INDEX_INTERVAL
+        offset = self.checkpoints[checkpoint]
+        remaining = line - checkpoint * INDEX_INTERVAL
+        while remaining:
+            chunk = os.pread(log_fd, min(CHUNK_SIZE, self.indexed_bytes - offset), offset)
+            newline = -1
+            while remaining:
+                newline = chunk.find(b"\n", newline + 1)
+                if newline == -1:
+                    break
+                remaining -= 1
+            if remaining:
+                offset += len(chunk)
+            else:
+                offset += newline + 1
+        return offset
+
+    def read(
+        self, offset: Optional[int] = None, limit: Optional[int] = None, tail: Optional[int] = None
+    ) -> Tuple[List[str], int, int, int]:
+        """
+        Read complete lines starting at line offset, or the last tail lines.
+
+        Returns:
+            (lines, first line number, next line number to read, total complete lines)
+        """
+        lock = _lock_for(self.log_path.resolve())
+        with lock, open(self.log_path, "rb") as log:
+            log_fd = log.fileno()
+            size = os.fstat(log_fd).st_size
+            self._load(log_fd, size)
+            self._extend(log_fd, size)
+
+            if tail is not None:
+                start = max(0, self.lines - tail)
+            else:
+                start = min(offset or 0, self.lines)
+            end = self.lines if limit is None else min(self.lines, start + limit)
+            start_byte = self._seek_line(log_fd, start)
+            end_byte = self._seek_line(log_fd, end) if end < self.lines else self.indexed_bytes
+            data = os.pread(log_fd, end_byte - start_byte, start_byte) if end_byte > start_byte else b""
+        # Split on newlines only, as the index counts them; str.splitlines also breaks on \r and others
+        lines = [line.decode(errors="replace") + "\n" for line in data.split(b"\n")[:-1]]
+        return lines, start, end, self.lines
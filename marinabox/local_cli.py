@@ -1,5 +1,7 @@
 import click
 from .local_manager import LocalContainerManager
+from .admission import AdmissionError
+from .retention import RetentionManager
 import json
 from datetime import datetime
 from .config import Config
@@ -7,6 +9,12 @@ import asyncio
 from .computer_use.cli import main as computer_use_main
 from pathlib import Path
 
+def _open_manager(**kwargs) -> LocalContainerManager:
+    """Open a manager that is closed when the command exits, so queued exports, previews and log records are written"""
+    manager = LocalContainerManager(**kwargs)
+    click.get_current_context().call_on_close(manager.close)
+    return manager
+
 class DateTimeEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, datetime):
@@ -25,23 +33,78 @@ def local():
 @click.option('--mount', type=click.Path(exists=True, dir_okay=True, file_okay=False), help='Directory to mount into the container at /mnt/host')
 @click.option('--kiosk', is_flag=True, default=False, help='Launch Chrome in kiosk mode (browser env only)')
 @click.option('--initial-url', help='Initial URL to open in Chrome (browser env only)')
-def create(env_type, resolution, tag, mount, kiosk, initial_url):
+@click.option('--recording-format', type=click.Choice(['mp4', 'hls']), default="mp4", help='Record one MP4, or HLS segments synced while the session runs')
+@click.option('--recording', type=click.Choice(['full', 'low-fps', 'off']), default="full", help='Recording profile; low-fps and off save the recorder\'s CPU')
+def create(env_type, resolution, tag, mount, kiosk, initial_url, recording_format, recording):
     """Create a new session"""
-    manager = LocalContainerManager()
-    session = manager.create_session(
+    manager = _open_manager()
+    try:
+        session = manager.create_session(
+            env_type=env_type,
+            resolution=resolution,
+            tag=tag,
+            mount_path=mount,
+            kiosk=kiosk,
+            initial_url=initial_url,
+            recording_format=recording_format,
+            recording=recording
+        )
+    except AdmissionError as e:
+        click.echo(f"Could not create session: {e}", err=True)
+        return
+    click.echo(json.dumps(session.__dict__, cls=DateTimeEncoder, indent=2))
+
+@local.command()
+@click.argument('count', type=click.IntRange(min=1))
+@click.option('--env-type', type=click.Choice(['browser', 'desktop']), default="browser", help='Environment type')
+@click.option('--resolution', default="1280x800x24", help='Screen resolution')
+@click.option('--tag', help='Tag prefix; sessions are tagged <tag>-<index>')
+@click.option('--mount', type=click.Path(exists=True, dir_okay=True, file_okay=False), help='Directory to mount into the containers at /mnt/host')
+@click.option('--kiosk', is_flag=True, default=False, help='Launch Chrome in kiosk mode (browser env only)')
+@click.option('--initial-url', help='Initial URL to open in Chrome (browser env only)')
+@click.option('--workers', type=click.IntRange(min=1), default=8, help='Maximum number of containers started at the same time')
+@click.option('--recording-format', type=click.Choice(['mp4', 'hls']), default="mp4", help='Record one MP4, or HLS segments synced while the session runs')
+@click.option('--recording', type=click.Choice(['full', 'low-fps', 'off']), default="full", help='Recording profile; low-fps and off save the recorder\'s CPU')
+def create_batch(count, env_type, resolution, tag, mount, kiosk, initial_url, workers, recording_format, recording):
+    """Create several sessions concurrently"""
+    manager = _open_manager()
+    sessions = manager.create_sessions(
+        count,
         env_type=env_type,
         resolution=resolution,
         tag=tag,
         mount_path=mount,
         kiosk=kiosk,
-        initial_url=initial_url
+        initial_url=initial_url,
+        max_workers=workers,
+        recording_format=recording_format,
+        recording=recording
     )
-    click.echo(json.dumps(session.__dict__, cls=DateTimeEncoder, indent=2))
+    click.echo(json.dumps([s.__dict__ for s in sessions], cls=DateTimeEncoder, indent=2))
+    if len(sessions) < count:
+        click.echo(f"Only {len(sessions)} out of {count} sessions were created", err=True)
+
+@local.command()
+@click.argument('session_id')
+@click.option('--count', type=click.IntRange(min=1), default=1, help='Number of clones to start')
+@click.option('--tag', help='Tag prefix; clones are tagged <tag>-<index>')
+@click.option('--workers', type=click.IntRange(min=1), default=8, help='Maximum number of containers started at the same time')
+def clone(session_id, count, tag, workers):
+    """Start sessions from a snapshot of a running browser session"""
+    manager = _open_manager()
+    try:
+        sessions = manager.clone_session(session_id, count, tag=tag, max_workers=workers)
+    except ValueError as e:
+        click.echo(str(e), err=True)
+        return
+    click.echo(json.dumps([s.__dict__ for s in sessions], cls=DateTimeEncoder, indent=2))
+    if len(sessions) < count:
+        click.echo(f"Only {len(sessions)} out of {count} clones were created", err=True)
 
 @local.command()
 def list():
     """List all active sessions"""
-    manager = LocalContainerManager()
+    manager = _open_manager()
     sessions = manager.list_sessions()
     click.echo(json.dumps([s.to_dict() for s in sessions], cls=DateTimeEncoder, indent=2))
 
@@ -49,7 +112,7 @@ def list():
 @click.argument('session_id')
 def get(session_id):
     """Get details for a specific session"""
-    manager = LocalContainerManager()
+    manager = _open_manager()
     session = manager.get_session(session_id)
     if session:
         click.echo(json.dumps(session.to_dict(), cls=DateTimeEncoder, indent=2))
@@ -62,19 +125,23 @@ def get(session_id):
 @click.option('--video-filename', help='Custom filename for video recording')
 def stop(session_id, video_dir, video_filename):
     """Stop a browser session"""
-    manager = LocalContainerManager(
+    manager = _open_manager(
         videos_path=Path(video_dir) if video_dir else None
     )
     success = manager.stop_session(session_id, video_filename=video_filename)
     if success:
         click.echo("Session stopped successfully")
+        # Export jobs run in this process, so wait for the recording before exiting
+        export_status = manager.wait_for_export(session_id)
+        if export_status == "failed":
+            click.echo(f"Failed to export video: {manager.get_closed_session(session_id).export_error}", err=True)
     else:
         click.echo("Failed to stop session", err=True)
 
 @local.command()
 def list_closed():
     """List all closed sessions"""
-    manager = LocalContainerManager()
+    manager = _open_manager()
     sessions = manager.list_closed_sessions()
     click.echo(json.dumps([s.__dict__ for s in sessions], cls=DateTimeEncoder, indent=2))
 
@@ -82,7 +149,7 @@ def list_closed():
 @click.argument('session_id')
 def get_closed(session_id):
     """Get details for a specific closed session"""
-    manager = LocalContainerManager()
+    manager = _open_manager()
     session = manager.get_closed_session(session_id)
     if session:
         data = session.__dict__.copy()
@@ -97,7 +164,7 @@ def get_closed(session_id):
 @click.argument('tag')
 def tag(session_id, tag):
     """Add or update tag for a session"""
-    manager = LocalContainerManager()
+    manager = _open_manager()
     session = manager.update_tag(session_id, tag)
     if session:
         click.echo(json.dumps(session.__dict__, cls=DateTimeEncoder, indent=2))
@@ -115,7 +182,8 @@ def set(anthropic_api_key):
 @local.command()
 @click.argument('session_identifier')
 @click.option('--command', required=True, help='Command to execute')
-def computer_use(session_identifier, command):
+@click.option('--reconcile', is_flag=True, default=False, help='Check Docker for stopped containers before looking up the session')
+def computer_use(session_identifier, command, reconcile):
     """Execute computer use command on a session"""
     # Check for API key
     config = Config()
@@ -125,35 +193,38 @@ def computer_use(session_identifier, command):
         return
 
     # Get session by ID or tag
-    manager = LocalContainerManager()
-    session = None
-    
-    # Try by ID first
-    session = manager.get_session(session_identifier)
-    
-    # If not found, try by tag
-    if not session:
-        sessions = manager.list_sessions()
-        matching_sessions = [s for s in sessions if s.tag == session_identifier]
-        if len(matching_sessions) == 1:
-            session = matching_sessions[0]
-        elif len(matching_sessions) > 1:
-            click.echo("Error: Multiple sessions found with this tag", err=True)
-            return
+    manager = _open_manager(reconcile=reconcile)
+    try:
+        session = manager.get_session_by_identifier(session_identifier)
+    except ValueError:
+        click.echo("Error: Multiple sessions found with this tag", err=True)
+        return
     
     if not session:
         click.echo("Error: No session found with this ID or tag", err=True)
         return
 
     
+    # Resume the session if it was paused for being idle
+    manager.record_activity(session.session_id)
+
     # Execute computer use command
-    responses = asyncio.run(computer_use_main(command, api_key, session.computer_use_port))
+    responses = asyncio.run(computer_use_main(command, api_key, session.computer_use_port, session.get_host()))
 
 @local.command()
-def stop_all():
+@click.option('--parallel', type=click.IntRange(min=1), default=8, help='Maximum number of sessions stopped at the same time')
+@click.option('--timings', is_flag=True, default=False, help='Print per-stage stop timings for each session')
+def stop_all(parallel, timings):
     """Stop all active browser and desktop sessions"""
-    manager = LocalContainerManager()
-    results = manager.stop_all_sessions()
+    manager = _open_manager()
+    results = manager.stop_all_sessions(max_workers=parallel)
+    failed_exports = [
+        session_id for session_id, result in results.items()
+        if result and manager.wait_for_export(session_id) == "failed"
+    ]
+
+    if timings:
+        click.echo(json.dumps({session_id: result.__dict__ for session_id, result in results.items()}, indent=2))
     
     success_count = sum(1 for success in results.values() if success)
     total_count = len(results)
@@ -164,3 +235,25 @@ def stop_all():
         click.echo(f"Successfully stopped {success_count} out of {total_count} sessions")
         if success_count < total_count:
             click.echo("Some sessions failed to stop", err=True)
+        if failed_exports:
+            click.echo(f"Failed to export videos of: {', '.join(failed_exports)}", err=True)
+
+@local.command()
+def recording_stats():
+    """Show the recorder's measured CPU cost per recording profile"""
+    manager = _open_manager()
+    click.echo(json.dumps(manager.recording_stats(), indent=2))
+
+@local.command()
+@click.option('--budget', help='Disk space to keep recordings within, e.g. 200g')
+@click.option('--max-age', type=float, help='Delete recordings this many seconds after their session closed')
+@click.option('--archive-after', type=float, help='Re-encode recordings not viewed for this many seconds to a compact MP4')
+def prune(budget, max_age, archive_after):
+    """Apply a video retention policy to closed sessions once"""
+    if budget is None and max_age is None and archive_after is None:
+        click.echo("Give at least one of --budget, --max-age and --archive-after", err=True)
+        return
+    manager = _open_manager()
+    retention = RetentionManager(manager, budget=budget, max_age=max_age, archive_after=archive_after)
+    retention.enforce()
+    click.echo(json.dumps(retention.stats(), indent=2))
@@ -1,150 +1,551 @@
 import docker
-import requests
 import time
-import pickle
 import os
+import socket
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 from datetime import datetime, timezone
 
-from .models import BrowserSession
+from .admission import AdmissionController, Admission, ResourceProfile, DEFAULT_RESOURCE_PROFILES
+from .models import BrowserSession, StopResult
+from .preview import PreviewBuilder, load_index
+from .retention import RetentionManager
+from .pool import WarmPool, PooledContainer, POOL_LABEL
+from .ports import PORT_CONFLICT_RETRIES, PortAllocator, is_port_conflict
+from .readiness import ReadinessResult, wait_until_ready
+from .store import SessionStore, SQLiteSessionStore, ACTIVE_STATUSES, migrate_pickles
+from .reconciler import EventReconciler
+from .idle import IdleReaper
+from .placement import DockerHost, Placement, LOCAL_HOST, parse_docker_hosts
+from .recording import VideoSink, LocalFileSink, copy_from_container
+from .snapshot import current_url, snapshot_container
+from .export import ExportQueue
+from .logstore import StructuredLogWriter
+from .inputqueue import InputQueue, VISIBILITY_TIMEOUT
+from .segments import (
+    MP4_PATH, PLAYLIST_NAME, RECORDING_FORMATS, RECORDING_PROFILES, STOP_FFMPEG_CMD, STOP_RECORDER_CMD, SegmentSyncer,
+    detect_display, mp4_recorder_command, profile_framerate, recorder_cpu_seconds, recording_environment,
+    segmented_recorder_command
+)
+
+def _process_alive(process_id: str) -> bool:
+    """
+    Whether a "<hostname>:<pid>" identifier refers to a running process.
+
+    Processes on other hosts are assumed to be alive.
+    """
+    hostname, _, pid = process_id.rpartition(":")
+    if hostname != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
 
 class LocalContainerManager:
-    def __init__(self, base_debug_port: int = 4002, base_vnc_port: int = 5002, base_computer_use_port: int = 8002, videos_path: Optional[Path] = None):
-        self.client = docker.from_env()
+    def __init__(
+        self,
+        base_debug_port: int = 4002,
+        base_vnc_port: int = 5002,
+        base_computer_use_port: int = 8002,
+        videos_path: Optional[Path] = None,
+        warm_pool: Optional[Dict[Tuple[str, str], int]] = None,
+        ready_timeout: float = 30.0,
+        video_sink: Optional[VideoSink] = None,
+        session_store: Optional[SessionStore] = None,
+        reconcile: bool = True,
+        watch_events: bool = False,
+        resource_profiles: Optional[Dict[str, ResourceProfile]] = None,
+        admission: bool = True,
+        admission_timeout: float = 60.0,
+        overcommit: float = 1.0,
+        idle_timeout: Optional[float] = None,
+        idle_ttl: Optional[float] = None,
+        docker_hosts: Optional[List[DockerHost]] = None,
+        previews: bool = True,
+        resume_exports: bool = False,
+        video_budget: Optional[Union[int, str]] = None,
+        video_max_age: Optional[float] = None,
+        archive_after: Optional[float] = None
+    ):
+        """
+        Args:
+            warm_pool: Optional mapping of (env_type, resolution) to the number of
+                containers to keep booted in the background, e.g.
+                {("browser", "1280x800x24"): 2}
+            ready_timeout: Maximum seconds to wait for a new container's endpoints to answer
+            video_sink: Where recordings are written on stop, defaults to files in videos_path
+            session_store: Where sessions are persisted, defaults to ~/.marinabox/sessions.db
+            reconcile: Check Docker for containers that have gone away while loading sessions
+            watch_events: Follow the Docker events stream in the background and serve
+                reads from memory instead of listing containers on every read
+            resource_profiles: CPU, memory, shm and pids limits per env_type, merged over
+                DEFAULT_RESOURCE_PROFILES
+            admission: Only start containers while the profiles of running containers fit
+                within the host's CPUs and memory
+            admission_timeout: Seconds a new session may wait for capacity before it is rejected
+            overcommit: Factor applied to the host's CPUs and memory when admitting containers
+            idle_timeout: Pause sessions without computer-use or console activity for this
+                many seconds; they are resumed on the next computer-use request
+            idle_ttl: Stop sessions without activity for this many seconds
+            docker_hosts: Docker daemons to place sessions on, defaults to the hosts in
+                MARINABOX_DOCKER_HOSTS or else the local daemon
+            previews: Build a thumbnail strip and keyframe index of each recording after
+                its session stops, when ffmpeg and ffprobe are installed
+            resume_exports: Queue the recordings of stopped sessions whose export was
+                interrupted, e.g. by a restart. Enable it in one long-running process only
+            video_budget: Disk space for closed sessions' recordings, e.g. "200g"; the least
+                recently viewed recordings are deleted beyond it
+            video_max_age: Delete recordings this many seconds after their session closed
+            archive_after: Re-encode recordings that have not been viewed for this many
+                seconds to a compact archival MP4, when ffmpeg is installed
+        """
+        hosts = docker_hosts or parse_docker_hosts(os.environ.get("MARINABOX_DOCKER_HOSTS"))
+        if not hosts:
+            hosts = [DockerHost(LOCAL_HOST, client=docker.from_env())]
         self.base_debug_port = base_debug_port
         self.base_vnc_port = base_vnc_port
         self.base_computer_use_port = base_computer_use_port
+        self.ready_timeout = ready_timeout
+        self.resource_profiles = {**DEFAULT_RESOURCE_PROFILES, **(resource_profiles or {})}
+        self.placement = Placement(hosts, self.resource_profiles)
+        self.client = self.placement.default.client
         self.sessions = {}
-        self.closed_sessions = {}
-        self.storage_path = Path.home() / ".marinabox" / "sessions.pkl"
-        self.closed_storage_path = Path.home() / ".marinabox" / "closed_sessions.pkl"
+        self.storage_path = Path.home() / ".marinabox" / "sessions.db"
+        self._owns_store = session_store is None
+        self.store = session_store or SQLiteSessionStore(self.storage_path)
+        migrate_pickles(
+            self.store,
+            Path.home() / ".marinabox" / "sessions.pkl",
+            Path.home() / ".marinabox" / "closed_sessions.pkl"
+        )
         self.videos_path = videos_path or (Path.home() / ".marinabox" / "videos")
         self.videos_path.mkdir(parents=True, exist_ok=True)
+        self.video_sink = video_sink or LocalFileSink(self.videos_path)
         self.console_logs_path = Path("marinabox/data/console_logs")
         self.console_logs_path.mkdir(parents=True, exist_ok=True)
+        self.logs = StructuredLogWriter(Path.home() / ".marinabox" / "logs", console_log_path=self.get_console_log_path)
         self.input_queue_path = Path("marinabox/data/input_queue")
         self.input_queue_path.mkdir(parents=True, exist_ok=True)
-        self._load_sessions()
-        self._load_closed_sessions()
+        self.input_queue = InputQueue(Path.home() / ".marinabox" / "input_queue.db")
+        self._lock = threading.RLock()
+        self._tag_index: Dict[str, set] = {}
+        self._stopping = set()
+        self._held: Dict[str, List[Callable[[], None]]] = {}
+        self.admission = None
+        self.pool = None
+        self.reconcilers: List[EventReconciler] = []
+        self.idle_reaper = None
+        self.segment_syncer = SegmentSyncer(self)
+        self.previews = PreviewBuilder(self) if previews else None
+        self.exports = ExportQueue(self)
+        self.retention = None
+        self._viewed: Dict[str, float] = {}
+        self._process_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.port_allocator = PortAllocator(
+            Path.home() / ".marinabox" / "ports.json",
+            bases={"debug": base_debug_port, "vnc": base_vnc_port, "computer_use": base_computer_use_port},
+            # Probing ports on this machine only tells something about a local daemon
+            probe=any(host.is_local for host in hosts)
+        )
+        self._load_sessions(verify_containers=reconcile)
+        if reconcile:
+            self.port_allocator.release_owners(self._port_owner_is_stale)
+        if admission:
+            # Capacity is admitted across the whole fleet, placement spreads it over the hosts
+            self.admission = AdmissionController(
+                self.placement.total_cpus,
+                self.placement.total_memory,
+                self._committed_profiles,
+                overcommit=overcommit,
+                queue_timeout=admission_timeout
+            )
+        if watch_events:
+            for host in self.placement.hosts.values():
+                reconciler = EventReconciler(self, host.client)
+                reconciler.start()
+                self.reconcilers.append(reconciler)
+        if warm_pool:
+            self._remove_orphaned_pool_containers()
+            self.pool = WarmPool(self, warm_pool)
+            self.pool.start()
+        if idle_timeout is not None or idle_ttl is not None:
+            self.idle_reaper = IdleReaper(self, idle_timeout=idle_timeout, ttl=idle_ttl)
+            self.idle_reaper.start()
+        if video_budget is not None or video_max_age is not None or archive_after is not None:
+            self.retention = RetentionManager(
+                self, budget=video_budget, max_age=video_max_age, archive_after=archive_after
+            )
+            self.retention.start()
+        if resume_exports:
+            for session in self.store.list(active=False):
+                if session.export_status in ("pending", "copying"):
+                    session.export_status = "pending"
+                    self._queue_export(session)
 
-    def _ensure_storage_dir(self):
-        """Ensure the storage directory exists"""
-        self.storage_path.parent.mkdir(parents=True, exist_ok=True)
-        
-    def _save_sessions(self):
-        """Save sessions to disk"""
-        self._ensure_storage_dir()
-        with open(self.storage_path, 'wb') as f:
-            pickle.dump(self.sessions, f)
-            
-    def _load_sessions(self):
-        """Load sessions from disk and verify they still exist"""
+    def _load_sessions(self, verify_containers: bool = True):
+        """Load active sessions from the store and mark those whose container is gone as stale"""
         try:
-            if self.storage_path.exists():
-                with open(self.storage_path, 'rb') as f:
-                    self.sessions = pickle.load(f)
-                    
-                # Verify containers still exist and remove stale sessions
-                active_containers = {c.id for c in self.client.containers.list()}
+            sessions = {session.session_id: session for session in self.store.list(active=True)}
+                
+            # Verify containers still exist and close stale sessions
+            stale_sessions = []
+            if verify_containers:
+                active_containers = {}
+                for name, host in self.placement.hosts.items():
+                    try:
+                        active_containers[name] = {c.id for c in host.client.containers.list()}
+                    except Exception as e:
+                        print(f"Error listing containers on {name}: {e}")
+                # Sessions on hosts this manager does not know about, or cannot reach, are left alone
                 stale_sessions = [
-                    session_id for session_id, session in self.sessions.items()
-                    if session.container_id not in active_containers
+                    session for session in sessions.values()
+                    if self._host_name(session) in active_containers
+                    and session.container_id not in active_containers[self._host_name(session)]
                 ]
-                for session_id in stale_sessions:
-                    del self.sessions[session_id]
-                
-                if stale_sessions:
-                    self._save_sessions()
+            for session in stale_sessions:
+                del sessions[session.session_id]
+                self._close_gone_session(session, "stale")
+            
+            if stale_sessions:
+                self.store.put_many(stale_sessions)
         except Exception as e:
             print(f"Error loading sessions: {e}")
-            self.sessions = {}
-    
-    def _find_available_ports(self, env_type: str) -> tuple[Optional[int], int, int]:
-        used_vnc_ports = {session.vnc_port for session in self.sessions.values()}
-        used_computer_use_ports = {session.computer_use_port for session in self.sessions.values()}
-        
-        if env_type == 'browser':
-            used_debug_ports = {session.debug_port for session in self.sessions.values() if session.debug_port is not None}
-            debug_port = self.base_debug_port
-            while debug_port in used_debug_ports:
-                debug_port += 2
-        else:
-            debug_port = None
-            
-        vnc_port = self.base_vnc_port
-        while vnc_port in used_vnc_ports:
-            vnc_port += 2
+            sessions = {}
+        with self._lock:
+            self.sessions = sessions
+            self._tag_index = {}
+            for session in sessions.values():
+                self._index_tag(session)
+        # Sessions recording segments may have been started by another process or before a restart
+        self._start_segment_sync(sessions.values())
 
-        computer_use_port = self.base_computer_use_port
-        while computer_use_port in used_computer_use_ports:
-            computer_use_port += 2
-            
-        return debug_port, vnc_port, computer_use_port
+    def _start_segment_sync(self, sessions: Iterable[BrowserSession]):
+        if any(session.recording_format == "hls" and session.recording != "off" for session in sessions):
+            self.segment_syncer.start()
+
+    def _host_name(self, session: BrowserSession) -> str:
+        """Name of the Docker host running a session, sessions created before placement run on the default host"""
+        return session.docker_host or self.placement.default.name
+
+    def _container_for(self, session: BrowserSession):
+        """Get a session's container from the Docker host it was placed on"""
+        return self.placement.get(self._host_name(session)).client.containers.get(session.container_id)
+
+    def _close_gone_session(self, session: BrowserSession, status: str):
+        """Record that a session's container went away without going through stop_session"""
+        session.status = status
+        session.closed_at = datetime.now(timezone.utc)
+        session.runtime_seconds = (session.closed_at - session.created_at).total_seconds()
+        self._release_ports((session.debug_port, session.vnc_port, session.computer_use_port))
+        self._capacity_freed()
+
+    def _mark_container_gone(self, container_id: str, status: str):
+        """Close the active session running in a container that died or was removed"""
+        with self._lock:
+            session = next(
+                (s for s in self.sessions.values() if s.container_id == container_id), None
+            )
+            if session is None or session.session_id in self._stopping:
+                return
+            del self.sessions[session.session_id]
+            self._unindex_tag(session)
+        self._close_gone_session(session, status)
+        self.store.put(session)
+
+    def _refresh_from_store(self):
+        """Pick up sessions created or changed by other processes without asking Docker"""
+        if self.store.has_external_changes():
+            self._load_sessions(verify_containers=False)
+
+    def _index_tag(self, session: BrowserSession):
+        if session.tag:
+            self._tag_index.setdefault(session.tag, set()).add(session.session_id)
+
+    def _unindex_tag(self, session: BrowserSession):
+        session_ids = self._tag_index.get(session.tag)
+        if session_ids is not None:
+            session_ids.discard(session.session_id)
+            if not session_ids:
+                del self._tag_index[session.tag]
+
+    def reconcile(self):
+        """Re-read active sessions from the store and drop those whose container is gone"""
+        self._load_sessions()
     
-    def create_session(
-        self, 
-        env_type: str = "browser", 
-        resolution: str = "1280x800x24", 
-        tag: Optional[str] = None, 
-        mount_path: Optional[Path] = None,
+    def _port_owner_is_stale(self, owner: str) -> bool:
+        """Whether a port reservation belongs to a session or process that no longer exists"""
+        kind, _, process = owner.partition(":")
+        if kind in ("pending", "pool"):
+            return not _process_alive(process)
+        return owner not in self.sessions
+
+    def _reserve_ports(self, env_type: str, count: int = 1, owner: Optional[str] = None) -> List[tuple[Optional[int], int, int]]:
+        """Atomically reserve port triples for count containers"""
+        return self.port_allocator.allocate(env_type, owner or f"pending:{self._process_id}", count)
+
+    def _release_ports(self, ports: tuple[Optional[int], int, int], busy: bool = False):
+        """Return ports to the allocator"""
+        self.port_allocator.release(ports, busy=busy)
+
+    def _committed_profiles(self) -> List[ResourceProfile]:
+        """Resource profiles of the active sessions and warm pool containers"""
+        env_types = [env_type for env_types in self._env_types_by_host().values() for env_type in env_types]
+        return [self.resource_profiles[env_type] for env_type in env_types]
+
+    def _env_types_by_host(self) -> Dict[str, List[str]]:
+        """env_type of every active session and warm pool container, grouped by Docker host"""
+        by_host: Dict[str, List[str]] = {}
+        with self._lock:
+            for session in self.sessions.values():
+                by_host.setdefault(self._host_name(session), []).append(session.env_type)
+        if self.pool is not None:
+            for entry in self.pool.ready_containers():
+                by_host.setdefault(entry.docker_host or self.placement.default.name, []).append(entry.env_type)
+        return by_host
+
+    def _place(self, env_type: str, docker_host: Optional[str] = None) -> DockerHost:
+        """Pick the least-loaded Docker host, or reserve a slot on the given one"""
+        candidates = [docker_host] if docker_host else None
+        return self.placement.choose(self._env_types_by_host(), candidates=candidates, env_type=env_type)
+
+    def _admit(self, env_type: str, timeout: Optional[float] = None) -> Optional[Admission]:
+        """Wait for capacity to start a container, or return None when admission control is off"""
+        if self.admission is None:
+            return None
+        return self.admission.admit(self.resource_profiles[env_type], timeout=timeout)
+
+    def _capacity_freed(self):
+        if self.admission is not None:
+            self.admission.notify()
+
+    def _run_container(
+        self,
+        env_type: str,
+        resolution: str,
+        ports: tuple[Optional[int], int, int],
+        volumes: Optional[dict] = None,
         kiosk: bool = False,
-        initial_url: Optional[str] = None
-    ) -> BrowserSession:
-        if env_type not in ["browser", "desktop"]:
-            raise ValueError("env_type must be either 'browser' or 'desktop'")
+        initial_url: Optional[str] = None,
+        labels: Optional[Dict[str, str]] = None,
+        image: Optional[str] = None,
+        host: Optional[DockerHost] = None,
+        recording: str = "full"
+    ):
+        """Start a container bound to previously reserved ports, from the env_type's image unless one is given"""
+        debug_port, vnc_port, computer_use_port = ports
 
-        debug_port, vnc_port, computer_use_port = self._find_available_ports(env_type)
-        
         # Configure ports based on environment type
-        ports = {
+        port_bindings = {
             '6081/tcp': vnc_port,
             '8000/tcp': computer_use_port
         }
         if env_type == 'browser':
-            ports['9222/tcp'] = debug_port
-        
-        # Configure volume mounting
-        volumes = {}
-        if mount_path:
-            mount_path = Path(mount_path).resolve()
-            if not mount_path.exists():
-                raise ValueError(f"Mount path does not exist: {mount_path}")
-            volumes[str(mount_path)] = {
-                'bind': '/mnt/host',
-                'mode': 'rw'
-            }
-        
+            port_bindings['9222/tcp'] = debug_port
+
         # Select appropriate image
-        image = "marinabox/marinabox-browser" if env_type == "browser" else "marinabox/marinabox-desktop"
-        print(f"Initial URL: {initial_url}")
+        if image is None:
+            image = "marinabox/marinabox-browser" if env_type == "browser" else "marinabox/marinabox-desktop"
         # Add environment variables
         environment_vars = {
             "RESOLUTION": resolution,
             "KIOSK_OPTS": "--kiosk --start-fullscreen" if kiosk and env_type == "browser" else "",
-            "INITIAL_URL": initial_url if initial_url else ""
+            "INITIAL_URL": initial_url if initial_url else "",
+            **recording_environment(recording)
         }
-        
-        container = self.client.containers.run(
+
+        client = host.client if host is not None else self.client
+        return client.containers.run(
             image,
             detach=True,
             environment=environment_vars,
-            ports=ports,
-            volumes=volumes
+            ports=port_bindings,
+            volumes=volumes or {},
+            labels=labels or {},
+            **self.resource_profiles[env_type].run_kwargs()
         )
-        
-        
-        # Wait for container to be ready
-        time.sleep(2)
-        
-        # Get WebSocket URL only for browser environment
-        websocket_url = None
-        if env_type == 'browser':
+
+    def _wait_until_ready(
+        self, env_type: str, debug_port: Optional[int], vnc_port: int, computer_use_port: int, address: str = "127.0.0.1"
+    ) -> ReadinessResult:
+        """Wait for the container's endpoints to come up"""
+        result = wait_until_ready(
+            env_type,
+            vnc_port=vnc_port,
+            computer_use_port=computer_use_port,
+            debug_port=debug_port,
+            host=address,
+            timeout=self.ready_timeout
+        )
+        if not result.ready:
+            pending = [name for name, elapsed in result.ready_times.items() if elapsed is None]
+            print(f"Warning: endpoints not ready after {self.ready_timeout}s: {', '.join(pending)}")
+        return result
+
+    def _start_pooled_container(self, env_type: str, resolution: str) -> PooledContainer:
+        """
+        Boot a container for the warm pool and wait until it is ready to be claimed.
+
+        The container's ports stay reserved for the pool until it is claimed or removed.
+        """
+        # Never queue for capacity on behalf of the pool
+        admission = self._admit(env_type, timeout=0)
+        host = self._place(env_type)
+        try:
+            ports = self._reserve_ports(env_type, owner=f"pool:{self._process_id}")[0]
+            debug_port, vnc_port, computer_use_port = ports
+            try:
+                container = self._run_container(
+                    env_type, resolution, ports, labels={POOL_LABEL: self._process_id}, host=host
+                )
+            except Exception:
+                self._release_ports(ports)
+                raise
+            try:
+                readiness = self._wait_until_ready(env_type, debug_port, vnc_port, computer_use_port, host.address)
+            except Exception:
+                container.remove(force=True)
+                self._release_ports(ports)
+                raise
+        finally:
+            self.placement.release(host, env_type)
+            if admission is not None:
+                admission.release()
+        return PooledContainer(
+            container=container,
+            env_type=env_type,
+            resolution=resolution,
+            debug_port=debug_port,
+            vnc_port=vnc_port,
+            computer_use_port=computer_use_port,
+            websocket_url=readiness.websocket_url,
+            ready_times=readiness.ready_times,
+            docker_host=host.name
+        )
+
+    def _remove_orphaned_pool_containers(self):
+        """Remove pool containers left behind by a process on this host that is no longer running"""
+        claimed = {session.container_id for session in self.sessions.values()}
+        for host in self.placement.hosts.values():
+            try:
+                for container in host.client.containers.list(all=True, filters={"label": POOL_LABEL}):
+                    if container.id in claimed or _process_alive(container.labels.get(POOL_LABEL, "")):
+                        continue
+                    container.remove(force=True)
+            except Exception as e:
+                print(f"Error removing orphaned pool containers on {host.name}: {e}")
+    
+    def _resolve_volumes(self, mount_path: Optional[Path]) -> dict:
+        """Build the docker volume mapping for an optional host mount"""
+        volumes = {}
+        if mount_path:
+            mount_path = Path(mount_path).resolve()
+            if not mount_path.exists():
+                raise ValueError(f"Mount path does not exist: {mount_path}")
+            volumes[str(mount_path)] = {
+                'bind': '/mnt/host',
+                'mode': 'rw'
+            }
+        return volumes
+
+    def _launch_session(
+        self,
+        env_type: str,
+        resolution: str,
+        tag: Optional[str],
+        volumes: dict,
+        kiosk: bool,
+        initial_url: Optional[str],
+        ports: tuple[Optional[int], int, int],
+        image: Optional[str] = None,
+        docker_host: Optional[str] = None,
+        recording_format: str = "mp4",
+        recording: str = "full"
+    ) -> BrowserSession:
+        """
+        Claim a pooled container or start a new one on the reserved ports and wait until it is ready.
+
+        New containers go to the least-loaded Docker host unless docker_host pins one.
+        The returned session is not yet registered in self.sessions. The reservation is
+        released if it ends up unused or the launch fails.
+        """
+        started = time.monotonic()
+
+        # Pooled containers are started from the stock image without mounts, kiosk mode or an initial URL
+        pooled = None
+        poolable = (
+            self.pool is not None and not volumes and not kiosk and not initial_url and image is None and docker_host is None
+        )
+        if poolable:
+            pooled = self.pool.claim(env_type, resolution)
+
+        admission = None
+        if pooled is not None:
+            self._release_ports(ports)
+            host = self.placement.get(pooled.docker_host)
+            container = pooled.container
+            debug_port, vnc_port, computer_use_port = pooled.debug_port, pooled.vnc_port, pooled.computer_use_port
+            websocket_url = pooled.websocket_url
+            ready_times = pooled.ready_times
+        else:
+            # Pooled containers are already counted, new ones wait for capacity
+            debug_port, vnc_port, computer_use_port = ports
+            host = None
+            try:
+                admission = self._admit(env_type)
+                host = self._place(env_type, docker_host)
+                for attempt in range(PORT_CONFLICT_RETRIES + 1):
+                    try:
+                        container = self._run_container(
+                            env_type, resolution, ports, volumes=volumes, kiosk=kiosk, initial_url=initial_url,
+                            image=image, host=host, recording=recording
+                        )
+                        break
+                    except docker.errors.APIError as e:
+                        if attempt == PORT_CONFLICT_RETRIES or not is_port_conflict(e):
+                            raise
+                        # Something on the Docker host holds a port the reservation table does not know about
+                        busy, ports = ports, self._reserve_ports(env_type)[0]
+                        self._release_ports(busy, busy=True)
+                        debug_port, vnc_port, computer_use_port = ports
+            except Exception:
+                if host is not None:
+                    self.placement.release(host, env_type)
+                if admission is not None:
+                    admission.release()
+                self._release_ports(ports)
+                raise
+            try:
+                readiness = self._wait_until_ready(env_type, debug_port, vnc_port, computer_use_port, host.address)
+            except Exception:
+                container.remove(force=True)
+                self.placement.release(host, env_type)
+                if admission is not None:
+                    admission.release()
+                self._release_ports(ports)
+                raise
+            websocket_url = readiness.websocket_url
+            ready_times = readiness.ready_times
+
+        # Pooled containers and images that ignore RECORDING run the default recorder
+        if recording_format == "hls" or recording != "full":
             try:
-                response = requests.get(f"http://127.0.0.1:{debug_port}/json/version")
-                websocket_url = response.json().get("webSocketDebuggerUrl")
-            except:
-                websocket_url = None
+                self._configure_recording(container, resolution, recording_format, recording)
+            except Exception:
+                container.remove(force=True)
+                if pooled is None:
+                    self.placement.release(host, env_type)
+                    if admission is not None:
+                        admission.release()
+                self._release_ports((debug_port, vnc_port, computer_use_port))
+                raise
             
         session = BrowserSession(
             session_id=container.id[:12],
@@ -156,114 +557,612 @@ class LocalContainerManager:
             websocket_url=websocket_url,
             resolution=resolution,
             env_type=env_type,
-            tag=tag
+            tag=tag,
+            ready_times=ready_times,
+            snapshot_image=image,
+            queue_wait_seconds=admission.wait_seconds if admission is not None else None,
+            docker_host=host.name,
+            host=host.address,
+            recording_format=recording_format,
+            recording=recording
         )
-        
-        self.sessions[session.session_id] = session
-        self._save_sessions()
-        
-        # Create empty console log file for the session
-        console_log_file = self.console_logs_path / f"{session.session_id}.txt"
-        console_log_file.touch()
-        
-        # Create empty input queue file for the session
-        input_queue_file = self.input_queue_path / f"{session.session_id}.txt"
-        input_queue_file.touch()
-        
+        if pooled is None:
+            # Capacity and the placement slot are held until the session is registered and counted as running
+            held = [functools.partial(self.placement.release, host, env_type)]
+            if admission is not None:
+                held.append(admission.release)
+            with self._lock:
+                self._held[session.session_id] = held
+
+        if poolable:
+            self.pool.record_claim(pooled is not None, time.monotonic() - started)
+
         return session
+
+    def _configure_recording(self, container, resolution: str, recording_format: str, recording: str):
+        """
+        Replace the image's full-rate MP4 recorder: stop it when recording is off, otherwise
+        start one at the profile's frame rate writing HLS segments or an MP4.
+        """
+        display = detect_display(container)
+        container.exec_run(STOP_FFMPEG_CMD)
+        if recording == "off":
+            return
+        framerate = profile_framerate(recording)
+        if recording_format == "hls":
+            command = segmented_recorder_command(display, resolution, framerate)
+        else:
+            command = mp4_recorder_command(display, resolution, framerate)
+        result = container.exec_run(["sh", "-c", command])
+        if result.exit_code != 0:
+            raise RuntimeError(f"Could not start recording: {result.output!r}")
+
+    def _validate_recording(self, recording_format: str, recording: str):
+        if recording_format not in RECORDING_FORMATS:
+            raise ValueError(f"recording_format must be one of {', '.join(RECORDING_FORMATS)}")
+        if recording not in RECORDING_PROFILES:
+            raise ValueError(f"recording must be one of {', '.join(RECORDING_PROFILES)}")
+
+    def get_segments_path(self, session_id: str) -> Path:
+        """Directory a session's HLS playlist and segments are synced to"""
+        return self.videos_path / session_id
+
+    def _register_sessions(self, sessions: List[BrowserSession]):
+        """Add freshly created sessions to the store and create their log and input files"""
+        with self._lock:
+            held = []
+            for session in sessions:
+                self.sessions[session.session_id] = session
+                self._index_tag(session)
+                held.extend(self._held.pop(session.session_id, ()))
+        for release in held:
+            release()
+        self.store.put_many(sessions)
+        self._start_segment_sync(sessions)
+
+        for session in sessions:
+            self.port_allocator.assign(
+                (session.debug_port, session.vnc_port, session.computer_use_port), session.session_id
+            )
+
+            # Create empty console log file for the session
+            console_log_file = self.console_logs_path / f"{session.session_id}.txt"
+            console_log_file.touch()
+            
+            # Create empty input queue file for the session
+            input_queue_file = self.input_queue_path / f"{session.session_id}.txt"
+            input_queue_file.touch()
+    
+    def create_session(
+        self, 
+        env_type: str = "browser", 
+        resolution: str = "1280x800x24", 
+        tag: Optional[str] = None, 
+        mount_path: Optional[Path] = None,
+        kiosk: bool = False,
+        initial_url: Optional[str] = None,
+        recording_format: str = "mp4",
+        recording: str = "full"
+    ) -> BrowserSession:
+        """
+        Create a session. With recording_format "hls" the screen is recorded as fMP4
+        segments that are synced to the host while the session runs. recording selects
+        the profile: "full", "low-fps" for a fraction of the recorder's CPU, or "off".
+        """
+        if env_type not in ["browser", "desktop"]:
+            raise ValueError("env_type must be either 'browser' or 'desktop'")
+        self._validate_recording(recording_format, recording)
+
+        volumes = self._resolve_volumes(mount_path)
+        print(f"Initial URL: {initial_url}")
+        ports = self._reserve_ports(env_type)[0]
+        session = self._launch_session(
+            env_type, resolution, tag, volumes, kiosk, initial_url, ports,
+            recording_format=recording_format, recording=recording
+        )
+        self._register_sessions([session])
+        return session
+
+    def create_sessions(
+        self,
+        count: int,
+        env_type: str = "browser",
+        resolution: str = "1280x800x24",
+        tag: Optional[str] = None,
+        mount_path: Optional[Path] = None,
+        kiosk: bool = False,
+        initial_url: Optional[str] = None,
+        max_workers: int = 8,
+        recording_format: str = "mp4",
+        recording: str = "full"
+    ) -> List[BrowserSession]:
+        """
+        Create several sessions concurrently.
+
+        Ports for the whole batch are reserved up front, containers are started by a
+        bounded worker pool and the session store is written once at the end.
+        When a tag is given, each session is tagged "<tag>-<index>".
+
+        Returns:
+            List of the sessions that were created successfully
+        """
+        if env_type not in ["browser", "desktop"]:
+            raise ValueError("env_type must be either 'browser' or 'desktop'")
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        self._validate_recording(recording_format, recording)
+
+        volumes = self._resolve_volumes(mount_path)
+        sessions = self._launch_batch(
+            count, env_type, resolution, tag, volumes, kiosk, initial_url, max_workers,
+            recording_format=recording_format, recording=recording
+        )
+        if sessions:
+            self._register_sessions(sessions)
+        return sessions
+
+    def _launch_batch(
+        self,
+        count: int,
+        env_type: str,
+        resolution: str,
+        tag: Optional[str],
+        volumes: dict,
+        kiosk: bool,
+        initial_url: Optional[str],
+        max_workers: int,
+        image: Optional[str] = None,
+        docker_host: Optional[str] = None,
+        recording_format: str = "mp4",
+        recording: str = "full"
+    ) -> List[BrowserSession]:
+        """Launch count sessions on a bounded worker pool, returning the unregistered sessions that started"""
+        reservations = self._reserve_ports(env_type, count)
+        tags = [f"{tag}-{index}" if tag else None for index in range(count)]
+
+        sessions = []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, count))) as executor:
+            futures = [
+                executor.submit(
+                    self._launch_session, env_type, resolution, session_tag, volumes, kiosk, initial_url, ports,
+                    image, docker_host, recording_format, recording
+                )
+                for session_tag, ports in zip(tags, reservations)
+            ]
+            for future in futures:
+                try:
+                    sessions.append(future.result())
+                except Exception as e:
+                    print(f"Error creating session: {e}")
+        return sessions
+
+    def snapshot_session(self, session_id: str) -> str:
+        """
+        Snapshot a running browser session's filesystem, including its Chrome profile.
+
+        The image is tagged with the hash of the profile contents, so snapshotting an
+        unchanged profile again reuses the existing image.
+
+        Returns:
+            The snapshot image reference
+
+        Raises:
+            ValueError: If the session is not an active browser session
+        """
+        session = self.get_session(session_id)
+        if not session:
+            raise ValueError(f"No active session found with ID: {session_id}")
+        if session.env_type != "browser":
+            raise ValueError("Only browser sessions can be snapshotted")
+        with self._unpaused(session):
+            return self._snapshot(session)
+
+    def _snapshot(self, session: BrowserSession) -> str:
+        container = self._container_for(session)
+        return snapshot_container(self.placement.get(self._host_name(session)).client, container)
+
+    @contextmanager
+    def _unpaused(self, session: BrowserSession):
+        """Let a paused session's processes run for the duration of the block, then freeze them again"""
+        if session.status != "paused":
+            yield
+            return
+        container = self._container_for(session)
+        container.unpause()
+        try:
+            yield
+        finally:
+            try:
+                container.pause()
+            except Exception as e:
+                print(f"Error pausing session again: {e}")
+
+    def clone_session(
+        self,
+        session_id: str,
+        count: int = 1,
+        tag: Optional[str] = None,
+        max_workers: int = 8
+    ) -> List[BrowserSession]:
+        """
+        Start sessions from a snapshot of a running browser session.
+
+        Clones keep the source's cookies, local storage and filesystem and open on the
+        page the source is showing. When a tag is given, each clone is tagged "<tag>-<index>".
+
+        Returns:
+            List of the clones that were created successfully
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        source = self.get_session(session_id)
+        if not source:
+            raise ValueError(f"No active session found with ID: {session_id}")
+        if source.env_type != "browser":
+            raise ValueError("Only browser sessions can be snapshotted")
+        # A paused source cannot run the profile lookup or answer CDP, so thaw it meanwhile
+        with self._unpaused(source):
+            image = self._snapshot(source)
+            initial_url = current_url(source.debug_port, source.get_host())
+        # The snapshot image only exists on the source's Docker host
+        sessions = self._launch_batch(
+            count, source.env_type, source.resolution, tag, {}, False, initial_url, max_workers,
+            image=image, docker_host=self._host_name(source),
+            recording_format=source.recording_format, recording=source.recording
+        )
+        for session in sessions:
+            session.cloned_from = source.session_id
+        if sessions:
+            self._register_sessions(sessions)
+        return sessions
+
+    def admission_stats(self) -> Optional[dict]:
+        """Return committed host capacity, queue length and queue wait times, or None if admission control is off"""
+        return self.admission.stats() if self.admission is not None else None
+
+    def placement_stats(self) -> dict:
+        """Return each Docker host's address, capacity and active sessions"""
+        stats = self.placement.stats()
+        for name, env_types in self._env_types_by_host().items():
+            if name in stats:
+                stats[name]["containers"] = len(env_types)
+        return stats
+
+    def recording_stats(self) -> Dict[str, dict]:
+        """
+        Return the recorder's measured CPU cost per recording profile, over closed sessions.
+
+        cpu_cores is the recorder's CPU seconds per second of session runtime, i.e. the
+        average number of cores a session's recording occupies.
+        """
+        totals = {profile: {"sessions": 0, "cpu_seconds": 0.0, "runtime_seconds": 0.0} for profile in RECORDING_PROFILES}
+        for session in self.store.list(active=False):
+            if session.recorder_cpu_seconds is None or session.recording not in totals:
+                continue
+            profile = totals[session.recording]
+            profile["sessions"] += 1
+            profile["cpu_seconds"] += session.recorder_cpu_seconds
+            profile["runtime_seconds"] += session.runtime_seconds or 0.0
+        for profile in totals.values():
+            profile["cpu_cores"] = (
+                profile["cpu_seconds"] / profile["runtime_seconds"] if profile["runtime_seconds"] else None
+            )
+        return totals
+
+    def record_view(self, session_id: str):
+        """Note that a closed session's recording was requested, at most once a minute per session"""
+        now = time.monotonic()
+        if now - self._viewed.get(session_id, float("-inf")) < 60:
+            return
+        self._viewed[session_id] = now
+        session = self.get_closed_session(session_id)
+        if session is not None:
+            session.last_viewed_at = datetime.now(timezone.utc)
+            self.store.put(session)
+
+    def retention_stats(self) -> Optional[dict]:
+        """Return recordings evicted and archived, bytes freed and throughput, or None if retention is off"""
+        return self.retention.stats() if self.retention is not None else None
+
+    def export_stats(self) -> dict:
+        """Return the number of queued, exported, retried and failed recording exports"""
+        return self.exports.stats()
+
+    def pool_stats(self) -> Optional[dict]:
+        """Return warm pool hit/miss counts and claim latencies, or None if no pool is configured"""
+        return self.pool.stats() if self.pool is not None else None
+
+    def close(self):
+        """Release background resources held by the manager"""
+        self.segment_syncer.close()
+        self.exports.close()
+        if self.retention is not None:
+            self.retention.close()
+        if self.previews is not None:
+            self.previews.close()
+        if self.idle_reaper is not None:
+            self.idle_reaper.close()
+        for reconciler in self.reconcilers:
+            reconciler.close()
+        if self.pool is not None:
+            self.pool.close()
+        self.logs.close()
+        self.input_queue.close()
+        if self._owns_store:
+            self.store.close()
     
     def list_sessions(self) -> List[BrowserSession]:
-        self._load_sessions()
+        if self.reconcilers:
+            # Container exits are applied from the events stream, so serve from memory
+            self._refresh_from_store()
+        else:
+            self._load_sessions()
         return list(self.sessions.values())
     
     def get_session(self, session_id: str) -> Optional[BrowserSession]:
+        if self.reconcilers:
+            self._refresh_from_store()
         return self.sessions.get(session_id)
-    
-    def stop_session(self, session_id: str, video_filename: Optional[str] = None) -> bool:
-        if session_id not in self.sessions:
-            return False
-            
-        session = self.sessions[session_id]
-        try:
-            container = self.client.containers.get(session.container_id)
-            
-            # Gracefully stop ffmpeg first
-            container.exec_run("/usr/bin/supervisorctl -c /etc/supervisor.d/supervisord.ini stop ffmpeg")
-            time.sleep(2)
-            
-            # Use provided filename or default to session_id
-            video_filename = video_filename or f"{session_id}.mp4"
-            video_path = self.videos_path / video_filename
-            
-            # Create directory if it doesn't exist
-            video_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def get_sessions_by_tag(self, tag: str) -> List[BrowserSession]:
+        """Return the active sessions carrying a tag"""
+        with self._lock:
+            return [self.sessions[session_id] for session_id in self._tag_index.get(tag, ())]
+
+    def get_session_by_identifier(self, identifier: str, reconcile: bool = False) -> Optional[BrowserSession]:
+        """
+        Get an active session by ID or tag.
+        
+        Args:
+            identifier: Session ID or tag
+            reconcile: Check the session store and Docker for changes before the lookup
             
-            # Copy the video file from container before stopping
-            import subprocess
-            subprocess.run([
-                "docker", "cp",
-                f"{container.id}:/tmp/session.mp4",
-                str(video_path)
-            ])
+        Returns:
+            BrowserSession object if found, None otherwise
             
+        Raises:
+            ValueError: If more than one active session carries the tag
+        """
+        if reconcile:
+            self.reconcile()
+
+        # Try by ID first
+        session = self.get_session(identifier)
+        if session:
+            return session
+
+        # Try by tag
+        matching_sessions = self.get_sessions_by_tag(identifier)
+        if len(matching_sessions) > 1:
+            raise ValueError(f"Multiple sessions found with tag '{identifier}'")
+        return matching_sessions[0] if matching_sessions else None
+    
+    def _teardown_session(self, session: BrowserSession, video_filename: Optional[str] = None) -> StopResult:
+        """
+        Finalize the recording and stop the container, releasing its compute and ports.
+
+        Updates the session with its closing details, marks its recording export as
+        pending and removes it from the active sessions, but does not persist it or
+        queue the export. Containers of sessions that were not recorded are removed
+        right away.
+        """
+        timings = {}
+        with self._lock:
+            self._stopping.add(session.session_id)
+        try:
+            container = self._container_for(session)
+            if session.status == "paused":
+                container.unpause()
+
+            if session.recording == "off":
+                # Nothing was recorded, so there is nothing to finalize or copy
+                session.recorder_cpu_seconds = 0.0
+            else:
+                session.recorder_cpu_seconds = recorder_cpu_seconds(container)
+                # Gracefully stop ffmpeg so the recording is complete on disk. supervisorctl
+                # returns once ffmpeg has exited, STOP_RECORDER_CMD waits for it
+                stage_started = time.monotonic()
+                if session.recording == "full" and session.recording_format == "mp4":
+                    container.exec_run(STOP_FFMPEG_CMD)
+                else:
+                    container.exec_run(["sh", "-c", STOP_RECORDER_CMD])
+                timings["ffmpeg_stop"] = time.monotonic() - stage_started
+
+            stage_started = time.monotonic()
             container.stop()
-            container.remove()
-            
+            self._release_ports((session.debug_port, session.vnc_port, session.computer_use_port))
+            if session.recording == "off":
+                container.remove()
+            timings["stop"] = time.monotonic() - stage_started
+
             # Update session with closing details
             session.status = "stopped"
             session.closed_at = datetime.now(timezone.utc)
             session.runtime_seconds = (session.closed_at - session.created_at).total_seconds()
-            session.video_path = str(video_path)
-            
-            # Move to closed sessions
-            self.closed_sessions[session_id] = session
-            del self.sessions[session_id]
-            
-            # Save both session lists
-            self._save_sessions()
-            self._save_closed_sessions()
-            return True
+            session.stop_timings = timings
+            if session.recording != "off":
+                # Where the export job will write the recording
+                if session.recording_format == "hls":
+                    session.video_path = str(self.get_segments_path(session.session_id) / PLAYLIST_NAME)
+                else:
+                    session.video_path = str(self.videos_path / (video_filename or f"{session.session_id}.mp4"))
+                session.export_status = "pending"
+
+            # Remove from active sessions
+            with self._lock:
+                self.sessions.pop(session.session_id, None)
+                self._unindex_tag(session)
+            self._capacity_freed()
+            return StopResult(success=True, timings=timings)
         except Exception as e:
             print(f"Error stopping session: {e}")
+            return StopResult(success=False, timings=timings, error=str(e))
+        finally:
+            with self._lock:
+                self._stopping.discard(session.session_id)
+
+    def _export_session(self, session_id: str):
+        """
+        Copy a stopped session's recording out of its container, then remove the container.
+
+        Called by the export queue, which retries on failure.
+        """
+        session = self.store.get(session_id)
+        if session is None or session.export_status not in ("pending", "copying"):
+            return
+        session.export_status = "copying"
+        session.export_attempts += 1
+        self.store.put(session)
+
+        container = self._container_for(session)
+        timings = dict(session.stop_timings or {})
+        stage_started = time.monotonic()
+        if session.recording_format == "hls":
+            # Earlier segments are already on the host, only the last ones are left
+            video_path = self.segment_syncer.sync(session, container)
+        else:
+            target = Path(session.video_path)
+            sink = self.video_sink if target.parent == self.videos_path else LocalFileSink(target.parent)
+            video_path = copy_from_container(container, MP4_PATH, sink, target.name)
+        timings["copy"] = time.monotonic() - stage_started
+
+        stage_started = time.monotonic()
+        container.remove()
+        timings["remove"] = time.monotonic() - stage_started
+
+        session.video_path = str(video_path)
+        session.export_status = "done"
+        session.export_error = None
+        session.stop_timings = timings
+        self.store.put(session)
+        if self.previews is not None:
+            self.previews.submit(session)
+
+    def _queue_export(self, session: BrowserSession):
+        if session.export_status == "pending":
+            self.exports.submit(session.session_id)
+
+    def wait_for_export(self, session_id: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Wait for a stopped session's recording to be exported.
+
+        Returns:
+            The export status once it is done or failed, or the current status on timeout
+        """
+        self.exports.wait(session_id, timeout)
+        session = self.store.get(session_id)
+        return session.export_status if session else None
+
+    def stop_session(self, session_id: str, video_filename: Optional[str] = None) -> bool:
+        """
+        Stop a session and free its compute. The recording is exported in the
+        background; see wait_for_export and the session's export_status.
+        """
+        if session_id not in self.sessions:
             return False
+            
+        session = self.sessions[session_id]
+        result = self._teardown_session(session, video_filename)
+        if result:
+            self.store.put(session)
+            self._queue_export(session)
+            self.input_queue.purge(session_id)
+        return result.success
     
-    def _save_closed_sessions(self):
-        """Save closed sessions to disk"""
-        self._ensure_storage_dir()
-        with open(self.closed_storage_path, 'wb') as f:
-            pickle.dump(self.closed_sessions, f)
-    
-    def _load_closed_sessions(self):
-        """Load closed sessions from disk"""
+    def pause_session(self, session_id: str) -> bool:
+        """Freeze a running session's processes until it is resumed"""
+        session = self.get_session(session_id)
+        if not session or session.status != "running":
+            return False
         try:
-            if self.closed_storage_path.exists():
-                with open(self.closed_storage_path, 'rb') as f:
-                    self.closed_sessions = pickle.load(f)
+            self._container_for(session).pause()
         except Exception as e:
-            print(f"Error loading closed sessions: {e}")
-            self.closed_sessions = {}
-    
+            print(f"Error pausing session: {e}")
+            return False
+        session.status = "paused"
+        session.paused_at = datetime.now(timezone.utc)
+        self.store.put(session)
+        return True
+
+    def resume_session(self, session_id: str) -> bool:
+        """Unfreeze a paused session"""
+        session = self.get_session(session_id)
+        if not session or session.status != "paused":
+            return False
+        try:
+            self._container_for(session).unpause()
+        except Exception as e:
+            print(f"Error resuming session: {e}")
+            return False
+        session.status = "running"
+        session.paused_at = None
+        self.store.put(session)
+        return True
+
+    def record_activity(self, session_id: str) -> Optional[BrowserSession]:
+        """
+        Mark a session as in use, resuming it first if it was paused for being idle.
+
+        Called before every computer-use request.
+        """
+        session = self.get_session(session_id)
+        if not session:
+            return None
+        if session.status == "paused":
+            self.resume_session(session_id)
+        session.last_activity_at = datetime.now(timezone.utc)
+        self.store.put(session)
+        return session
+
+    def last_activity(self, session: BrowserSession) -> datetime:
+        """Most recent computer-use request, console output or input queue write for a session"""
+        latest = session.last_activity_at or session.created_at
+        for path in (self.get_console_log_path(session.session_id), self.get_input_queue_path(session.session_id)):
+            try:
+                modified = datetime.fromtimestamp(path.stat().st_mtime, timezone.utc)
+            except OSError:
+                continue
+            latest = max(latest, modified)
+        return latest
+
     def list_closed_sessions(self) -> List[BrowserSession]:
         """Return list of closed sessions"""
-        return list(self.closed_sessions.values())
+        return self.store.list(active=False)
     
     def get_closed_session(self, session_id: str) -> Optional[BrowserSession]:
         """Get details of a specific closed session"""
-        return self.closed_sessions.get(session_id)
+        session = self.store.get(session_id)
+        if session and session.status not in ACTIVE_STATUSES:
+            return session
+        return None
     
+    def get_preview(self, session_id: str) -> Optional[Tuple[Path, dict]]:
+        """Return the preview directory and index of a closed session's recording, if built"""
+        session = self.get_closed_session(session_id)
+        if session is None or not session.preview_path:
+            return None
+        directory = Path(session.preview_path)
+        try:
+            return directory, load_index(directory)
+        except (OSError, ValueError):
+            return None
+
     def update_tag(self, session_id: str, tag: str) -> Optional[BrowserSession]:
         """Update the tag for a session"""
         session = self.get_session(session_id)
         if session:
-            session.tag = tag
-            self._save_sessions()
+            with self._lock:
+                self._unindex_tag(session)
+                session.tag = tag
+                self._index_tag(session)
+            self.store.put(session)
             return session
         
         # Check closed sessions
         session = self.get_closed_session(session_id)
         if session:
             session.tag = tag
-            self._save_closed_sessions()
+            self.store.put(session)
             return session
         
         return None
@@ -272,40 +1171,85 @@ class LocalContainerManager:
         """Get the path to a session's console log file"""
         return self.console_logs_path / f"{session_id}.txt"
 
-    def write_to_console_log(self, session_id: str, message: str):
-        """Write a message to the session's console log"""
-        log_file = self.get_console_log_path(session_id)
-        with open(log_file, 'a') as f:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            f.write(f"[{timestamp}] {message}\n")
+    def write_to_console_log(self, session_id: str, message: str, level: str = "info", source: str = "manager"):
+        """Queue a message for the structured log and the session's console log"""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.logs.log(session_id, message, level=level, source=source, console_line=f"[{timestamp}] {message}")
+
+    def search_logs(self, **filters) -> List[dict]:
+        """Search the structured logs of all sessions, see LogIndex.search for the filters"""
+        return self.logs.search(**filters)
+
+    def log_stats(self) -> dict:
+        """Return records written and dropped, flushes, rotations and the records still buffered"""
+        return self.logs.stats()
 
     def write_to_input_queue(self, session_id: str, message: str) -> bool:
         """Write a message to the session's input queue"""
+        return self.send_input(session_id, message) is not None
+
+    def send_input(self, session_id: str, message: str) -> Optional[dict]:
+        """
+        Enqueue a message for a running session, returning it with its id, or None
+        if there is no such session. The message is also appended to the session's
+        input queue file for consumers that still read it.
+        """
         try:
             session = self.get_session(session_id)
             if not session:
-                return False
-                
-            input_file = self.input_queue_path / f"{session_id}.txt"
-            with open(input_file, "a") as f:
+                return None
+
+            queued = self.input_queue.enqueue(session_id, message)
+            with open(self.get_input_queue_path(session_id), "a") as f:
                 f.write(f"{message}\n")
-            return True
+            return queued
         except Exception as e:
             print(f"Error writing to input queue: {e}")
-            return False
+            return None
+
+    def read_input(
+        self, session_id: str, timeout: float = 30.0, visibility_timeout: float = VISIBILITY_TIMEOUT
+    ) -> Optional[dict]:
+        """
+        Wait up to timeout seconds for the next message sent to a session.
+
+        The message is delivered again after visibility_timeout seconds unless it
+        is acknowledged with ack_input.
+        """
+        return self.input_queue.dequeue(session_id, timeout=timeout, visibility_timeout=visibility_timeout)
+
+    def ack_input(self, session_id: str, message_id: int) -> bool:
+        """Acknowledge a message returned by read_input so it is not delivered again"""
+        return self.input_queue.ack(session_id, message_id)
 
     def get_input_queue_path(self, session_id: str) -> Path:
         """Get the path to a session's input queue file"""
         return self.input_queue_path / f"{session_id}.txt"
 
-    def stop_all_sessions(self) -> Dict[str, bool]:
+    def stop_all_sessions(self, max_workers: int = 8) -> Dict[str, StopResult]:
         """
-        Stop all active sessions.
+        Stop all active sessions concurrently.
+        
+        Args:
+            max_workers: Maximum number of sessions torn down at the same time
         
         Returns:
-            Dictionary mapping session IDs to success status
+            Dictionary mapping session IDs to a StopResult, which is truthy on success
+            and carries the seconds spent in the ffmpeg_stop and stop stages. Recordings
+            are exported in the background afterwards
         """
-        results = {}
-        for session_id in list(self.sessions.keys()):  # Create a copy of keys to avoid modification during iteration
-            results[session_id] = self.stop_session(session_id)
-        return results
\ No newline at end of file
+        sessions = list(self.sessions.values())  # Create a copy to avoid modification during iteration
+        if not sessions:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sessions)))) as executor:
+            futures = {session.session_id: executor.submit(self._teardown_session, session) for session in sessions}
+            results = {session_id: future.result() for session_id, future in futures.items()}
+
+        stopped = [session for session in sessions if results[session.session_id]]
+        if stopped:
+            self.store.put_many(stopped)
+            for session in stopped:
+                self._queue_export(session)
+                self.input_queue.purge(session.session_id)
+        return results
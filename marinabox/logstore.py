@@ -0,0 +1,366 @@
+import fcntl
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Deque, List, Optional
+
+LOG_LEVELS = ("debug", "info", "warning", "error")
+LOG_NAME = "marinabox.jsonl"
+INDEX_NAME = "index.db"
+FLUSH_INTERVAL = 0.2
+MAX_BATCH = 1000
+MAX_BUFFERED = 100000
+MAX_BYTES = 64 * 1024 * 1024
+MAX_FILES = 20
+MAX_RESULTS = 1000
+
+
+def _timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+class LogIndex:
+    """
+    SQLite index of structured log records across all sessions.
+
+    Records are indexed by session and time, and their messages by an FTS5 table
+    when this SQLite build has it; otherwise text queries fall back to a substring
+    match.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS logs (
+                    id INTEGER PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    level TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    message TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_session_ts ON logs(session_id, ts)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts ON logs(ts)")
+        self.full_text = self._create_fts()
+
+    def _create_fts(self) -> bool:
+        try:
+            with self._conn:
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(message, content='logs', content_rowid='id')"
+                )
+                self._conn.execute(
+                    """
+                    CREATE TRIGGER IF NOT EXISTS logs_fts_insert AFTER INSERT ON logs BEGIN
+                        INSERT INTO logs_fts(rowid, message) VALUES (new.id, new.message);
+                    END
+                    """
+                )
+                self._conn.execute(
+                    """
+                    CREATE TRIGGER IF NOT EXISTS logs_fts_delete AFTER DELETE ON logs BEGIN
+                        INSERT INTO logs_fts(logs_fts, rowid, message) VALUES ('delete', old.id, old.message);
+                    END
+                    """
+                )
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    def add(self, records: List[dict]):
+        rows = [(r["session_id"], r["ts"], r["level"], r["source"], r["message"]) for r in records]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO logs (session_id, ts, level, source, message) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def delete_before(self, seconds: float):
+        """Forget records written before seconds, once the files holding them are gone"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM logs WHERE ts <= ?", (seconds,))
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        session_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        before: Optional[int] = None,
+        limit: int = 100
+    ) -> List[dict]:
+        """
+        Find records matching every given filter, newest first.
+
+        query is an FTS5 expression, e.g. 'timeout AND click'. Pass the id of the
+        last record returned as before to get the next page.
+        """
+        where, params = [], []
+        table = "logs"
+        if query:
+            if self.full_text:
+                table = "logs JOIN logs_fts ON logs_fts.rowid = logs.id"
+                where.append("logs_fts MATCH ?")
+                params.append(query)
+            else:
+                where.append("logs.message LIKE ?")
+                params.append(f"%{query}%")
+        for column, value in (("session_id", session_id), ("level", level), ("source", source)):
+            if value is not None:
+                where.append(f"logs.{column} = ?")
+                params.append(value)
+        for operator, value in ((">=", start), ("<", end)):
+            if value is not None:
+                # Times without a timezone are taken to be UTC
+                if value.tzinfo is None:
+                    value = value.replace(tzinfo=timezone.utc)
+                where.append(f"logs.ts {operator} ?")
+                params.append(value.timestamp())
+        if before is not None:
+            where.append("logs.id < ?")
+            params.append(before)
+        sql = f"SELECT logs.id, logs.session_id, logs.ts, logs.level, logs.source, logs.message FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY logs.id DESC LIMIT ?"
+        params.append(min(limit, MAX_RESULTS))
+        try:
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            # Malformed FTS5 expressions
+            raise ValueError(f"Invalid log query: {e}")
+        return [
+            {
+                "id": row[0], "session_id": row[1], "timestamp": _timestamp(row[2]),
+                "level": row[3], "source": row[4], "message": row[5],
+            }
+            for row in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LogStream:
+    """
+    File-like object that sends each complete line written to it to the log writer,
+    so a session's stdout can be redirected into the structured log.
+    """
+
+    def __init__(self, writer: "StructuredLogWriter", session_id: str, source: str, level: str = "info"):
+        self.writer = writer
+        self.session_id = session_id
+        self.source = source
+        self.level = level
+        self._partial = ""
+
+    def write(self, text: str) -> int:
+        *lines, self._partial = (self._partial + text).split("\n")
+        for line in lines:
+            self.writer.log(self.session_id, line, level=self.level, source=self.source)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._partial:
+            self.write("\n")
+
+
+class StructuredLogWriter:
+    """
+    Buffers log records in memory and writes them in batches from a background thread.
+
+    log() never touches the disk. Every flush_interval, or sooner once max_batch
+    records are waiting, the batch is appended to one JSON lines file with a single
+    write, added to the search index in one transaction, and mirrored to the
+    sessions' console logs. The JSON lines file is rotated and gzipped once it
+    grows past max_bytes, and only the newest max_files rotated files are kept,
+    along with their index entries. Several processes may share a directory.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        console_log_path: Optional[Callable[[str], Path]] = None,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_batch: int = MAX_BATCH,
+        max_buffered: int = MAX_BUFFERED,
+        max_bytes: int = MAX_BYTES,
+        max_files: int = MAX_FILES
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / LOG_NAME
+        self.console_log_path = console_log_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_buffered = max_buffered
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.index = LogIndex(self.directory / INDEX_NAME)
+        self._stats = {"written": 0, "dropped": 0, "flushes": 0, "rotated": 0, "flush_seconds": 0.0}
+        self._buffer: Deque[tuple] = deque(maxlen=max_buffered)  # (record, console line)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._lock_file = open(self.directory / ".lock", "a")
+
+    def log(
+        self,
+        session_id: str,
+        message: str,
+        level: str = "info",
+        source: str = "manager",
+        console_line: Optional[str] = None
+    ):
+        """
+        Queue a record. console_line, if given, is what the session's console log
+        shows for it instead of the bare message.
+        """
+        if level not in LOG_LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LOG_LEVELS)}")
+        record = {
+            "session_id": session_id, "ts": time.time(), "level": level, "source": source, "message": message,
+        }
+        with self._condition:
+            if self._closed:
+                return
+            if len(self._buffer) >= self.max_buffered:
+                # The disk cannot keep up, the append drops the oldest record rather than block callers
+                self._stats["dropped"] += 1
+            self._buffer.append((record, console_line if console_line is not None else message))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="marinabox-logs", daemon=True)
+                self._thread.start()
+            if len(self._buffer) >= self.max_batch:
+                self._condition.notify()
+
+    def stream(self, session_id: str, source: str = "agent") -> LogStream:
+        return LogStream(self, session_id, source)
+
+    def search(self, **filters) -> List[dict]:
+        return self.index.search(**filters)
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats, buffered=len(self._buffer))
+        stats["full_text"] = self.index.full_text
+        return stats
+
+    def flush(self):
+        """Write everything buffered so far"""
+        with self._condition:
+            batch, self._buffer = list(self._buffer), deque(maxlen=self.max_buffered)
+        if batch:
+            self._write(batch)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+        self._lock_file.close()
+        self.index.close()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._closed and len(self._buffer) < self.max_batch:
+                    self._condition.wait(self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing logs: {e}")
+
+    def _write(self, batch: List[tuple]):
+        started = time.monotonic()
+        records = [record for record, _ in batch]
+        data = "".join(
+            json.dumps({
+                "session_id": r["session_id"], "timestamp": _timestamp(r["ts"]),
+                "level": r["level"], "source": r["source"], "message": r["message"],
+            }) + "\n"
+            for r in records
+        ).encode()
+        rotated = None
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            # Another process may have rotated the file since it was opened
+            if self._file is None or not self.path.exists() or os.fstat(self._file.fileno()).st_ino != self.path.stat().st_ino:
+                if self._file is not None:
+                    self._file.close()
+                self._file = open(self.path, "ab")
+            self._file.write(data)
+            self._file.flush()
+            if self._file.tell() >= self.max_bytes:
+                rotated = self.directory / f"marinabox-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S-%f')}.jsonl"
+                os.rename(self.path, rotated)
+                self._file.close()
+                self._file = None
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self.index.add(records)
+        if self.console_log_path is not None:
+            self._mirror(batch)
+        if rotated is not None:
+            self._compress(rotated)
+        with self._condition:
+            self._stats["written"] += len(records)
+            self._stats["flushes"] += 1
+            self._stats["flush_seconds"] += time.monotonic() - started
+
+    def _mirror(self, batch: List[tuple]):
+        """Append each session's lines of the batch to its console log in one write"""
+        lines = {}
+        for record, console_line in batch:
+            lines.setdefault(record["session_id"], []).append(console_line + "\n")
+        for session_id, session_lines in lines.items():
+            with open(self.console_log_path(session_id), "a") as f:
+                f.write("".join(session_lines))
+
+    def _compress(self, path: Path):
+        target = path.with_name(path.name + ".gz")
+        partial = target.with_name(f".{target.name}.part")
+        with open(path, "rb") as source, gzip.open(partial, "wb") as out:
+            shutil.copyfileobj(source, out)
+        # Keep the time of the last record, which decides when its index entries are dropped
+        stat = path.stat()
+        os.utime(partial, (stat.st_atime, stat.st_mtime))
+        os.replace(partial, target)
+        path.unlink()
+        with self._condition:
+            self._stats["rotated"] += 1
+
+        rotated = sorted(self.directory.glob("marinabox-*.jsonl.gz"))
+        for old in rotated[:-self.max_files] if self.max_files else rotated:
+            last_write = old.stat().st_mtime
+            old.unlink(missing_ok=True)
+            self.index.delete_before(last_write)
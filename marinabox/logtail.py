@@ -0,0 +1,280 @@
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+from collections import deque
+from pathlib import Path
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+MAX_QUEUED = 256
+POLL_INTERVAL = 0.25
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_IGNORED = 0x00008000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+# (start offset, end offset, line) of one complete line
+Line = Tuple[int, int, str]
+
+
+def _load_libc():
+    """libc with the inotify calls, or None where inotify is not available"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode(errors="replace").rstrip("\r")
+
+
+class Subscription:
+    """
+    One SSE client of a log file.
+
+    Lines are queued up to max_queued. A subscriber that falls further behind
+    stops receiving lines and instead catches up from the file itself, reading
+    the lines it missed in chunks that are sent as single events, so a slow
+    client never holds more than one queue of lines in memory.
+    """
+
+    def __init__(self, tailer: "_Tailer", start: int, max_queued: int = MAX_QUEUED):
+        self.tailer = tailer
+        self.max_queued = max_queued
+        self.coalesced = 0
+        self._queue: Deque[Line] = deque()
+        self._missed_from: Optional[int] = start if start < tailer.offset else None
+        self._wake = asyncio.Event()
+        self._closed = False
+
+    def _push(self, lines: List[Line]):
+        if self._missed_from is None:
+            room = self.max_queued - len(self._queue)
+            self._queue.extend(lines[:room])
+            if len(lines) > room:
+                self._missed_from = lines[room][0]
+        self._wake.set()
+
+    def _close(self):
+        # The file is gone, so there is nothing left to catch up on
+        self._closed = True
+        self._missed_from = None
+        self._wake.set()
+
+    async def _read_missed(self) -> Tuple[int, List[str]]:
+        start, end = self._missed_from, min(self._missed_from + CHUNK_SIZE, self.tailer.offset)
+        if start >= end:
+            # The file was truncated past the missed lines
+            self._missed_from = None
+            return start, []
+        try:
+            raw = await asyncio.get_running_loop().run_in_executor(None, self.tailer.read, start, end - start)
+        except OSError:
+            self._missed_from = None
+            return start, []
+        if end < self.tailer.offset and b"\n" in raw:
+            # Stop at the last complete line, the rest is read next time
+            raw = raw[:raw.rindex(b"\n") + 1]
+        end = start + len(raw)
+        self._missed_from = end if end < self.tailer.offset else None
+        self.coalesced += 1
+        return end, [_decode(line) for line in raw.rstrip(b"\n").split(b"\n")] if raw else []
+
+    async def events(self) -> AsyncIterator[Tuple[int, List[str]]]:
+        """Yield (end offset, lines) in file order until the log file goes away"""
+        while True:
+            if self._queue:
+                _, end, line = self._queue.popleft()
+                yield end, [line]
+            elif self._missed_from is not None:
+                end, lines = await self._read_missed()
+                if lines:
+                    yield end, lines
+            elif self._closed:
+                return
+            else:
+                self._wake.clear()
+                await self._wake.wait()
+
+
+class _Tailer:
+    """Follows one log file and hands complete new lines to its subscribers"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.subscribers = set()
+        self.watch: Optional[int] = None
+        size = os.fstat(self.fd).st_size
+        # Start after the last complete line, a partial one is completed by the next write
+        tail = os.pread(self.fd, min(size, CHUNK_SIZE), max(0, size - CHUNK_SIZE))
+        self.offset = size - len(tail) + tail.rindex(b"\n") + 1 if b"\n" in tail else max(0, size - len(tail))
+        self.read_offset = size
+        self.partial = tail[self.offset - (size - len(tail)):]
+
+    def read(self, offset: int, count: int) -> bytes:
+        return os.pread(self.fd, count, offset)
+
+    def poll(self):
+        """Read what was appended since the last call and broadcast its complete lines"""
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            return
+        if size < self.read_offset:
+            # Truncated and rewritten
+            self.offset = self.read_offset = 0
+            self.partial = b""
+        lines = []
+        while self.read_offset < size:
+            data = self.read(self.read_offset, min(CHUNK_SIZE, size - self.read_offset))
+            if not data:
+                break
+            self.read_offset += len(data)
+            *complete, self.partial = (self.partial + data).split(b"\n")
+            for raw in complete:
+                start = self.offset
+                self.offset += len(raw) + 1
+                lines.append((start, self.offset, _decode(raw)))
+        if lines:
+            for subscription in self.subscribers:
+                subscription._push(lines)
+
+    def close(self):
+        for subscription in self.subscribers:
+            subscription._close()
+        os.close(self.fd)
+
+
+class LogBroadcaster:
+    """
+    Fans appended log lines out to every subscriber of the same file.
+
+    Each file is followed by a single tailer, however many clients are streaming
+    it. Tailers are woken by inotify where available and otherwise by one polling
+    task for all files. Must be used from a single event loop.
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL, max_queued: int = MAX_QUEUED):
+        self.poll_interval = poll_interval
+        self.max_queued = max_queued
+        self._tailers: Dict[Path, _Tailer] = {}
+        self._watches: Dict[int, _Tailer] = {}
+        self._libc = _load_libc()
+        self._inotify_fd: Optional[int] = None
+        self._poller: Optional[asyncio.Task] = None
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd >= 0:
+                self._inotify_fd = fd
+                asyncio.get_running_loop().add_reader(fd, self._on_inotify)
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify_fd is not None
+
+    def subscribe(self, path: Path, start: Optional[int] = None) -> Subscription:
+        """
+        Follow a log file. Lines before the current end are sent from start, a
+        byte offset such as a Last-Event-ID; by default only new lines are sent.
+        """
+        path = Path(path).resolve()
+        tailer = self._tailers.get(path)
+        if tailer is None:
+            tailer = _Tailer(path)
+            self._tailers[path] = tailer
+            self._watch(tailer)
+        subscription = Subscription(tailer, tailer.offset if start is None else max(0, start), self.max_queued)
+        tailer.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        tailer = subscription.tailer
+        tailer.subscribers.discard(subscription)
+        if not tailer.subscribers and self._tailers.get(tailer.path) is tailer:
+            self._drop(tailer)
+
+    def stats(self) -> dict:
+        return {
+            "inotify": self.uses_inotify,
+            "files": len(self._tailers),
+            "subscribers": sum(len(tailer.subscribers) for tailer in self._tailers.values()),
+        }
+
+    def close(self):
+        for tailer in list(self._tailers.values()):
+            self._drop(tailer)
+        if self._inotify_fd is not None:
+            asyncio.get_running_loop().remove_reader(self._inotify_fd)
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+    def _watch(self, tailer: _Tailer):
+        if self._inotify_fd is not None:
+            mask = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_DELETE_SELF | _IN_MOVE_SELF
+            watch = self._libc.inotify_add_watch(self._inotify_fd, os.fsencode(tailer.path), mask)
+            if watch >= 0:
+                tailer.watch = watch
+                self._watches[watch] = tailer
+                return
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+
+    def _drop(self, tailer: _Tailer):
+        del self._tailers[tailer.path]
+        if tailer.watch is not None:
+            self._watches.pop(tailer.watch, None)
+            self._libc.inotify_rm_watch(self._inotify_fd, tailer.watch)
+        tailer.close()
+
+    def _on_inotify(self):
+        woken = {}
+        while True:
+            try:
+                data = os.read(self._inotify_fd, CHUNK_SIZE)
+            except BlockingIOError:
+                break
+            position = 0
+            while position < len(data):
+                watch, mask, _, name_length = _EVENT_HEADER.unpack_from(data, position)
+                position += _EVENT_HEADER.size + name_length
+                tailer = self._watches.get(watch)
+                if tailer is None:
+                    continue
+                if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+                    # Send what was written before the file went away, then end its streams
+                    tailer.poll()
+                    if not mask & _IN_IGNORED:
+                        self._libc.inotify_rm_watch(self._inotify_fd, watch)
+                    tailer.watch = None
+                    self._watches.pop(watch, None)
+                    self._tailers.pop(tailer.path, None)
+                    tailer.close()
+                    woken.pop(watch, None)
+                else:
+                    woken[watch] = tailer
+        for tailer in woken.values():
+            tailer.poll()
+
+    async def _poll(self):
+        while any(tailer.watch is None for tailer in self._tailers.values()):
+            for tailer in list(self._tailers.values()):
+                if tailer.watch is None:
+                    tailer.poll()
+            await asyncio.sleep(self.poll_interval)
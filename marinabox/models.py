@@ -1,6 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Dict, Optional
 
 @dataclass
 class BrowserSession:
@@ -18,6 +18,25 @@ class BrowserSession:
     resolution: str = "1280x800x24"
     video_path: Optional[str] = None
     tag: Optional[str] = None
+    ready_times: Optional[Dict[str, Optional[float]]] = None  # Seconds until each endpoint answered
+    stop_timings: Optional[Dict[str, float]] = None  # Seconds spent in each stop stage
+    snapshot_image: Optional[str] = None  # Image the session was started from, when cloned
+    cloned_from: Optional[str] = None  # Session ID of the clone source
+    queue_wait_seconds: Optional[float] = None  # Seconds spent waiting for host capacity
+    last_activity_at: Optional[datetime] = None  # Last computer-use request
+    paused_at: Optional[datetime] = None  # When the session was paused for being idle
+    docker_host: Optional[str] = None  # Name of the Docker host running the container
+    host: Optional[str] = None  # Address the session's ports are published on
+    recording_format: str = "mp4"  # 'mp4', or 'hls' for segments synced while the session runs
+    recording: str = "full"  # 'full', 'low-fps' or 'off'
+    recorder_cpu_seconds: Optional[float] = None  # CPU time the recorder used, measured on stop
+    export_status: Optional[str] = None  # 'pending', 'copying', 'done' or 'failed' once stopped with a recording
+    export_attempts: int = 0
+    export_error: Optional[str] = None
+    preview_path: Optional[str] = None  # Directory with the recording's thumbnails and keyframe index
+    last_viewed_at: Optional[datetime] = None  # Last time the recording was requested
+    archived_at: Optional[datetime] = None  # When the recording was re-encoded to the archival profile
+    evicted_at: Optional[datetime] = None  # When the recording was deleted by the retention policy
     
     # Add this to ensure the class can be pickled
     def __getstate__(self):
@@ -26,6 +45,10 @@ class BrowserSession:
     def __setstate__(self, state):
         self.__dict__.update(state)
 
+    def get_host(self) -> str:
+        """Address to reach the session's CDP, VNC and computer-use ports on"""
+        return self.host or "localhost"
+
     def get_current_runtime(self) -> float:
         """Calculate the current runtime in seconds"""
         if self.runtime_seconds is not None:
@@ -35,6 +58,16 @@ class BrowserSession:
     def to_dict(self) -> dict:
         """Convert session to dictionary with current runtime"""
         data = self.__dict__.copy()
-        if self.status == "running":
+        if self.status in ("running", "paused"):
             data['runtime_seconds'] = self.get_current_runtime()
-        return data
\ No newline at end of file
+        return data
+
+@dataclass
+class StopResult:
+    """Outcome of stopping a session, truthy when the stop succeeded"""
+    success: bool
+    timings: Dict[str, float] = field(default_factory=dict)  # Seconds per stage: ffmpeg_stop, stop
+    error: Optional[str] = None
+
+    def __bool__(self) -> bool:
+        return self.success
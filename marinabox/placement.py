@@ -0,0 +1,165 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import docker
+
+from .admission import ResourceProfile
+
+LOCAL_HOST = "local"
+
+
+@dataclass
+class DockerHost:
+    """A Docker daemon sessions can be placed on"""
+    name: str
+    base_url: Optional[str] = None  # None uses DOCKER_HOST / the local socket
+    address: str = "127.0.0.1"  # Where the host's published ports are reached
+    client: Any = field(default=None, repr=False)
+    cpus: float = 0.0
+    memory: int = 0
+
+    @property
+    def is_local(self) -> bool:
+        """Whether the daemon runs on this machine, so its published ports can be probed here"""
+        return self.base_url is None or self.base_url.startswith("unix://")
+
+    def connect(self):
+        """Open the Docker client and read the host's CPU and memory totals"""
+        if self.client is None:
+            self.client = docker.DockerClient(base_url=self.base_url) if self.base_url else docker.from_env()
+        info = self.client.info()
+        self.cpus = info["NCPU"]
+        self.memory = info["MemTotal"]
+
+
+def host_address(url: str) -> str:
+    """Address a daemon's published ports are reached on: the URL's hostname, or 127.0.0.1 for unix sockets"""
+    if url.startswith("unix://"):
+        return "127.0.0.1"
+    return urlparse(url).hostname or "127.0.0.1"
+
+
+def parse_docker_hosts(spec: Optional[str]) -> Optional[List[DockerHost]]:
+    """
+    Parse a host list like 'box1=tcp://10.0.0.1:2375,box2=ssh://user@10.0.0.2'.
+
+    Ports are reached on the hostname of tcp:// and ssh:// URLs and on 127.0.0.1
+    for unix sockets. A different address can be given after '@', as in
+    'box3=unix:///var/run/docker.sock@192.168.1.5'.
+    """
+    if not spec:
+        return None
+    hosts = []
+    for entry in spec.split(","):
+        name, _, url = entry.strip().partition("=")
+        if not url:
+            raise ValueError(f"Docker host entry must be NAME=URL: {entry}")
+        address = None
+        if url.startswith("unix://") and "@" in url:
+            url, _, address = url.rpartition("@")
+        hosts.append(DockerHost(name=name, base_url=url, address=address or host_address(url)))
+    return hosts
+
+
+class Placement:
+    """
+    Chooses the Docker host for each new container.
+
+    Hosts are ranked by the share of their CPUs or memory committed to marinabox
+    containers, then by their number of running containers. Both count placements
+    that are still starting, so concurrent launches spread out.
+    """
+
+    def __init__(self, hosts: List[DockerHost], resource_profiles: Dict[str, ResourceProfile]):
+        if not hosts:
+            raise ValueError("At least one Docker host is required")
+        names = [host.name for host in hosts]
+        if len(set(names)) != len(names):
+            raise ValueError("Docker host names must be unique")
+        self.hosts = {host.name: host for host in hosts}
+        self.default = hosts[0]
+        self.resource_profiles = resource_profiles
+        self._starting: Dict[str, List[str]] = {name: [] for name in self.hosts}  # env_types still starting
+        self._lock = threading.Lock()
+        for host in hosts:
+            host.connect()
+
+    @property
+    def total_cpus(self) -> float:
+        return sum(host.cpus for host in self.hosts.values())
+
+    @property
+    def total_memory(self) -> int:
+        return sum(host.memory for host in self.hosts.values())
+
+    def get(self, name: Optional[str]) -> DockerHost:
+        """Look up a host by name, None meaning the default host"""
+        if name is None:
+            return self.default
+        try:
+            return self.hosts[name]
+        except KeyError:
+            raise ValueError(f"Unknown Docker host: {name}")
+
+    def _running(self, host: DockerHost) -> Optional[int]:
+        try:
+            return len(host.client.containers.list())
+        except Exception as e:
+            print(f"Error listing containers on {host.name}: {e}")
+            return None
+
+    def _load(self, host: DockerHost, env_types: List[str], running: Optional[int]) -> tuple[float, int]:
+        """Committed share of the host and its container count, including containers still starting"""
+        if running is None:
+            return float("inf"), 0
+        starting = self._starting[host.name]
+        profiles = [self.resource_profiles[env_type] for env_type in env_types + starting]
+        cpu_share = sum(p.cpus for p in profiles) / host.cpus if host.cpus else 0.0
+        memory_share = sum(p.memory_bytes for p in profiles) / host.memory if host.memory else 0.0
+        return max(cpu_share, memory_share), running + len(starting)
+
+    def choose(
+        self, env_types_by_host: Dict[str, List[str]], candidates: Optional[List[str]] = None, env_type: str = "browser"
+    ) -> DockerHost:
+        """
+        Reserve a slot on the least-loaded host.
+
+        Args:
+            env_types_by_host: env_type of every marinabox container on each host
+            candidates: Names of the hosts to choose from, defaults to all
+            env_type: env_type of the container being placed
+
+        Call release() with the host and env_type once the container is running or has failed.
+        """
+        names = candidates or list(self.hosts)
+        if len(names) == 1:
+            host = self.get(names[0])
+            with self._lock:
+                self._starting[host.name].append(env_type)
+            return host
+        running = {name: self._running(self.hosts[name]) for name in names}
+        with self._lock:
+            loads = {
+                name: self._load(self.hosts[name], env_types_by_host.get(name, []), running[name]) for name in names
+            }
+            name = min(names, key=lambda n: loads[n])
+            self._starting[name].append(env_type)
+        return self.hosts[name]
+
+    def release(self, host: DockerHost, env_type: str = "browser"):
+        with self._lock:
+            starting = self._starting[host.name]
+            if env_type in starting:
+                starting.remove(env_type)
+            elif starting:
+                starting.pop()
+
+    def stats(self) -> dict:
+        """Return each host's address, capacity and containers still starting"""
+        with self._lock:
+            return {
+                name: {"address": host.address, "cpus": host.cpus, "memory": host.memory, "starting": len(self._starting[name])}
+                for name, host in self.hosts.items()
+            }
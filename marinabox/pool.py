@@ -0,0 +1,140 @@
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+POOL_LABEL = "marinabox.pool"
+
+
+@dataclass
+class PooledContainer:
+    """A container that has been booted ahead of time and is waiting to be claimed"""
+    container: Any
+    env_type: str
+    resolution: str
+    vnc_port: int
+    computer_use_port: int
+    debug_port: Optional[int] = None
+    websocket_url: Optional[str] = None
+    ready_times: Optional[Dict[str, Optional[float]]] = None
+    docker_host: Optional[str] = None
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class WarmPool:
+    """
+    Keeps a number of pre-started containers per (env_type, resolution) so that
+    create_session can hand one out instantly instead of doing a cold docker run.
+    """
+
+    def __init__(self, manager, sizes: Dict[Tuple[str, str], int], latency_window: int = 1000):
+        self.manager = manager
+        self.sizes = dict(sizes)
+        self._ready: Dict[Tuple[str, str], Deque[PooledContainer]] = {key: deque() for key in self.sizes}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self._hit_latencies: Deque[float] = deque(maxlen=latency_window)
+        self._miss_latencies: Deque[float] = deque(maxlen=latency_window)
+
+    def start(self):
+        """Start the background refill thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refill_loop, name="marinabox-warm-pool", daemon=True)
+        self._thread.start()
+        self._wakeup.set()
+
+    def claim(self, env_type: str, resolution: str) -> Optional[PooledContainer]:
+        """Take a ready container out of the pool, or return None if none is available"""
+        key = (env_type, resolution)
+        with self._lock:
+            queue = self._ready.get(key)
+            entry = queue.popleft() if queue else None
+        if key in self.sizes:
+            self._wakeup.set()
+        return entry
+
+    def ready_containers(self) -> List[PooledContainer]:
+        """Every container waiting in the pool"""
+        with self._lock:
+            return [entry for queue in self._ready.values() for entry in queue]
+
+    def record_claim(self, hit: bool, seconds: float):
+        """Record the outcome and latency of a create_session call"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self._hit_latencies.append(seconds)
+            else:
+                self.misses += 1
+                self._miss_latencies.append(seconds)
+
+    def stats(self) -> dict:
+        """Return hit/miss counts, claim latencies and current pool sizes"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else None,
+                "hit_latency": _summarize(self._hit_latencies),
+                "miss_latency": _summarize(self._miss_latencies),
+                "ready": {f"{env_type}:{resolution}": len(queue) for (env_type, resolution), queue in self._ready.items()},
+                "targets": {f"{env_type}:{resolution}": size for (env_type, resolution), size in self.sizes.items()},
+            }
+
+    def close(self):
+        """Stop refilling and remove every container still waiting in the pool"""
+        self._closed.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+        with self._lock:
+            entries = [entry for queue in self._ready.values() for entry in queue]
+            for queue in self._ready.values():
+                queue.clear()
+        for entry in entries:
+            try:
+                entry.container.remove(force=True)
+                self.manager._release_ports((entry.debug_port, entry.vnc_port, entry.computer_use_port))
+            except Exception as e:
+                print(f"Error removing pooled container: {e}")
+
+    def _missing(self) -> List[Tuple[str, str]]:
+        with self._lock:
+            return [key for key, size in self.sizes.items() if len(self._ready[key]) < size]
+
+    def _refill_loop(self):
+        while not self._closed.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while not self._closed.is_set():
+                missing = self._missing()
+                if not missing:
+                    break
+                for env_type, resolution in missing:
+                    try:
+                        entry = self.manager._start_pooled_container(env_type, resolution)
+                    except Exception as e:
+                        print(f"Error refilling warm pool for {env_type}:{resolution}: {e}")
+                        self._closed.wait(5)
+                        continue
+                    with self._lock:
+                        self._ready[(env_type, resolution)].append(entry)
+
+
+def _summarize(samples) -> Optional[dict]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "avg": sum(ordered) / len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "max": ordered[-1],
+    }
@@ -0,0 +1,166 @@
+import fcntl
+import json
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+PORT_CLASSES = ("debug", "vnc", "computer_use")
+
+
+# Fresh ports to try when a Docker host reports a port as taken
+PORT_CONFLICT_RETRIES = 3
+
+
+def is_port_conflict(error: Exception) -> bool:
+    """Whether a Docker error says a published port is already in use on its host"""
+    message = str(error).lower()
+    return "port is already allocated" in message or "address already in use" in message
+
+
+def port_is_free(port: int, host: str = "0.0.0.0") -> bool:
+    """
+    Check that nothing on this machine currently holds the port.
+
+    Says nothing about remote Docker hosts, where a taken port only shows up as a
+    bind error when the container starts.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind((host, port))
+        except OSError:
+            return False
+    return True
+
+
+class PortAllocator:
+    """
+    Hands out host ports per port class (debug, vnc, computer_use).
+
+    Released ports go onto a per-class free list and are handed out again before the
+    high-water mark grows, so allocation stays constant-time regardless of how many
+    sessions have come and gone. Reservations are persisted to disk under a file lock,
+    so they survive a crash and are shared by every manager on the host.
+
+    With probe set, ports some other process on this machine holds are skipped.
+    Turn it off when containers run on remote Docker hosts only, where the probe
+    does not apply.
+    """
+
+    def __init__(
+        self, state_path: Path, bases: Dict[str, int], step: int = 2, max_skips: int = 64, probe: bool = True
+    ):
+        self.state_path = Path(state_path)
+        self.probe = probe
+        self.lock_path = self.state_path.with_suffix(".lock")
+        self.bases = dict(bases)
+        self.step = step
+        self.max_skips = max_skips
+        self._thread_lock = threading.Lock()
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def _locked_state(self):
+        with self._thread_lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                state = self._read_state()
+                yield state
+                self._write_state(state)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_state(self) -> dict:
+        state = {"next": {}, "free": {}, "reserved": {}}
+        try:
+            with open(self.state_path, "r") as f:
+                state.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading port reservations: {e}")
+        for port_class in PORT_CLASSES:
+            state["next"].setdefault(port_class, self.bases[port_class])
+            state["free"].setdefault(port_class, [])
+        return state
+
+    def _write_state(self, state: dict):
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _take(self, state: dict, port_class: str) -> int:
+        free = state["free"][port_class]
+        skipped = []
+        try:
+            for _ in range(self.max_skips):
+                if free:
+                    port = free.pop()
+                else:
+                    port = state["next"][port_class]
+                    state["next"][port_class] = port + self.step
+                if str(port) in state["reserved"]:
+                    continue
+                if not self.probe or port_is_free(port):
+                    return port
+                # Held by another process on the host, try it again later
+                skipped.append(port)
+            raise RuntimeError(f"No free {port_class} port found after {self.max_skips} attempts")
+        finally:
+            free[:0] = skipped
+
+    def allocate(self, env_type: str, owner: str, count: int = 1) -> List[tuple[Optional[int], int, int]]:
+        """Reserve (debug, vnc, computer_use) port triples for count containers"""
+        allocations = []
+        with self._locked_state() as state:
+            for _ in range(count):
+                debug_port = self._take(state, "debug") if env_type == "browser" else None
+                vnc_port = self._take(state, "vnc")
+                computer_use_port = self._take(state, "computer_use")
+                for port_class, port in (("debug", debug_port), ("vnc", vnc_port), ("computer_use", computer_use_port)):
+                    if port is not None:
+                        state["reserved"][str(port)] = {"class": port_class, "owner": owner}
+                allocations.append((debug_port, vnc_port, computer_use_port))
+        return allocations
+
+    def assign(self, ports: Iterable[Optional[int]], owner: str):
+        """Transfer reserved ports to a new owner, e.g. once a session id is known"""
+        with self._locked_state() as state:
+            for port in ports:
+                if port is not None and str(port) in state["reserved"]:
+                    state["reserved"][str(port)]["owner"] = owner
+
+    def release(self, ports: Iterable[Optional[int]], busy: bool = False):
+        """
+        Return ports to their free lists. Ports found busy, e.g. on a remote Docker
+        host, go to the back of the list so they are handed out again last.
+        """
+        with self._locked_state() as state:
+            for port in ports:
+                if port is None:
+                    continue
+                entry = state["reserved"].pop(str(port), None)
+                if entry is not None:
+                    if busy:
+                        state["free"][entry["class"]].insert(0, port)
+                    else:
+                        state["free"][entry["class"]].append(port)
+
+    def release_owners(self, is_stale) -> int:
+        """Release every reservation whose owner is_stale(owner) reports as gone"""
+        released = 0
+        with self._locked_state() as state:
+            for port, entry in list(state["reserved"].items()):
+                if is_stale(entry["owner"]):
+                    del state["reserved"][port]
+                    state["free"][entry["class"]].append(int(port))
+                    released += 1
+        return released
+
+    def reserved(self) -> Dict[int, str]:
+        """Return a mapping of reserved port to owner"""
+        with self._locked_state() as state:
+            return {int(port): entry["owner"] for port, entry in state["reserved"].items()}
@@ -0,0 +1,198 @@
+import bisect
+import json
+import queue
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+from .segments import PLAYLIST_NAME, _write_atomic
+
+PREVIEW_SUFFIX = ".preview"
+INDEX_NAME = "index.json"
+STRIP_NAME = "strip.jpg"
+THUMBNAIL_COUNT = 20
+THUMBNAIL_WIDTH = 160
+MIN_THUMBNAIL_INTERVAL = 1.0
+
+
+def preview_dir(video_path) -> Path:
+    """Directory holding a recording's thumbnails and keyframe index, next to the recording"""
+    video_path = Path(video_path)
+    return video_path.parent / f"{video_path.stem}{PREVIEW_SUFFIX}"
+
+
+def thumbnail_name(index: int) -> str:
+    return f"thumb_{index:03d}.jpg"
+
+
+def _run(args: List[str], timeout: float) -> str:
+    result = subprocess.run(args, capture_output=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(f"{args[0]} failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout.decode()
+
+
+def probe_duration(video_path: Path, ffprobe: str = "ffprobe") -> float:
+    output = _run([ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "json", str(video_path)], 60)
+    return float(json.loads(output)["format"]["duration"])
+
+
+def mp4_keyframes(video_path: Path, ffprobe: str = "ffprobe") -> List[dict]:
+    """
+    Time and byte offset of every keyframe in an MP4.
+
+    Only packet headers are read, nothing is decoded.
+    """
+    output = _run([
+        ffprobe, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,pos,flags", "-of", "json", str(video_path)
+    ], 300)
+    keyframes = []
+    for packet in json.loads(output).get("packets", []):
+        if "K" not in packet.get("flags", "") or packet.get("pts_time") in (None, "N/A"):
+            continue
+        keyframes.append({"time": round(float(packet["pts_time"]), 3), "offset": int(packet.get("pos", -1))})
+    keyframes.sort(key=lambda k: k["time"])
+    return keyframes
+
+
+def hls_keyframes(playlist_path: Path) -> List[dict]:
+    """
+    Start time of every segment of an HLS playlist.
+
+    The segmented recorder starts each segment with a keyframe, so segment
+    boundaries are the keyframes and the playlist alone is enough.
+    """
+    keyframes = []
+    elapsed = 0.0
+    duration = None
+    for line in playlist_path.read_text().splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",", 1)[0])
+        elif line and not line.startswith("#"):
+            keyframes.append({"time": round(elapsed, 3), "segment": line, "offset": 0})
+            elapsed += duration or 0.0
+            duration = None
+    return keyframes
+
+
+def nearest_keyframe(keyframes: List[dict], seconds: float) -> Optional[dict]:
+    """The last keyframe at or before seconds, or the first keyframe when seconds precedes it"""
+    if not keyframes:
+        return None
+    index = bisect.bisect_right([k["time"] for k in keyframes], seconds) - 1
+    return keyframes[max(index, 0)]
+
+
+def build_preview(video_path: Path, ffmpeg: str = "ffmpeg", ffprobe: str = "ffprobe") -> Path:
+    """
+    Write a thumbnail strip, single thumbnails and a keyframe index for a recording.
+
+    Thumbnails are taken from keyframes only, so the recording is decoded at a
+    fraction of its frame rate. Returns the preview directory.
+    """
+    video_path = Path(video_path)
+    is_playlist = video_path.name == PLAYLIST_NAME
+    directory = preview_dir(video_path)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    duration = probe_duration(video_path, ffprobe)
+    keyframes = hls_keyframes(video_path) if is_playlist else mp4_keyframes(video_path, ffprobe)
+    interval = max(duration / THUMBNAIL_COUNT, MIN_THUMBNAIL_INTERVAL)
+    count = max(1, min(THUMBNAIL_COUNT, int(duration // interval) or 1))
+
+    for old in directory.glob("thumb_*.jpg"):
+        old.unlink()
+    _run([
+        ffmpeg, "-nostdin", "-v", "error", "-y", "-skip_frame", "nokey", "-i", str(video_path),
+        "-filter_complex",
+        f"[0:v]fps=1/{interval:.3f},scale={THUMBNAIL_WIDTH}:-2,split[single][tiles];[tiles]tile={count}x1[strip]",
+        "-map", "[single]", "-frames:v", str(count), str(directory / "thumb_%03d.jpg"),
+        "-map", "[strip]", "-frames:v", "1", str(directory / STRIP_NAME),
+    ], max(120, duration))
+    # ffmpeg numbers image sequences from 1
+    thumbnails = sorted(directory.glob("thumb_*.jpg"))
+    for index, path in enumerate(thumbnails):
+        path.rename(directory / thumbnail_name(index))
+
+    index = {
+        "video": video_path.name,
+        "duration": duration,
+        "thumbnails": {
+            "count": len(thumbnails),
+            "interval": interval,
+            "width": THUMBNAIL_WIDTH,
+            "strip": STRIP_NAME,
+        },
+        "keyframes": keyframes,
+    }
+    _write_atomic(directory / INDEX_NAME, json.dumps(index).encode())
+    return directory
+
+
+def load_index(directory: Path) -> dict:
+    return json.loads((Path(directory) / INDEX_NAME).read_text())
+
+
+class PreviewBuilder:
+    """
+    Builds previews of stopped sessions' recordings in a background thread.
+
+    Sessions are handled one at a time, so stopping many sessions at once does not
+    start an ffmpeg per session. The preview directory is stored on the session
+    once it is written.
+    """
+
+    def __init__(self, manager, ffmpeg: Optional[str] = None, ffprobe: Optional[str] = None):
+        self.manager = manager
+        self.ffmpeg = ffmpeg or shutil.which("ffmpeg")
+        self.ffprobe = ffprobe or shutil.which("ffprobe")
+        self.built = 0
+        self.failed = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return bool(self.ffmpeg and self.ffprobe)
+
+    def submit(self, session):
+        """Queue a stopped session's recording for preview generation"""
+        if not self.available or not session.video_path:
+            return
+        # Export workers submit concurrently, and close() stops exactly one consumer
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="marinabox-previews", daemon=True)
+                self._thread.start()
+        self._queue.put(session.session_id)
+
+    def close(self):
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=10)
+
+    def _run(self):
+        while (session_id := self._queue.get()) is not None:
+            try:
+                self.build(session_id)
+            except Exception as e:
+                self.failed += 1
+                print(f"Error building preview for {session_id}: {e}")
+
+    def build(self, session_id: str) -> Optional[Path]:
+        """Build the preview of a closed session and record it on the session"""
+        session = self.manager.store.get(session_id)
+        if session is None or not session.video_path or not Path(session.video_path).is_file():
+            return None
+        directory = build_preview(Path(session.video_path), self.ffmpeg, self.ffprobe)
+        session.preview_path = str(directory)
+        self.manager.store.put(session)
+        self.built += 1
+        return directory
@@ -0,0 +1,219 @@
+import os
+import secrets
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+CHUNK_SIZE = 1024 * 1024
+MAX_RANGES = 32
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a Range header into sorted, merged (start, end) pairs with inclusive ends.
+
+    Returns None when the header is not a bytes range and should be ignored.
+
+    Raises:
+        RangeNotSatisfiable: If no range overlaps the file
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    ranges = []
+    for part in spec.split(","):
+        first, sep, last = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if not first:
+                # Suffix range: the last N bytes
+                length = int(last)
+                if length == 0:
+                    continue
+                start, end = max(0, size - length), size - 1
+            else:
+                start = int(first)
+                end = min(int(last), size - 1) if last else size - 1
+        except ValueError:
+            return None
+        if start < 0 or (last and first and int(last) < start):
+            return None
+        if start < size:
+            ranges.append((start, end))
+    if not ranges:
+        raise RangeNotSatisfiable()
+    if len(ranges) > MAX_RANGES:
+        # Too many ranges to be a real player seek, serve the whole file instead
+        return None
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+class RangeFileResponse(Response):
+    """
+    File response supporting single and multipart byte ranges and conditional requests.
+
+    Answers If-None-Match / If-Modified-Since with 304, honours If-Range, and
+    serves ranges with 206 (multipart/byteranges when more than one range is
+    requested). The file is handed to the server with http.response.zerocopysend
+    when the ASGI server offers it. Otherwise it is sent in bounded chunks read with
+    os.pread, so the file is never loaded into memory in full.
+    """
+
+    def __init__(self, path: Path, media_type: str, headers: Optional[dict] = None):
+        self.path = Path(path)
+        self.media_type = media_type
+        self.status_code = 200
+        self.background = None
+        self.init_headers(headers)
+
+    def _not_modified(self, request_headers: Headers, etag: str, mtime: float) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _if_range_matches(self, request_headers: Headers, etag: str, last_modified: str) -> bool:
+        if_range = request_headers.get("if-range")
+        return if_range is None or if_range.strip() in (etag, last_modified)
+
+    async def __call__(self, scope, receive, send):
+        try:
+            stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+        except FileNotFoundError:
+            raise RuntimeError(f"File at path {self.path} does not exist.")
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise RuntimeError(f"File at path {self.path} is not a file.")
+
+        size = stat_result.st_size
+        etag = file_etag(stat_result)
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        request_headers = Headers(scope=scope)
+        send_body = scope["method"].upper() != "HEAD"
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": last_modified,
+        }
+        headers.update(self.headers)
+
+        if self._not_modified(request_headers, etag, stat_result.st_mtime):
+            await self._start(send, 304, headers)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        ranges = None
+        range_header = request_headers.get("range")
+        if range_header and self._if_range_matches(request_headers, etag, last_modified):
+            try:
+                ranges = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                headers["content-range"] = f"bytes */{size}"
+                await self._start(send, 416, headers)
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        if not ranges:
+            headers.update({"content-type": self.media_type, "content-length": str(size)})
+            await self._start(send, 200, headers)
+            parts = [(None, 0, size - 1)] if size else []
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            headers.update({
+                "content-type": self.media_type,
+                "content-length": str(end - start + 1),
+                "content-range": f"bytes {start}-{end}/{size}",
+            })
+            await self._start(send, 206, headers)
+            parts = [(None, start, end)]
+        else:
+            boundary = secrets.token_hex(16)
+            parts = [
+                (
+                    (
+                        f"--{boundary}\r\nContent-Type: {self.media_type}\r\n"
+                        f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                    ).encode(),
+                    start,
+                    end,
+                )
+                for start, end in ranges
+            ]
+            trailer = f"\r\n--{boundary}--\r\n".encode()
+            length = sum(len(head) + end - start + 1 for head, start, end in parts)
+            # Every part after the first is preceded by a CRLF
+            length += 2 * (len(parts) - 1) + len(trailer)
+            headers.update({
+                "content-type": f"multipart/byteranges; boundary={boundary}",
+                "content-length": str(length),
+            })
+            await self._start(send, 206, headers)
+
+        if not send_body:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        zero_copy = "http.response.zerocopysend" in scope.get("extensions", {})
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            for index, (head, start, end) in enumerate(parts):
+                if head is not None:
+                    prefix = b"\r\n" + head if index else head
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                await self._send_span(send, file, start, end - start + 1, zero_copy)
+            trailer_body = trailer if len(parts) > 1 else b""
+            await send({"type": "http.response.body", "body": trailer_body, "more_body": False})
+        finally:
+            file.close()
+
+    async def _start(self, send, status: int, headers: dict):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in headers.items()],
+        })
+
+    async def _send_span(self, send, file, offset: int, count: int, zero_copy: bool):
+        if zero_copy:
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": file,
+                "offset": offset,
+                "count": count,
+                "more_body": True,
+            })
+            return
+        while count > 0:
+            chunk = await anyio.to_thread.run_sync(os.pread, file.fileno(), min(CHUNK_SIZE, count), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            count -= len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
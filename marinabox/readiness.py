@@ -0,0 +1,149 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import httpx
+import requests
+
+
+@dataclass
+class ReadinessResult:
+    """Outcome of waiting for a container's endpoints to come up"""
+    ready: bool
+    ready_times: Dict[str, Optional[float]] = field(default_factory=dict)
+    websocket_url: Optional[str] = None
+
+
+def _probe(name: str, url: str, deadline: float, initial_delay: float, max_delay: float) -> tuple[Optional[float], Optional[str]]:
+    """
+    Poll a single endpoint with exponential backoff until it answers or the deadline passes.
+
+    Returns the time to ready in seconds (None on timeout) and, for the CDP endpoint,
+    the WebSocket debugger URL.
+    """
+    started = time.monotonic()
+    delay = initial_delay
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None, None
+        try:
+            response = requests.get(url, timeout=min(1.0, remaining))
+            if name == "cdp":
+                websocket_url = response.json().get("webSocketDebuggerUrl")
+                if websocket_url:
+                    return time.monotonic() - started, websocket_url
+            elif response.status_code < 500:
+                # Any HTTP answer means the server inside the container is listening
+                return time.monotonic() - started, None
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, max_delay)
+
+
+def wait_until_ready(
+    env_type: str,
+    vnc_port: int,
+    computer_use_port: int,
+    debug_port: Optional[int] = None,
+    host: str = "127.0.0.1",
+    timeout: float = 30.0,
+    initial_delay: float = 0.05,
+    max_delay: float = 1.0
+) -> ReadinessResult:
+    """
+    Probe the VNC, computer-use and (for browsers) CDP endpoints of a container concurrently.
+
+    Returns as soon as every endpoint the env_type needs is answering, or when the
+    overall timeout expires. Per-endpoint time-to-ready is reported in seconds.
+    """
+    endpoints = {
+        "vnc": f"http://{host}:{vnc_port}/",
+        "computer_use": f"http://{host}:{computer_use_port}/",
+    }
+    if env_type == "browser" and debug_port is not None:
+        endpoints["cdp"] = f"http://{host}:{debug_port}/json/version"
+
+    deadline = time.monotonic() + timeout
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+        futures = {
+            name: executor.submit(_probe, name, url, deadline, initial_delay, max_delay)
+            for name, url in endpoints.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+    ready_times = {name: elapsed for name, (elapsed, _) in results.items()}
+    websocket_url = results["cdp"][1] if "cdp" in results else None
+    return ReadinessResult(
+        ready=all(elapsed is not None for elapsed in ready_times.values()),
+        ready_times=ready_times,
+        websocket_url=websocket_url
+    )
+
+
+async def _async_probe(
+    client: httpx.AsyncClient, name: str, url: str, deadline: float, initial_delay: float, max_delay: float
+) -> tuple[Optional[float], Optional[str]]:
+    """Async counterpart of _probe"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    delay = initial_delay
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return None, None
+        try:
+            response = await client.get(url, timeout=min(1.0, remaining))
+            if name == "cdp":
+                websocket_url = response.json().get("webSocketDebuggerUrl")
+                if websocket_url:
+                    return loop.time() - started, websocket_url
+            elif response.status_code < 500:
+                return loop.time() - started, None
+        except (httpx.HTTPError, ValueError):
+            pass
+        await asyncio.sleep(min(delay, max(0.0, deadline - loop.time())))
+        delay = min(delay * 2, max_delay)
+
+
+async def async_wait_until_ready(
+    env_type: str,
+    vnc_port: int,
+    computer_use_port: int,
+    debug_port: Optional[int] = None,
+    host: str = "127.0.0.1",
+    timeout: float = 30.0,
+    initial_delay: float = 0.05,
+    max_delay: float = 1.0,
+    client: Optional[httpx.AsyncClient] = None
+) -> ReadinessResult:
+    """Async counterpart of wait_until_ready, probing every endpoint on the running event loop"""
+    endpoints = {
+        "vnc": f"http://{host}:{vnc_port}/",
+        "computer_use": f"http://{host}:{computer_use_port}/",
+    }
+    if env_type == "browser" and debug_port is not None:
+        endpoints["cdp"] = f"http://{host}:{debug_port}/json/version"
+
+    owns_client = client is None
+    client = client or httpx.AsyncClient()
+    try:
+        deadline = asyncio.get_running_loop().time() + timeout
+        outcomes = await asyncio.gather(*(
+            _async_probe(client, name, url, deadline, initial_delay, max_delay) for name, url in endpoints.items()
+        ))
+    finally:
+        if owns_client:
+            await client.aclose()
+
+    results = dict(zip(endpoints, outcomes))
+    ready_times = {name: elapsed for name, (elapsed, _) in results.items()}
+    websocket_url = results["cdp"][1] if "cdp" in results else None
+    return ReadinessResult(
+        ready=all(elapsed is not None for elapsed in ready_times.values()),
+        ready_times=ready_times,
+        websocket_url=websocket_url
+    )
@@ -0,0 +1,79 @@
+import threading
+from typing import Optional
+
+WATCHED_EVENTS = ("die", "destroy", "oom")
+
+
+class EventReconciler:
+    """
+    Keeps a manager's in-memory sessions in sync with Docker by following the
+    container events stream instead of listing containers on every read.
+
+    Sessions whose container dies or is destroyed are marked stale, and sessions
+    whose container is OOM-killed are marked oom_killed. After a dropped
+    connection the reconciler runs one full reconcile to catch missed events.
+    """
+
+    def __init__(self, manager, client=None, retry_delay: float = 1.0, max_retry_delay: float = 30.0):
+        self.manager = manager
+        self.client = client or manager.client
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.events_handled = 0
+        self._stream = None
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start following the Docker events stream in a background thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="marinabox-reconciler", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop following events"""
+        self._closed.set()
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        delay = self.retry_delay
+        first = True
+        while not self._closed.is_set():
+            try:
+                self._stream = self.client.events(
+                    decode=True,
+                    filters={"type": "container", "event": list(WATCHED_EVENTS)}
+                )
+                if not first:
+                    # Events may have been missed while disconnected
+                    self.manager.reconcile()
+                first = False
+                delay = self.retry_delay
+                for event in self._stream:
+                    self.handle_event(event)
+            except Exception as e:
+                if self._closed.is_set():
+                    break
+                print(f"Error following Docker events: {e}")
+            finally:
+                self._stream = None
+            self._closed.wait(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def handle_event(self, event: dict):
+        """Apply a single Docker container event to the manager's sessions"""
+        action = event.get("Action") or event.get("status")
+        container_id = event.get("id") or event.get("Actor", {}).get("ID")
+        if action not in WATCHED_EVENTS or not container_id:
+            return
+        self.events_handled += 1
+        status = "oom_killed" if action == "oom" else "stale"
+        self.manager._mark_container_gone(container_id, status)
@@ -0,0 +1,133 @@
+import abc
+import hashlib
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _ChunkStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks, such as a docker archive stream"""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+class VideoSink(abc.ABC):
+    """Destination for recordings copied out of a container"""
+
+    @abc.abstractmethod
+    def write(self, source: BinaryIO, filename: str) -> Path:
+        """Consume source in bounded chunks and return the path the recording is available at"""
+        raise NotImplementedError
+
+
+class LocalFileSink(VideoSink):
+    """Writes recordings to a directory, renaming into place once the copy is complete"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def write(self, source: BinaryIO, filename: str) -> Path:
+        target = self.directory / filename
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(source, out, CHUNK_SIZE)
+            os.replace(tmp_name, target)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return target
+
+
+class ContentAddressedSink(VideoSink):
+    """
+    Stores each recording once under objects/<sha256[:2]>/<sha256> and links it
+    into the directory under the requested filename.
+    """
+
+    def __init__(self, directory: Path, objects_path: Optional[Path] = None):
+        self.directory = Path(directory)
+        self.objects_path = Path(objects_path) if objects_path else self.directory / "objects"
+
+    def write(self, source: BinaryIO, filename: str) -> Path:
+        self.objects_path.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_name = tempfile.mkstemp(dir=self.objects_path, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while chunk := source.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    out.write(chunk)
+            obj = self.objects_path / digest.hexdigest()[:2] / digest.hexdigest()
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            if obj.exists():
+                os.unlink(tmp_name)
+            else:
+                os.replace(tmp_name, obj)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        target = self.directory / filename
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.unlink(missing_ok=True)
+        try:
+            os.link(obj, target)
+        except OSError:
+            shutil.copyfile(obj, target)
+        return target
+
+
+def extract_archive(chunks: Iterator[bytes], sink: VideoSink, filename: str, chunk_size: int = CHUNK_SIZE) -> Path:
+    """
+    Unpack the first regular file of a tar stream into a sink on the fly.
+
+    The stream is consumed in bounded chunks, so the file is never buffered in memory in full.
+    """
+    stream = io.BufferedReader(_ChunkStream(chunks), buffer_size=chunk_size)
+    with tarfile.open(fileobj=stream, mode="r|") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            source = archive.extractfile(member)
+            return sink.write(source, filename)
+    raise FileNotFoundError(f"No file found in archive for {filename}")
+
+
+def copy_from_container(container, path: str, sink: VideoSink, filename: str, chunk_size: int = CHUNK_SIZE) -> Path:
+    """Stream a single file out of a container through the Docker archive API"""
+    chunks, _ = container.get_archive(path, chunk_size=chunk_size)
+    return extract_archive(chunks, sink, filename, chunk_size)
+
+
+def read_from_container(container, path: str) -> bytes:
+    """Read a small file out of a container, which works whether or not the container is running"""
+    chunks, _ = container.get_archive(path)
+    with tarfile.open(fileobj=io.BytesIO(b"".join(chunks)), mode="r") as archive:
+        for member in archive:
+            if member.isfile():
+                return archive.extractfile(member).read()
+    raise FileNotFoundError(f"No file found in archive for {path}")
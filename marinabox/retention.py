@@ -0,0 +1,259 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Union
+
+from .admission import parse_bytes
+from .preview import preview_dir
+from .recording import ContentAddressedSink
+from .segments import PLAYLIST_NAME
+
+ARCHIVE_SUFFIX = ".archive.mp4"
+OBJECT_GRACE_SECONDS = 3600
+
+# Compact profile for recordings nobody has watched in a while: 5 fps, at most 720p, high CRF
+ARCHIVE_ARGS = [
+    "-an", "-vf", "fps=5,scale='min(1280,iw)':-2",
+    "-c:v", "libx264", "-preset", "slow", "-crf", "32", "-pix_fmt", "yuv420p",
+    "-movflags", "+faststart",
+]
+
+
+def recording_paths(video_path: Union[str, Path]) -> List[Path]:
+    """Files and directories that make up a recording: the video or HLS directory, and its preview"""
+    video_path = Path(video_path)
+    if video_path.name == PLAYLIST_NAME:
+        # Segments and the preview live in the session's own directory
+        return [video_path.parent]
+    return [video_path, preview_dir(video_path)]
+
+
+def disk_usage(paths: List[Path]) -> int:
+    total = 0
+    for path in paths:
+        if path.is_dir():
+            total += sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+        elif path.is_file():
+            total += path.stat().st_size
+    return total
+
+
+def _remove(paths: List[Path]):
+    for path in paths:
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+
+
+class RetentionManager:
+    """
+    Keeps the recordings of closed sessions within a disk budget and a maximum age.
+
+    Each pass deletes recordings older than max_age, re-encodes recordings that
+    have not been viewed for archive_after seconds to a compact archival MP4, then
+    deletes the least recently viewed recordings until the rest fit in the budget.
+    The closed session records are updated to match: video_path points at the
+    archive or is cleared once the recording is gone, including recordings that
+    were deleted by hand.
+    """
+
+    def __init__(
+        self,
+        manager,
+        budget: Optional[Union[int, str]] = None,
+        max_age: Optional[float] = None,
+        archive_after: Optional[float] = None,
+        interval: float = 300.0,
+        ffmpeg: Optional[str] = None
+    ):
+        self.manager = manager
+        self.budget = parse_bytes(budget) if budget is not None else None
+        self.max_age = max_age
+        self.archive_after = archive_after
+        self.interval = interval
+        self.ffmpeg = ffmpeg or shutil.which("ffmpeg")
+        self._stats = {
+            "passes": 0,
+            "evicted": 0,
+            "evicted_bytes": 0,
+            "evict_seconds": 0.0,
+            "archived": 0,
+            "archive_input_bytes": 0,
+            "archive_saved_bytes": 0,
+            "archive_seconds": 0.0,
+            "missing": 0,
+            "last_pass_seconds": None,
+            "last_pass_at": None,
+            "used_bytes": None,
+        }
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Enforce the policy in a background thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="marinabox-retention", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def _run(self):
+        while not self._closed.wait(self.interval):
+            try:
+                self.enforce()
+            except Exception as e:
+                print(f"Error enforcing video retention: {e}")
+
+    def stats(self) -> dict:
+        """Counters of the work done so far, with eviction and archival throughput"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["budget_bytes"] = self.budget
+        stats["evict_bytes_per_second"] = (
+            stats["evicted_bytes"] / stats["evict_seconds"] if stats["evict_seconds"] else None
+        )
+        stats["archive_bytes_per_second"] = (
+            stats["archive_input_bytes"] / stats["archive_seconds"] if stats["archive_seconds"] else None
+        )
+        return stats
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def _last_viewed(self, session) -> datetime:
+        return session.last_viewed_at or session.closed_at or session.created_at
+
+    def enforce(self):
+        """Run one retention pass"""
+        started = time.monotonic()
+        now = datetime.now(timezone.utc)
+        recordings = []
+        for session in self.manager.store.list(active=False):
+            # Recordings still being exported are not on disk yet, and failed exports keep
+            # their state for the export status endpoint. None predates export tracking
+            if not session.video_path or session.export_status not in (None, "done"):
+                continue
+            paths = recording_paths(session.video_path)
+            if not paths[0].exists():
+                # Deleted by hand, not evicted
+                self._forget(session, evicted=False)
+                self._count(missing=1)
+                continue
+            recordings.append((session, paths))
+
+        kept = []
+        for session, paths in recordings:
+            closed_at = session.closed_at or session.created_at
+            if self.max_age is not None and (now - closed_at).total_seconds() >= self.max_age:
+                self._evict(session, paths)
+            else:
+                kept.append((session, paths))
+
+        if self.archive_after is not None and self.ffmpeg:
+            for index, (session, paths) in enumerate(kept):
+                if self._closed.is_set():
+                    break
+                idle = (now - self._last_viewed(session)).total_seconds()
+                if session.archived_at is None and idle >= self.archive_after:
+                    try:
+                        kept[index] = (session, self._archive(session, paths))
+                    except Exception as e:
+                        print(f"Error archiving recording of {session.session_id}: {e}")
+
+        sizes = [(session, paths, disk_usage(paths)) for session, paths in kept]
+        used = sum(size for _, _, size in sizes)
+        if self.budget is not None and used > self.budget:
+            for session, paths, size in sorted(sizes, key=lambda item: self._last_viewed(item[0])):
+                if used <= self.budget:
+                    break
+                self._evict(session, paths, size)
+                used -= size
+
+        if isinstance(self.manager.video_sink, ContentAddressedSink):
+            self._collect_objects(self.manager.video_sink.objects_path)
+
+        with self._lock:
+            self._stats["passes"] += 1
+            self._stats["last_pass_seconds"] = time.monotonic() - started
+            self._stats["last_pass_at"] = now.isoformat()
+            self._stats["used_bytes"] = used
+
+    def _forget(self, session, evicted: bool = True):
+        session.video_path = None
+        session.preview_path = None
+        if evicted:
+            session.evicted_at = datetime.now(timezone.utc)
+        self.manager.store.put(session)
+
+    def _evict(self, session, paths: List[Path], size: Optional[int] = None):
+        size = disk_usage(paths) if size is None else size
+        started = time.monotonic()
+        _remove(paths)
+        self._forget(session)
+        self._count(evicted=1, evicted_bytes=size, evict_seconds=time.monotonic() - started)
+
+    def _archive(self, session, paths: List[Path]) -> List[Path]:
+        """Re-encode a recording to the archival profile and point the session at it"""
+        source = Path(session.video_path)
+        directory = source.parent.parent if source.name == PLAYLIST_NAME else source.parent
+        target = directory / f"{session.session_id}{ARCHIVE_SUFFIX}"
+        partial = target.with_name(f".{target.name}.part")
+        input_bytes = disk_usage(paths[:1])
+
+        # Local playlists reference .m4s segments, which the HLS demuxer only opens when allowed
+        input_args = ["-allowed_extensions", "ALL"] if source.name == PLAYLIST_NAME else []
+        started = time.monotonic()
+        result = subprocess.run(
+            [
+                self.ffmpeg, "-nostdin", "-v", "error", "-y", *input_args, "-i", str(source),
+                *ARCHIVE_ARGS, "-f", "mp4", str(partial)
+            ],
+            capture_output=True
+        )
+        if result.returncode != 0:
+            partial.unlink(missing_ok=True)
+            raise RuntimeError(result.stderr.decode(errors="replace").strip())
+        os.replace(partial, target)
+        elapsed = time.monotonic() - started
+
+        _remove(paths)
+        session.video_path = str(target)
+        session.preview_path = None
+        session.archived_at = datetime.now(timezone.utc)
+        self.manager.store.put(session)
+        output_bytes = target.stat().st_size
+        self._count(
+            archived=1,
+            archive_input_bytes=input_bytes,
+            archive_saved_bytes=input_bytes - output_bytes,
+            archive_seconds=elapsed
+        )
+        # Keyframe offsets changed, so rebuild the preview from the archive
+        if self.manager.previews is not None:
+            self.manager.previews.submit(session)
+        return recording_paths(target)
+
+    def _collect_objects(self, objects_path: Path):
+        """Delete content-addressed objects no recording links to any more"""
+        if not objects_path.is_dir():
+            return
+        for obj in objects_path.glob("*/*"):
+            try:
+                stat = obj.stat()
+                # Skip objects that were just written and may not be linked yet
+                if stat.st_nlink == 1 and time.time() - stat.st_mtime > OBJECT_GRACE_SECONDS:
+                    obj.unlink()
+            except OSError:
+                continue
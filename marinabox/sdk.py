@@ -1,15 +1,63 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
+from datetime import datetime
 from .local_manager import LocalContainerManager
-from .models import BrowserSession
+from .models import BrowserSession, StopResult
 from .config import Config
+from .recording import VideoSink
+from .admission import ResourceProfile
+from .placement import DockerHost
 import asyncio
 from .computer_use.cli import main as computer_use_main
 from pathlib import Path
 
 class MarinaboxSDK:
-    def __init__(self, videos_path: Optional[str] = None):
+    def __init__(
+        self,
+        videos_path: Optional[str] = None,
+        warm_pool: Optional[Dict[Tuple[str, str], int]] = None,
+        video_sink: Optional[VideoSink] = None,
+        watch_events: bool = False,
+        resource_profiles: Optional[Dict[str, ResourceProfile]] = None,
+        admission_timeout: float = 60.0,
+        idle_timeout: Optional[float] = None,
+        idle_ttl: Optional[float] = None,
+        docker_hosts: Optional[List[DockerHost]] = None,
+        video_budget: Optional[str] = None,
+        video_max_age: Optional[float] = None,
+        archive_after: Optional[float] = None
+    ):
+        """
+        Args:
+            videos_path: Optional directory to store video recordings
+            warm_pool: Optional mapping of (env_type, resolution) to the number of
+                pre-started containers to keep ready, e.g. {("browser", "1280x800x24"): 2}
+            video_sink: Optional destination for recordings, e.g. a ContentAddressedSink
+            watch_events: Follow Docker container events instead of listing containers on every read
+            resource_profiles: Optional CPU, memory, shm and pids limits per env_type,
+                e.g. {"browser": ResourceProfile(cpus=2, mem_limit="4g", shm_size="2g", pids_limit=1024)}
+            admission_timeout: Seconds a new session may wait for host capacity before it is rejected
+            idle_timeout: Pause sessions idle for this many seconds, resuming them on the next command
+            idle_ttl: Stop sessions idle for this many seconds
+            docker_hosts: Docker daemons to spread sessions over,
+                e.g. [DockerHost("box1", "tcp://10.0.0.1:2375", "10.0.0.1")]
+            video_budget: Disk space for recordings of closed sessions, e.g. "200g";
+                the least recently viewed recordings are deleted beyond it
+            video_max_age: Delete recordings this many seconds after their session closed
+            archive_after: Re-encode recordings not viewed for this many seconds to a compact MP4
+        """
         self.manager = LocalContainerManager(
-            videos_path=Path(videos_path) if videos_path else None
+            videos_path=Path(videos_path) if videos_path else None,
+            warm_pool=warm_pool,
+            video_sink=video_sink,
+            watch_events=watch_events,
+            resource_profiles=resource_profiles,
+            admission_timeout=admission_timeout,
+            idle_timeout=idle_timeout,
+            idle_ttl=idle_ttl,
+            docker_hosts=docker_hosts,
+            video_budget=video_budget,
+            video_max_age=video_max_age,
+            archive_after=archive_after
         )
         self.config = Config()
 
@@ -19,7 +67,9 @@ class MarinaboxSDK:
         resolution: str = "1280x800x24",
         tag: Optional[str] = None,
         kiosk: bool = False,
-        initial_url: Optional[str] = None
+        initial_url: Optional[str] = None,
+        recording_format: str = "mp4",
+        recording: str = "full"
     ) -> BrowserSession:
         """
         Create a new Marinabox session.
@@ -30,6 +80,8 @@ class MarinaboxSDK:
             tag: Optional tag for the session
             kiosk: Whether to launch Chrome in kiosk mode
             initial_url: Optional URL to open when Chrome starts
+            recording_format: 'mp4', or 'hls' to record segments that can be watched live
+            recording: 'full', 'low-fps' to record at a few frames per second, or 'off'
             
         Returns:
             BrowserSession object
@@ -39,9 +91,73 @@ class MarinaboxSDK:
             resolution=resolution, 
             tag=tag,
             kiosk=kiosk,
-            initial_url=initial_url
+            initial_url=initial_url,
+            recording_format=recording_format,
+            recording=recording
+        )
+
+    def create_sessions(
+        self,
+        count: int,
+        env_type: str = "browser",
+        resolution: str = "1280x800x24",
+        tag: Optional[str] = None,
+        kiosk: bool = False,
+        initial_url: Optional[str] = None,
+        max_workers: int = 8,
+        recording_format: str = "mp4",
+        recording: str = "full"
+    ) -> List[BrowserSession]:
+        """
+        Create several Marinabox sessions concurrently.
+        
+        Args:
+            count: Number of sessions to create
+            env_type: Either 'browser' or 'desktop'
+            resolution: Screen resolution (e.g., '1280x800x24')
+            tag: Optional tag prefix; sessions are tagged '<tag>-<index>'
+            kiosk: Whether to launch Chrome in kiosk mode
+            initial_url: Optional URL to open when Chrome starts
+            max_workers: Maximum number of containers started at the same time
+            recording_format: 'mp4', or 'hls' to record segments that can be watched live
+            recording: 'full', 'low-fps' to record at a few frames per second, or 'off'
+            
+        Returns:
+            List of BrowserSession objects that were created successfully
+        """
+        return self.manager.create_sessions(
+            count,
+            env_type=env_type,
+            resolution=resolution,
+            tag=tag,
+            kiosk=kiosk,
+            initial_url=initial_url,
+            max_workers=max_workers,
+            recording_format=recording_format,
+            recording=recording
         )
 
+    def clone_session(
+        self,
+        session_id: str,
+        count: int = 1,
+        tag: Optional[str] = None,
+        max_workers: int = 8
+    ) -> List[BrowserSession]:
+        """
+        Start sessions from a snapshot of a running browser session.
+        
+        Args:
+            session_id: ID of the session to clone
+            count: Number of clones to start
+            tag: Optional tag prefix; clones are tagged '<tag>-<index>'
+            max_workers: Maximum number of containers started at the same time
+            
+        Returns:
+            List of BrowserSession objects that were created successfully
+        """
+        return self.manager.clone_session(session_id, count, tag=tag, max_workers=max_workers)
+
     def list_sessions(self) -> List[BrowserSession]:
         """List all active sessions"""
         return self.manager.list_sessions()
@@ -50,15 +166,25 @@ class MarinaboxSDK:
         """Get details for a specific session"""
         return self.manager.get_session(session_id)
 
-    def stop_session(self, session_id: str, video_filename: Optional[str] = None) -> bool:
+    def stop_session(self, session_id: str, video_filename: Optional[str] = None, wait: bool = True) -> bool:
         """
-        Stop a session
+        Stop a session and export its recording
         
         Args:
             session_id: ID of the session to stop
             video_filename: Optional custom filename for the video recording
+            wait: Wait until the recording is exported. Exports run in this process,
+                so without waiting they are lost if the process exits first; see
+                wait_for_export
         """
-        return self.manager.stop_session(session_id, video_filename=video_filename)
+        success = self.manager.stop_session(session_id, video_filename=video_filename)
+        if success and wait:
+            self.manager.wait_for_export(session_id)
+        return success
+
+    def wait_for_export(self, session_id: str, timeout: Optional[float] = None) -> Optional[str]:
+        """Wait until a stopped session's recording is exported, returning its export status"""
+        return self.manager.wait_for_export(session_id, timeout=timeout)
 
     def list_closed_sessions(self) -> List[BrowserSession]:
         """List all closed sessions"""
@@ -68,6 +194,11 @@ class MarinaboxSDK:
         """Get details for a specific closed session"""
         return self.manager.get_closed_session(session_id)
 
+    def get_preview(self, session_id: str) -> Optional[dict]:
+        """Get the thumbnail layout and keyframe index of a closed session's recording, once built"""
+        preview = self.manager.get_preview(session_id)
+        return preview[1] if preview else None
+
     def update_tag(self, session_id: str, tag: str) -> Optional[BrowserSession]:
         """Add or update tag for a session"""
         return self.manager.update_tag(session_id, tag)
@@ -76,27 +207,21 @@ class MarinaboxSDK:
         """Set Anthropic API key"""
         self.config.set_anthropic_key(api_key)
 
-    def get_session_by_identifier(self, identifier: str) -> Optional[BrowserSession]:
+    def get_session_by_identifier(self, identifier: str, reconcile: bool = False) -> Optional[BrowserSession]:
         """
         Get a session by ID or tag.
         
         Args:
             identifier: Session ID or tag
+            reconcile: Check the session store and Docker for changes before the lookup
             
         Returns:
             BrowserSession object if found, None otherwise
+            
+        Raises:
+            ValueError: If more than one active session carries the tag
         """
-        # Try by ID first
-        session = self.get_session(identifier)
-        if session:
-            return session
-
-        # Try by tag
-        sessions = self.list_sessions()
-        matching_sessions = [s for s in sessions if s.tag == identifier]
-        if len(matching_sessions) == 1:
-            return matching_sessions[0]
-        return None
+        return self.manager.get_session_by_identifier(identifier, reconcile=reconcile)
 
     async def execute_computer_use_command(
         self, 
@@ -123,10 +248,30 @@ class MarinaboxSDK:
         session = self.get_session_by_identifier(session_identifier)
         if not session:
             raise ValueError("No session found with this ID or tag")
+        self.manager.record_activity(session.session_id)
 
-        responses = await computer_use_main(command, api_key, session.computer_use_port)
+        responses = await computer_use_main(command, api_key, session.computer_use_port, session.get_host())
         return responses
 
+    def send_input(self, session_id: str, message: str) -> Optional[dict]:
+        """Send a message to a running session's input queue, returning it with its id"""
+        return self.manager.send_input(session_id, message)
+
+    def read_input(self, session_id: str, timeout: float = 30.0, visibility_timeout: float = 60.0) -> Optional[dict]:
+        """
+        Wait for the next message sent to a session.
+
+        Args:
+            timeout: Seconds to wait before returning None
+            visibility_timeout: Seconds after which the message is delivered again
+                unless it was acknowledged with ack_input
+        """
+        return self.manager.read_input(session_id, timeout=timeout, visibility_timeout=visibility_timeout)
+
+    def ack_input(self, session_id: str, message_id: int) -> bool:
+        """Acknowledge a message returned by read_input"""
+        return self.manager.ack_input(session_id, message_id)
+
     def computer_use_command(self, session_identifier: str, command: str) -> List:
         """
         Synchronous wrapper for execute_computer_use_command
@@ -134,11 +279,74 @@ class MarinaboxSDK:
         responses = asyncio.run(self.execute_computer_use_command(session_identifier, command)) 
         return responses
 
-    def stop_all_sessions(self) -> Dict[str, bool]:
+    def stop_all_sessions(self, max_workers: int = 8, wait: bool = True) -> Dict[str, StopResult]:
         """
-        Stop all active sessions.
+        Stop all active sessions concurrently.
+        
+        Args:
+            max_workers: Maximum number of sessions stopped at the same time
+            wait: Wait until the recordings are exported, see stop_session
         
         Returns:
-            Dictionary mapping session IDs to their stop operation success status
+            Dictionary mapping session IDs to a StopResult, which is truthy on success
+            and carries per-stage timings
         """
-        return self.manager.stop_all_sessions()
\ No newline at end of file
+        results = self.manager.stop_all_sessions(max_workers=max_workers)
+        if wait:
+            for session_id, result in results.items():
+                if result:
+                    self.manager.wait_for_export(session_id)
+        return results
+
+    def admission_stats(self) -> Optional[dict]:
+        """Return committed host capacity, queue length and queue wait times"""
+        return self.manager.admission_stats()
+
+    def placement_stats(self) -> dict:
+        """Return each Docker host's address, capacity and active sessions"""
+        return self.manager.placement_stats()
+
+    def recording_stats(self) -> Dict[str, dict]:
+        """Return the recorder's measured CPU cost per recording profile"""
+        return self.manager.recording_stats()
+
+    def retention_stats(self) -> Optional[dict]:
+        """Return recordings evicted and archived, bytes freed and throughput, or None if retention is off"""
+        return self.manager.retention_stats()
+
+    def export_stats(self) -> dict:
+        """Return the number of queued, exported, retried and failed recording exports"""
+        return self.manager.export_stats()
+
+    def search_logs(
+        self,
+        query: Optional[str] = None,
+        session_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        before: Optional[int] = None,
+        limit: int = 100
+    ) -> List[dict]:
+        """
+        Search the logs of all sessions, newest first.
+
+        Args:
+            query: Full-text query, e.g. 'timeout AND click'
+            start: Only records at or after this time, UTC when no timezone is given
+            end: Only records before this time
+            before: The id of the last record of the previous page
+        """
+        return self.manager.search_logs(
+            query=query, session_id=session_id, start=start, end=end, level=level, source=source,
+            before=before, limit=limit
+        )
+
+    def pool_stats(self) -> Optional[dict]:
+        """Return warm pool hit/miss counts and claim latencies, or None if no pool is configured"""
+        return self.manager.pool_stats()
+
+    def close(self) -> None:
+        """Remove pre-started pool containers and stop background watchers"""
+        self.manager.close()
\ No newline at end of file
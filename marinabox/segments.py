@@ -0,0 +1,207 @@
+import os
+import shlex
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import docker
+
+from .recording import LocalFileSink, copy_from_container, read_from_container
+
+RECORDING_FORMATS = ("mp4", "hls")
+RECORDING_PROFILES = ("off", "low-fps", "full")
+HLS_DIR = "/tmp/hls"
+PLAYLIST_NAME = "index.m3u8"
+MP4_PATH = "/tmp/session.mp4"
+RECORDER_PID = "/tmp/recorder.pid"
+SEGMENT_SECONDS = 4
+FRAMERATE = 15
+LOW_FPS_FRAMERATE = 2
+
+# Prints the arguments of the running ffmpeg recorder, one per line
+_FIND_RECORDER_CMD = (
+    "for p in /proc/[0-9]*; do "
+    "if tr '\\000' '\\n' < $p/cmdline 2>/dev/null | grep -qx -- x11grab; then tr '\\000' '\\n' < $p/cmdline; break; fi; "
+    "done"
+)
+
+
+def detect_display(container) -> str:
+    """X display the container's recorder captures, read from its ffmpeg command line"""
+    try:
+        result = container.exec_run(["sh", "-c", _FIND_RECORDER_CMD])
+        args = (result.output or b"").decode(errors="replace").splitlines()
+        if "-i" in args:
+            return args[args.index("-i") + 1].split("+")[0]
+    except Exception as e:
+        print(f"Error locating recorder display: {e}")
+    return ":0"
+
+
+def profile_framerate(recording: str) -> int:
+    """Frames per second recorded under a recording profile"""
+    return LOW_FPS_FRAMERATE if recording == "low-fps" else FRAMERATE
+
+
+def recording_environment(recording: str) -> Dict[str, str]:
+    """Container environment telling the image's recorder which profile to use"""
+    return {
+        "RECORDING": recording,
+        "RECORDING_FRAMERATE": "" if recording == "off" else str(profile_framerate(recording)),
+    }
+
+
+def _capture_args(display: str, resolution: str, framerate: int) -> List[str]:
+    width, height = resolution.split("x")[:2]
+    return [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-f", "x11grab", "-framerate", str(framerate), "-video_size", f"{width}x{height}", "-i", display,
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+    ]
+
+
+def _background(args: List[str]) -> str:
+    return f"nohup {shlex.join(args)} > /tmp/recorder.log 2>&1 & echo $! > {RECORDER_PID}"
+
+
+def segmented_recorder_command(display: str, resolution: str, framerate: int = FRAMERATE) -> str:
+    """
+    Shell command that records the display as fMP4 HLS segments in the background.
+
+    A keyframe starts every segment, segments are listed in the playlist only once
+    complete, and the recorder's pid is written to RECORDER_PID.
+    """
+    args = _capture_args(display, resolution, framerate) + [
+        "-g", str(framerate * SEGMENT_SECONDS), "-keyint_min", str(framerate * SEGMENT_SECONDS), "-sc_threshold", "0",
+        "-f", "hls", "-hls_time", str(SEGMENT_SECONDS), "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", "init.mp4", "-hls_playlist_type", "event",
+        "-hls_flags", "independent_segments",
+        "-hls_segment_filename", f"{HLS_DIR}/segment_%05d.m4s",
+        f"{HLS_DIR}/{PLAYLIST_NAME}",
+    ]
+    return f"mkdir -p {HLS_DIR} && {_background(args)}"
+
+
+def mp4_recorder_command(display: str, resolution: str, framerate: int) -> str:
+    """Shell command that records the display to MP4_PATH in the background, in place of the image's recorder"""
+    args = _capture_args(display, resolution, framerate) + ["-g", str(framerate * 10), "-y", MP4_PATH]
+    return _background(args)
+
+
+# Stops the default full-rate MP4 recorder run by supervisord, returning once ffmpeg has exited
+STOP_FFMPEG_CMD = ["/usr/bin/supervisorctl", "-c", "/etc/supervisor.d/supervisord.ini", "stop", "ffmpeg"]
+
+# Asks the recorder to finish its file and waits up to 10 seconds for it to exit
+STOP_RECORDER_CMD = (
+    f"pid=$(cat {RECORDER_PID} 2>/dev/null) || exit 0; kill -TERM $pid 2>/dev/null; "
+    "for i in $(seq 100); do kill -0 $pid 2>/dev/null || exit 0; sleep 0.1; done; kill -KILL $pid"
+)
+
+# Prints the CPU ticks used by every running x11grab recorder and the ticks per second
+RECORDER_CPU_CMD = (
+    "t=0; for p in /proc/[0-9]*; do "
+    "if tr '\\000' '\\n' < $p/cmdline 2>/dev/null | grep -qx -- x11grab; then "
+    "set -- $(cut -d')' -f2- $p/stat); t=$((t + ${12} + ${13})); fi; "
+    "done; echo $t $(getconf CLK_TCK)"
+)
+
+
+def recorder_cpu_seconds(container) -> Optional[float]:
+    """CPU seconds the container's recorder has used so far, read before it is stopped"""
+    try:
+        result = container.exec_run(["sh", "-c", RECORDER_CPU_CMD])
+        ticks, ticks_per_second = (result.output or b"").decode().split()
+        return int(ticks) / int(ticks_per_second)
+    except Exception as e:
+        print(f"Error reading recorder CPU time: {e}")
+        return None
+
+
+def playlist_entries(playlist: str) -> List[str]:
+    """File names referenced by a playlist: the init segment followed by every media segment"""
+    names = []
+    for line in playlist.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-MAP:") and 'URI="' in line:
+            names.append(line.split('URI="', 1)[1].split('"', 1)[0])
+        elif line and not line.startswith("#"):
+            names.append(line)
+    return names
+
+
+def _write_atomic(path: Path, data: bytes):
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class SegmentSyncer:
+    """
+    Copies finished HLS segments of running sessions to the host while they record.
+
+    Each pass reads the playlist in the container, copies segments it lists that
+    are not on the host yet, then replaces the host playlist, so the host playlist
+    only ever references segments that are fully copied. ffmpeg lists a segment
+    only once it is complete, and segments never change afterwards.
+    """
+
+    def __init__(self, manager, interval: float = SEGMENT_SECONDS / 2):
+        self.manager = manager
+        self.interval = interval
+        self.segments_synced = 0
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start syncing in a background thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="marinabox-segment-sync", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def _run(self):
+        while not self._closed.wait(self.interval):
+            for session in list(self.manager.sessions.values()):
+                if (
+                    session.recording_format != "hls"
+                    or session.recording == "off"
+                    or session.status != "running"
+                    or session.session_id in self.manager._stopping
+                ):
+                    continue
+                try:
+                    self.sync(session)
+                except Exception as e:
+                    print(f"Error syncing segments for {session.session_id}: {e}")
+
+    def sync(self, session, container=None) -> Path:
+        """Copy new segments of one session and update its host playlist, returning the playlist path"""
+        container = container or self.manager._container_for(session)
+        directory = self.manager.get_segments_path(session.session_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        try:
+            # Read through the archive API, which also works once the container is stopped
+            playlist = read_from_container(container, f"{HLS_DIR}/{PLAYLIST_NAME}")
+        except docker.errors.NotFound:
+            # The recorder has not written its first segment yet
+            return directory / PLAYLIST_NAME
+
+        sink = LocalFileSink(directory)
+        for name in playlist_entries(playlist.decode(errors="replace")):
+            if "/" in name or (directory / name).exists():
+                continue
+            copy_from_container(container, f"{HLS_DIR}/{name}", sink, name)
+            self.segments_synced += 1
+        _write_atomic(directory / PLAYLIST_NAME, playlist)
+        return directory / PLAYLIST_NAME
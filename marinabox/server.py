@@ -1,10 +1,11 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from .api import app as api_app
+from .api import app as api_app, lifespan as api_lifespan
 import uvicorn
 
-app = FastAPI()
+# Mounted apps do not receive lifespan events, so run the API's startup and shutdown here
+app = FastAPI(lifespan=lambda _: api_lifespan(api_app))
 
 # Mount the API under /api
 app.mount("/api", api_app)
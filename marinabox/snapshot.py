@@ -0,0 +1,74 @@
+import hashlib
+import shlex
+from typing import Optional
+
+import docker
+import requests
+
+SNAPSHOT_REPOSITORY = "marinabox/snapshot"
+DEFAULT_PROFILE_DIR = "/root/.config/chromium"
+
+# Prints the --user-data-dir argument of the first running Chrome/Chromium process
+_FIND_PROFILE_CMD = (
+    "for p in /proc/[0-9]*; do "
+    "tr '\\000' '\\n' < $p/cmdline 2>/dev/null | grep -m1 -- '--user-data-dir=' && break; "
+    "done"
+)
+
+
+def chrome_profile_dir(container) -> str:
+    """Find the user-data-dir of the browser running in a container"""
+    try:
+        result = container.exec_run(["sh", "-c", _FIND_PROFILE_CMD])
+        lines = (result.output or b"").decode(errors="replace").strip().splitlines()
+        if result.exit_code == 0 and lines:
+            return lines[0].split("=", 1)[1]
+    except Exception as e:
+        print(f"Error locating Chrome profile: {e}")
+    return DEFAULT_PROFILE_DIR
+
+
+def profile_digest(container, profile_dir: str) -> str:
+    """SHA-256 of the tar stream of a container's Chrome profile"""
+    digest = hashlib.sha256()
+    chunks, _ = container.get_archive(profile_dir)
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def current_url(debug_port: Optional[int], host: str = "127.0.0.1") -> Optional[str]:
+    """URL of the first open page, read from the CDP target list"""
+    if debug_port is None:
+        return None
+    try:
+        targets = requests.get(f"http://{host}:{debug_port}/json/list", timeout=2).json()
+    except (requests.RequestException, ValueError):
+        return None
+    for target in targets:
+        if target.get("type") == "page" and target.get("url", "").startswith(("http://", "https://")):
+            return target["url"]
+    return None
+
+
+def snapshot_container(client, container, profile_dir: Optional[str] = None) -> str:
+    """
+    Commit a container's filesystem to an image tagged with the hash of its Chrome profile.
+
+    Snapshots are cached by that hash: when an image for the same profile contents
+    already exists it is reused instead of committing again. Returns the image reference.
+    """
+    profile_dir = profile_dir or chrome_profile_dir(container)
+    tag = profile_digest(container, profile_dir)[:32]
+    image = f"{SNAPSHOT_REPOSITORY}:{tag}"
+    try:
+        client.images.get(image)
+        return image
+    except docker.errors.ImageNotFound:
+        pass
+
+    # Chrome refuses to open a profile locked by a process on another host,
+    # so drop the singleton files before the filesystem is captured
+    container.exec_run(["sh", "-c", f"rm -f {shlex.quote(profile_dir)}/Singleton*"])
+    container.commit(repository=SNAPSHOT_REPOSITORY, tag=tag, pause=True)
+    return image
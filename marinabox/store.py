@@ -0,0 +1,204 @@
+import abc
+import json
+import pickle
+import sqlite3
+import threading
+from dataclasses import fields
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from .models import BrowserSession
+
+ACTIVE_STATUSES = ("running", "paused")
+
+_DATETIME_FIELDS = {
+    "created_at", "closed_at", "last_activity_at", "paused_at", "last_viewed_at", "archived_at", "evicted_at"
+}
+_SESSION_FIELDS = {f.name for f in fields(BrowserSession)}
+
+
+def session_to_row(session: BrowserSession) -> dict:
+    """Serialize a session to a JSON-compatible dict"""
+    data = {}
+    for name in _SESSION_FIELDS:
+        value = getattr(session, name, None)
+        data[name] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
+
+def session_from_row(data: dict) -> BrowserSession:
+    """Rebuild a session from a dict produced by session_to_row, ignoring unknown keys"""
+    kwargs = {name: value for name, value in data.items() if name in _SESSION_FIELDS}
+    for name in _DATETIME_FIELDS:
+        if kwargs.get(name):
+            kwargs[name] = datetime.fromisoformat(kwargs[name])
+    return BrowserSession(**kwargs)
+
+
+class SessionStore(abc.ABC):
+    """Persistent storage for active and closed sessions"""
+
+    def put(self, session: BrowserSession):
+        self.put_many([session])
+
+    @abc.abstractmethod
+    def put_many(self, sessions: Iterable[BrowserSession]):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get(self, session_id: str) -> Optional[BrowserSession]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def list(self, active: Optional[bool] = None, limit: Optional[int] = None) -> List[BrowserSession]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def find_by_tag(self, tag: str, active: Optional[bool] = None) -> List[BrowserSession]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def has_external_changes(self) -> bool:
+        """Whether another process has written to the store since the last call"""
+        return False
+
+    def close(self):
+        pass
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store backed by SQLite in WAL mode.
+
+    Every write touches only the rows that changed, and readers in other processes
+    are not blocked by writers. The full session is kept as JSON next to indexed
+    columns for session_id, tag, status and created_at.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    container_id TEXT NOT NULL,
+                    tag TEXT,
+                    status TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    closed_at TEXT,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_tag ON sessions(tag)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions(status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions(created_at)")
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self) -> int:
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def put_many(self, sessions: Iterable[BrowserSession]):
+        rows = []
+        for session in sessions:
+            data = session_to_row(session)
+            rows.append((
+                session.session_id,
+                session.container_id,
+                session.tag,
+                session.status,
+                data["created_at"],
+                data["closed_at"],
+                json.dumps(data),
+            ))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO sessions (session_id, container_id, tag, status, created_at, closed_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    container_id = excluded.container_id,
+                    tag = excluded.tag,
+                    status = excluded.status,
+                    created_at = excluded.created_at,
+                    closed_at = excluded.closed_at,
+                    data = excluded.data
+                """,
+                rows,
+            )
+
+    def _query(self, sql: str, params: tuple = ()) -> List[BrowserSession]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [session_from_row(json.loads(row[0])) for row in rows]
+
+    def _status_clause(self, active: Optional[bool]) -> tuple[str, tuple]:
+        if active is None:
+            return "", ()
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        operator = "IN" if active else "NOT IN"
+        return f" AND status {operator} ({placeholders})", ACTIVE_STATUSES
+
+    def get(self, session_id: str) -> Optional[BrowserSession]:
+        sessions = self._query("SELECT data FROM sessions WHERE session_id = ?", (session_id,))
+        return sessions[0] if sessions else None
+
+    def list(self, active: Optional[bool] = None, limit: Optional[int] = None) -> List[BrowserSession]:
+        clause, params = self._status_clause(active)
+        sql = f"SELECT data FROM sessions WHERE 1 = 1{clause} ORDER BY created_at"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = params + (limit,)
+        return self._query(sql, params)
+
+    def find_by_tag(self, tag: str, active: Optional[bool] = None) -> List[BrowserSession]:
+        clause, params = self._status_clause(active)
+        return self._query(f"SELECT data FROM sessions WHERE tag = ?{clause} ORDER BY created_at", (tag,) + params)
+
+    def delete(self, session_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def has_external_changes(self) -> bool:
+        data_version = self._read_data_version()
+        changed = data_version != self._data_version
+        self._data_version = data_version
+        return changed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_pickles(store: SessionStore, *pickle_paths: Path) -> int:
+    """
+    One-time import of the legacy sessions.pkl / closed_sessions.pkl files.
+
+    Each imported file is renamed to <name>.migrated so it is not imported again.
+    Returns the number of sessions imported.
+    """
+    imported = 0
+    for path in pickle_paths:
+        path = Path(path)
+        if not path.exists():
+            continue
+        try:
+            with open(path, 'rb') as f:
+                sessions = pickle.load(f)
+            store.put_many(sessions.values())
+            imported += len(sessions)
+            path.rename(path.with_name(path.name + ".migrated"))
+        except Exception as e:
+            print(f"Error migrating {path}: {e}")
+    return imported
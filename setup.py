@@ -7,6 +7,7 @@ setup(
     install_requires=[
         "docker",
         "requests",
+        "httpx",
         "fastapi",
         "uvicorn",
         "click",
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("samthropic")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from marinabox.api import app  # noqa: E402
+from marinabox.inputqueue import InputQueue  # noqa: E402
+
+
+def test_read_input_of_unknown_session_is_404(tmp_path):
+    queue = InputQueue(tmp_path / "input.db")
+    app.state.executor = ThreadPoolExecutor(max_workers=2)
+    app.state.manager = SimpleNamespace(
+        get_session=lambda session_id: SimpleNamespace() if session_id == "abc" else None,
+        input_queue=queue
+    )
+    queue.enqueue("abc", "hello")
+    client = TestClient(app)
+
+    missing = client.get("/sessions/typo/input", params={"timeout": 300})
+    found = client.get("/sessions/abc/input", params={"timeout": 0})
+    queue.close()
+    app.state.executor.shutdown()
+
+    assert missing.status_code == 404
+    assert found.json()["body"] == "hello"
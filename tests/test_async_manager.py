@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timezone
+
+from marinabox.async_docker import AsyncDockerError
+from marinabox import async_manager
+from marinabox.async_manager import AsyncLocalContainerManager
+from marinabox.models import BrowserSession
+from marinabox.readiness import ReadinessResult
+from marinabox.store import SQLiteSessionStore
+
+
+class FakeAsyncDocker:
+    def __init__(self, container_ids):
+        self.container_ids = container_ids
+
+    async def list_containers(self):
+        return [{"Id": container_id} for container_id in self.container_ids]
+
+    async def close(self):
+        pass
+
+
+def make_session(session_id, docker_host, port):
+    return BrowserSession(
+        session_id=session_id,
+        container_id=f"{session_id}-container",
+        vnc_port=port,
+        computer_use_port=port + 1,
+        created_at=datetime.now(timezone.utc),
+        env_type="desktop",
+        docker_host=docker_host
+    )
+
+
+def test_reconcile_leaves_sessions_on_other_hosts_alone(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    store = SQLiteSessionStore(tmp_path / "sessions.db")
+    sessions = [
+        make_session("live", None, 5000),
+        make_session("gone", "local", 5010),
+        make_session("remote", "box2", 5020),
+    ]
+    store.put_many(sessions)
+
+    async def reconcile():
+        manager = AsyncLocalContainerManager(session_store=store)
+        manager.docker = FakeAsyncDocker({"live-container"})
+        with manager.port_allocator._locked_state() as state:
+            for session in sessions:
+                for port_class, port in (("vnc", session.vnc_port), ("computer_use", session.computer_use_port)):
+                    state["reserved"][str(port)] = {"class": port_class, "owner": session.session_id}
+        await manager.reconcile()
+        reserved = manager.port_allocator.reserved()
+        await manager.close()
+        return manager, reserved
+
+    manager, reserved = asyncio.run(reconcile())
+
+    assert set(manager.sessions) == {"live", "remote"}
+    assert store.get("gone").status == "stale"
+    assert store.get("remote").status == "running"
+    assert reserved == {5000: "live", 5001: "live", 5020: "remote", 5021: "remote"}
+    store.close()
+
+
+def test_launch_retries_on_ports_taken_on_remote_host(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    bindings = []
+
+    class ConflictingDocker(FakeAsyncDocker):
+        async def run_container(self, image, ports=None, **kwargs):
+            bindings.append(ports)
+            if len(bindings) == 1:
+                raise AsyncDockerError(500, "Bind for 0.0.0.0:5002 failed: port is already allocated")
+            return "new-container"
+
+    async def launch():
+        manager = AsyncLocalContainerManager(docker_url="tcp://box2:2375", docker_host="box2")
+        await manager.docker.close()
+        manager.docker = ConflictingDocker(set())
+        monkeypatch.setattr(
+            manager, "_wait_until_ready",
+            lambda *args: asyncio.sleep(0, ReadinessResult(True))
+        )
+        ports = (await manager._reserve_ports("desktop"))[0]
+        session = await manager._launch_session("desktop", "1280x800x24", None, {}, False, None, ports)
+        reserved = manager.port_allocator.reserved()
+        await manager.close()
+        return manager, ports, session, reserved
+
+    manager, ports, session, reserved = asyncio.run(launch())
+
+    assert not manager.port_allocator.probe
+    assert len(bindings) == 2
+    assert (session.vnc_port, session.computer_use_port) != ports[1:]
+    assert set(reserved) == {session.vnc_port, session.computer_use_port}
+    assert session.host == "box2"
+
+
+def test_readiness_probes_remote_daemon_address(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    probed = {}
+
+    async def fake_wait_until_ready(env_type, **kwargs):
+        probed.update(kwargs)
+        return ReadinessResult(True)
+
+    monkeypatch.setattr(async_manager, "async_wait_until_ready", fake_wait_until_ready)
+
+    async def wait():
+        manager = AsyncLocalContainerManager(docker_url="tcp://10.0.0.7:2375", docker_host="box2")
+        await manager._wait_until_ready("desktop", None, 5000, 5001)
+        await manager.close()
+
+    asyncio.run(wait())
+
+    assert probed["host"] == "10.0.0.7"
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from marinabox.computer_use_v2 import Computer
+
+
+class FakeManager:
+    def __init__(self):
+        self.activity = []
+
+    def record_activity(self, session_id):
+        self.activity.append(session_id)
+        return SimpleNamespace(session_id=session_id)
+
+
+class FakeSDK:
+    def __init__(self):
+        self.manager = FakeManager()
+
+    def get_session_by_identifier(self, identifier):
+        return SimpleNamespace(session_id="abc", computer_use_port=8002, get_host=lambda: "localhost")
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"status": "success", "x": 1, "y": 2}
+
+
+def test_requests_record_activity_on_the_session(monkeypatch):
+    sdk = FakeSDK()
+    computer = Computer.from_session("my-tag", sdk=sdk)
+    monkeypatch.setattr(computer._http, "get", lambda url, timeout: FakeResponse())
+    monkeypatch.setattr(computer._http, "post", lambda url, json, timeout: FakeResponse())
+
+    computer.mouse_position()
+    assert computer.left_click(1, 2)
+
+    assert sdk.manager.activity == ["abc", "abc"]
+    assert computer.base_url == "http://localhost:8002"
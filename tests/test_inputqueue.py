@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from marinabox.inputqueue import InputQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = InputQueue(tmp_path / "input.db")
+    yield queue
+    queue.close()
+
+
+def test_messages_are_delivered_in_order_per_session(queue):
+    queue.enqueue("a", "first")
+    queue.enqueue("b", "other")
+    queue.enqueue("a", "second")
+
+    assert queue.claim("a")["body"] == "first"
+    assert queue.claim("a")["body"] == "second"
+    assert queue.claim("a") is None
+    assert queue.claim("b")["body"] == "other"
+
+
+def test_unacknowledged_message_is_redelivered_after_visibility_timeout(queue):
+    queue.enqueue("a", "hello")
+
+    first = queue.claim("a", visibility_timeout=0.2)
+    assert queue.claim("a") is None
+    time.sleep(0.25)
+    second = queue.claim("a")
+
+    assert second["id"] == first["id"]
+    assert (first["attempts"], second["attempts"]) == (1, 2)
+
+
+def test_acknowledged_message_is_gone(queue):
+    message = queue.enqueue("a", "hello")
+    assert not queue.ack("a", message["id"])  # Not delivered yet
+
+    claimed = queue.claim("a", visibility_timeout=0.1)
+    assert not queue.ack("b", claimed["id"])
+    assert queue.ack("a", claimed["id"])
+    time.sleep(0.15)
+
+    assert queue.claim("a") is None
+    assert queue.pending("a") == []
+
+
+def test_release_makes_a_message_visible_again(queue):
+    queue.enqueue("a", "hello")
+    claimed = queue.claim("a")
+
+    assert queue.release("a", claimed["id"])
+    assert queue.claim("a")["id"] == claimed["id"]
+
+
+def test_dequeue_wakes_on_enqueue(queue):
+    timer = threading.Timer(0.1, queue.enqueue, args=("a", "late"))
+    timer.start()
+    started = time.monotonic()
+
+    message = queue.dequeue("a", timeout=5)
+
+    assert message["body"] == "late"
+    assert time.monotonic() - started < 1
+    assert queue.dequeue("a", timeout=0.1) is None
+
+
+def test_dequeue_async_wakes_on_enqueue(queue):
+    async def consume():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.1, queue.enqueue, "a", "late")
+        return await queue.dequeue_async("a", timeout=5)
+
+    started = time.monotonic()
+    message = asyncio.run(consume())
+
+    assert message["body"] == "late"
+    assert time.monotonic() - started < 1
+
+
+def test_purge_and_persistence(tmp_path, queue):
+    queue.enqueue("a", "kept")
+    queue.enqueue("b", "purged")
+    queue.purge("b")
+
+    reopened = InputQueue(tmp_path / "input.db")
+    assert [m["body"] for m in reopened.pending("a")] == ["kept"]
+    assert reopened.pending("b") == []
+    reopened.close()
@@ -0,0 +1,68 @@
+import pytest
+
+from marinabox import lineindex
+from marinabox.lineindex import LineIndex
+
+
+@pytest.fixture(autouse=True)
+def small_interval(monkeypatch):
+    # Several checkpoints without writing thousands of lines
+    monkeypatch.setattr(lineindex, "INDEX_INTERVAL", 4)
+
+
+def write_lines(path, start, stop, mode="a"):
+    with open(path, mode) as f:
+        f.write("".join(f"line {i}\n" for i in range(start, stop)))
+
+
+def test_offset_pages(tmp_path):
+    log = tmp_path / "console.txt"
+    write_lines(log, 0, 10)
+
+    assert LineIndex(log).read(offset=5, limit=3) == (["line 5\n", "line 6\n", "line 7\n"], 5, 8, 10)
+    assert LineIndex(log).read(offset=8) == (["line 8\n", "line 9\n"], 8, 10, 10)
+    assert LineIndex(log).read(offset=50) == ([], 10, 10, 10)
+
+
+def test_tail_pages(tmp_path):
+    log = tmp_path / "console.txt"
+    write_lines(log, 0, 10)
+
+    assert LineIndex(log).read(tail=2) == (["line 8\n", "line 9\n"], 8, 10, 10)
+    assert LineIndex(log).read(tail=20)[1] == 0
+
+
+def test_partial_last_line_is_not_returned(tmp_path):
+    log = tmp_path / "console.txt"
+    write_lines(log, 0, 3)
+    with open(log, "a") as f:
+        f.write("still writ")
+
+    lines, _, end, total = LineIndex(log).read()
+
+    assert lines[-1] == "line 2\n"
+    assert (end, total) == (3, 3)
+
+
+def test_index_is_extended_and_rebuilt(tmp_path):
+    log = tmp_path / "console.txt"
+    write_lines(log, 0, 10)
+    LineIndex(log).read()
+    assert (tmp_path / "console.txt.idx").exists()
+
+    write_lines(log, 10, 13)
+    assert LineIndex(log).read(offset=11) == (["line 11\n", "line 12\n"], 11, 13, 13)
+
+    # A truncated and rewritten log must not be read through the old checkpoints
+    write_lines(log, 100, 106, mode="w")
+    assert LineIndex(log).read(offset=4) == (["line 104\n", "line 105\n"], 4, 6, 6)
+
+
+def test_lines_split_on_newlines_only(tmp_path):
+    log = tmp_path / "console.txt"
+    log.write_bytes(b"a\rb\x0cc\nd\n")
+
+    lines, _, _, total = LineIndex(log).read()
+
+    assert lines == ["a\rb\x0cc\n", "d\n"]
+    assert total == 2
@@ -0,0 +1,31 @@
+from click.testing import CliRunner
+
+from marinabox import local_cli
+
+
+class FakeManager:
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.closed = False
+        FakeManager.instances.append(self)
+
+    def list_sessions(self):
+        return []
+
+    def stop_session(self, session_id, video_filename=None):
+        return False
+
+    def close(self):
+        self.closed = True
+
+
+def test_commands_close_the_manager(monkeypatch):
+    monkeypatch.setattr(local_cli, "LocalContainerManager", FakeManager)
+    runner = CliRunner()
+
+    runner.invoke(local_cli.local, ["list"], catch_exceptions=False)
+    runner.invoke(local_cli.local, ["stop", "abc"], catch_exceptions=False)
+
+    assert len(FakeManager.instances) == 2
+    assert all(manager.closed for manager in FakeManager.instances)
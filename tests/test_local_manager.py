@@ -0,0 +1,139 @@
+import io
+import tarfile
+import types
+from datetime import datetime, timezone
+
+import docker
+import pytest
+
+import marinabox.local_manager as local_manager
+from marinabox.local_manager import LocalContainerManager
+from marinabox.models import BrowserSession
+from marinabox.placement import DockerHost
+from marinabox.readiness import ReadinessResult
+from marinabox.store import SQLiteSessionStore
+
+
+class FakeContainer:
+    def __init__(self, container_id):
+        self.id = container_id
+        self.status = "running"
+
+    def _check_running(self):
+        if self.status == "paused":
+            raise docker.errors.APIError(f"Container {self.id} is paused, unpause the container before exec")
+
+    def exec_run(self, cmd, **kwargs):
+        self._check_running()
+        return types.SimpleNamespace(exit_code=0, output=b"--user-data-dir=/root/.config/chromium\n")
+
+    def get_archive(self, path, **kwargs):
+        self._check_running()
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            info = tarfile.TarInfo("Preferences")
+            info.size = 2
+            tar.addfile(info, io.BytesIO(b"{}"))
+        return iter([buffer.getvalue()]), {}
+
+    def commit(self, **kwargs):
+        self._check_running()
+
+    def pause(self):
+        self.status = "paused"
+
+    def unpause(self):
+        self.status = "running"
+
+
+class FakeClient:
+    def __init__(self):
+        self.container = FakeContainer("c" * 64)
+        self.containers = types.SimpleNamespace(get=lambda container_id: self.container, list=lambda **kwargs: [self.container])
+        self.images = types.SimpleNamespace(get=self._missing_image)
+
+    @staticmethod
+    def _missing_image(name):
+        raise docker.errors.ImageNotFound(name)
+
+    def info(self):
+        return {"NCPU": 8, "MemTotal": 16 * 2 ** 30}
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    client = FakeClient()
+    manager = LocalContainerManager(
+        docker_hosts=[DockerHost("local", client=client)],
+        session_store=SQLiteSessionStore(tmp_path / "sessions.db"),
+        reconcile=False,
+        previews=False
+    )
+    session = BrowserSession(
+        session_id="source",
+        container_id=client.container.id,
+        vnc_port=5002,
+        computer_use_port=8002,
+        debug_port=4002,
+        created_at=datetime.now(timezone.utc),
+        env_type="browser",
+        docker_host="local"
+    )
+    manager.sessions[session.session_id] = session
+    manager.store.put(session)
+    yield manager, client.container
+    manager.close()
+    manager.store.close()
+
+
+def test_clone_paused_session_thaws_and_refreezes_source(manager, monkeypatch):
+    manager, container = manager
+    assert manager.pause_session("source")
+
+    states = {}
+    monkeypatch.setattr(local_manager, "current_url", lambda *args: states.setdefault("url", container.status))
+    launched = {}
+
+    def launch_batch(*args, **kwargs):
+        launched.update(kwargs)
+        return []
+
+    monkeypatch.setattr(manager, "_launch_batch", launch_batch)
+
+    assert manager.clone_session("source") == []
+    assert states["url"] == "running"
+    assert launched["image"].startswith("marinabox/snapshot:")
+    assert container.status == "paused"
+    assert manager.get_session("source").status == "paused"
+
+
+def test_snapshot_paused_session(manager):
+    manager, container = manager
+    assert manager.pause_session("source")
+
+    assert manager.snapshot_session("source")
+    assert container.status == "paused"
+
+
+def test_launch_retries_with_fresh_ports_on_port_conflict(manager, monkeypatch):
+    manager, container = manager
+    attempts = []
+
+    def run_container(env_type, resolution, ports, **kwargs):
+        attempts.append(ports)
+        if len(attempts) == 1:
+            raise docker.errors.APIError("Bind for 0.0.0.0:5002 failed: port is already allocated")
+        return container
+
+    monkeypatch.setattr(manager, "_run_container", run_container)
+    monkeypatch.setattr(manager, "_wait_until_ready", lambda *args: ReadinessResult(True))
+    ports = manager._reserve_ports("desktop")[0]
+
+    session = manager._launch_session("desktop", "1280x800x24", None, {}, False, None, ports)
+
+    assert len(attempts) == 2
+    assert (session.vnc_port, session.computer_use_port) == attempts[1][1:]
+    assert attempts[1] != ports
+    assert ports[1] not in manager.port_allocator.reserved()
@@ -0,0 +1,29 @@
+from marinabox.logstore import StructuredLogWriter
+
+
+def test_overflow_drops_the_oldest_records(tmp_path):
+    writer = StructuredLogWriter(tmp_path, max_buffered=3, flush_interval=60)
+    for i in range(5):
+        writer.log("abc", f"line {i}")
+
+    stats = writer.stats()
+    writer.flush()
+    messages = [record["message"] for record in writer.search(session_id="abc")]
+    writer.close()
+
+    assert stats["dropped"] == 2
+    assert stats["buffered"] == 3
+    assert messages == ["line 4", "line 3", "line 2"]
+
+
+def test_search_matches_messages(tmp_path):
+    writer = StructuredLogWriter(tmp_path)
+    writer.log("abc", "click timed out", level="error")
+    writer.log("abc", "page loaded")
+    writer.log("def", "click timed out")
+    writer.flush()
+
+    found = writer.search(query="timed", session_id="abc")
+    writer.close()
+
+    assert [(r["session_id"], r["level"]) for r in found] == [("abc", "error")]
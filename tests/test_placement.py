@@ -0,0 +1,50 @@
+from collections import Counter
+
+from marinabox.admission import DEFAULT_RESOURCE_PROFILES
+from marinabox.placement import DockerHost, Placement
+
+
+class FakeClient:
+    def __init__(self, cpus, running=0):
+        self.cpus = cpus
+        self.containers = self
+        self.running = running
+
+    def info(self):
+        return {"NCPU": self.cpus, "MemTotal": 64 * 1024 ** 3}
+
+    def list(self):
+        return [object()] * self.running
+
+
+def test_concurrent_starts_spread_over_hosts():
+    placement = Placement(
+        [DockerHost("box1", client=FakeClient(8)), DockerHost("box2", client=FakeClient(8))],
+        DEFAULT_RESOURCE_PROFILES
+    )
+
+    # Nothing is released, as when a batch is still starting
+    chosen = Counter(placement.choose({}, env_type="browser").name for _ in range(6))
+
+    assert chosen == {"box1": 3, "box2": 3}
+    assert placement.stats()["box1"]["starting"] == 3
+
+
+def test_starting_containers_count_against_capacity():
+    placement = Placement(
+        [DockerHost("big", client=FakeClient(16)), DockerHost("small", client=FakeClient(4))],
+        DEFAULT_RESOURCE_PROFILES
+    )
+
+    chosen = Counter(placement.choose({}, env_type="desktop").name for _ in range(5))
+
+    assert chosen == {"big": 4, "small": 1}
+
+
+def test_release_frees_the_starting_slot():
+    placement = Placement([DockerHost("box1", client=FakeClient(8))], DEFAULT_RESOURCE_PROFILES)
+    host = placement.choose({}, env_type="desktop")
+
+    placement.release(host, "desktop")
+
+    assert placement.stats()["box1"]["starting"] == 0
@@ -0,0 +1,83 @@
+import multiprocessing
+import socket
+
+import docker
+
+from marinabox.ports import PortAllocator, is_port_conflict
+
+BASES = {"debug": 14000, "vnc": 15000, "computer_use": 18000}
+
+
+def make_allocator(tmp_path, **kwargs):
+    return PortAllocator(tmp_path / "ports.json", bases=BASES, **kwargs)
+
+
+def test_released_ports_are_reused_before_new_ones(tmp_path):
+    allocator = make_allocator(tmp_path, probe=False)
+    first, second = allocator.allocate("browser", "a", count=2)
+    assert first == (14000, 15000, 18000)
+    assert second == (14002, 15002, 18002)
+
+    allocator.release(first)
+
+    assert allocator.allocate("browser", "b") == [first]
+    assert allocator.allocate("desktop", "c") == [(None, 15004, 18004)]
+
+
+def test_busy_ports_are_handed_out_last(tmp_path):
+    allocator = make_allocator(tmp_path, probe=False)
+    busy, other = allocator.allocate("desktop", "a", count=2)
+
+    allocator.release(busy, busy=True)
+    allocator.release(other)
+
+    assert allocator.allocate("desktop", "b", count=2) == [other, busy]
+
+
+def test_reservations_are_shared_through_the_state_file(tmp_path):
+    make_allocator(tmp_path, probe=False).allocate("desktop", "session-1")
+
+    allocator = make_allocator(tmp_path, probe=False)
+    allocator.assign((None, 15000, 18000), "session-2")
+
+    assert allocator.reserved() == {15000: "session-2", 18000: "session-2"}
+    assert allocator.release_owners(lambda owner: owner == "session-2") == 2
+    assert allocator.reserved() == {}
+
+
+def test_probe_skips_ports_held_on_this_machine(tmp_path):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as held:
+        held.bind(("0.0.0.0", BASES["vnc"]))
+        probed = make_allocator(tmp_path / "probed").allocate("desktop", "a")
+        unprobed = make_allocator(tmp_path / "unprobed", probe=False).allocate("desktop", "a")
+
+    assert probed[0][1] == BASES["vnc"] + 2
+    assert unprobed[0][1] == BASES["vnc"]
+
+
+def _allocate_in_process(state_dir, results):
+    allocator = PortAllocator(state_dir / "ports.json", bases=BASES, probe=False)
+    results.extend(allocator.allocate("browser", f"pid-{multiprocessing.current_process().pid}", count=10))
+
+
+def test_processes_never_share_a_port(tmp_path):
+    context = multiprocessing.get_context("fork")
+    with context.Manager() as process_manager:
+        results = process_manager.list()
+        processes = [context.Process(target=_allocate_in_process, args=(tmp_path, results)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        allocations = list(results)
+
+    ports = [port for triple in allocations for port in triple]
+    assert len(allocations) == 40
+    assert len(set(ports)) == len(ports)
+    assert len(make_allocator(tmp_path).reserved()) == 120
+
+
+def test_is_port_conflict():
+    assert is_port_conflict(docker.errors.APIError("Bind for 0.0.0.0:5002 failed: port is already allocated"))
+    assert is_port_conflict(Exception("listen tcp4 0.0.0.0:8002: bind: Address already in use"))
+    assert not is_port_conflict(docker.errors.APIError("No such image: marinabox/marinabox-browser"))
@@ -0,0 +1,37 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from marinabox.preview import PreviewBuilder
+
+
+def test_concurrent_submits_start_one_consumer(monkeypatch):
+    builder = PreviewBuilder(manager=None, ffmpeg="ffmpeg", ffprobe="ffprobe")
+    built = []
+    monkeypatch.setattr(builder, "build", built.append)
+    started = []
+    real_thread = threading.Thread
+
+    def counting_thread(*args, **kwargs):
+        started.append(kwargs.get("name"))
+        # Widen the window between the check and the start
+        time.sleep(0.05)
+        return real_thread(*args, **kwargs)
+
+    monkeypatch.setattr(threading, "Thread", counting_thread)
+    barrier = threading.Barrier(8)
+
+    def submit(i):
+        barrier.wait()
+        builder.submit(SimpleNamespace(session_id=str(i), video_path="video.mp4"))
+
+    workers = [real_thread(target=submit, args=(i,)) for i in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    builder.close()
+
+    assert started == ["marinabox-previews"]
+    assert sorted(built) == [str(i) for i in range(8)]
+    assert not builder._thread.is_alive()
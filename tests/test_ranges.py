@@ -0,0 +1,86 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from marinabox.ranges import MAX_RANGES, RangeFileResponse, RangeNotSatisfiable, parse_range
+
+DATA = bytes(range(256)) * 4
+
+
+def test_parse_single_and_open_ended_ranges():
+    assert parse_range("bytes=0-99", 1000) == [(0, 99)]
+    assert parse_range("bytes=900-", 1000) == [(900, 999)]
+    assert parse_range("bytes=900-5000", 1000) == [(900, 999)]
+
+
+def test_parse_suffix_ranges():
+    assert parse_range("bytes=-100", 1000) == [(900, 999)]
+    assert parse_range("bytes=-5000", 1000) == [(0, 999)]
+
+
+def test_parse_merges_overlapping_and_adjacent_ranges():
+    assert parse_range("bytes=500-599,0-99,100-199,550-650", 1000) == [(0, 199), (500, 650)]
+
+
+def test_parse_ignores_malformed_headers():
+    assert parse_range("items=0-10", 1000) is None
+    assert parse_range("bytes=abc-10", 1000) is None
+    assert parse_range("bytes=20-10", 1000) is None
+    assert parse_range("bytes=5", 1000) is None
+    many = ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(MAX_RANGES + 1))
+    assert parse_range(f"bytes={many}", 1000) is None
+
+
+def test_parse_rejects_ranges_past_the_end():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=1000-", 1000)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=-0", 1000)
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(DATA)
+    app = Starlette(routes=[Route("/video", lambda request: RangeFileResponse(path, "video/mp4"))])
+    return TestClient(app)
+
+
+def test_single_range_response(client):
+    response = client.get("/video", headers={"Range": "bytes=10-19"})
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 10-19/{len(DATA)}"
+    assert response.content == DATA[10:20]
+
+
+def test_multipart_range_response(client):
+    response = client.get("/video", headers={"Range": "bytes=0-3,-4"})
+
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1].encode()
+    assert int(response.headers["content-length"]) == len(response.content)
+    parts = response.content.split(b"--" + boundary)
+    assert parts[-1] == b"--\r\n"
+    assert parts[1].endswith(b"\r\n\r\n" + DATA[:4] + b"\r\n")
+    assert f"Content-Range: bytes {len(DATA) - 4}-{len(DATA) - 1}/{len(DATA)}".encode() in parts[2]
+    assert parts[2].endswith(b"\r\n\r\n" + DATA[-4:] + b"\r\n")
+
+
+def test_unsatisfiable_range_is_416(client):
+    response = client.get("/video", headers={"Range": f"bytes={len(DATA)}-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+
+
+def test_conditional_requests(client):
+    etag = client.get("/video").headers["etag"]
+
+    assert client.get("/video", headers={"If-None-Match": etag}).status_code == 304
+    stale = client.get("/video", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == DATA
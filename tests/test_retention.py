@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from marinabox.models import BrowserSession
+from marinabox.recording import LocalFileSink
+from marinabox.retention import RetentionManager
+from marinabox.store import SQLiteSessionStore
+
+
+def closed_session(session_id, video_path, export_status, age=0):
+    closed_at = datetime.now(timezone.utc) - timedelta(seconds=age)
+    return BrowserSession(
+        session_id=session_id,
+        container_id=f"{session_id}-container",
+        vnc_port=5000,
+        computer_use_port=5001,
+        created_at=closed_at,
+        closed_at=closed_at,
+        env_type="browser",
+        status="stopped",
+        video_path=str(video_path),
+        export_status=export_status
+    )
+
+
+def test_missing_recordings_are_forgotten_without_eviction(tmp_path):
+    store = SQLiteSessionStore(tmp_path / "sessions.db")
+    old = tmp_path / "old.mp4"
+    old.write_bytes(b"video")
+    store.put_many([
+        closed_session("failed", tmp_path / "failed.mp4", "failed"),
+        closed_session("copying", tmp_path / "copying.mp4", "copying"),
+        closed_session("deleted", tmp_path / "deleted.mp4", "done"),
+        closed_session("old", old, "done", age=7200),
+    ])
+    manager = SimpleNamespace(store=store, video_sink=LocalFileSink(tmp_path), previews=None)
+
+    RetentionManager(manager, max_age=3600).enforce()
+
+    assert store.get("failed").video_path == str(tmp_path / "failed.mp4")
+    assert store.get("copying").video_path == str(tmp_path / "copying.mp4")
+    deleted = store.get("deleted")
+    assert deleted.video_path is None and deleted.evicted_at is None
+    evicted = store.get("old")
+    assert evicted.video_path is None and evicted.evicted_at is not None
+    assert not old.exists()
+    store.close()
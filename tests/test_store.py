@@ -0,0 +1,111 @@
+import pickle
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from marinabox.models import BrowserSession
+from marinabox.store import SessionStore, SQLiteSessionStore, migrate_pickles
+
+
+def make_session(session_id, tag=None, status="running", minutes=0):
+    return BrowserSession(
+        session_id=session_id,
+        container_id=f"{session_id}-container",
+        vnc_port=5000,
+        computer_use_port=5001,
+        created_at=datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=minutes),
+        env_type="browser",
+        tag=tag,
+        status=status
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteSessionStore(tmp_path / "sessions.db")
+    yield store
+    store.close()
+
+
+def test_round_trip_keeps_datetimes(store):
+    session = make_session("a")
+    session.closed_at = datetime(2026, 1, 2, tzinfo=timezone.utc)
+    store.put(session)
+
+    loaded = store.get("a")
+
+    assert loaded == session
+    assert store.get("missing") is None
+
+
+def test_find_by_tag_filters_on_status(store):
+    store.put_many([
+        make_session("a", tag="crawl", minutes=2),
+        make_session("b", tag="crawl", status="paused", minutes=1),
+        make_session("c", tag="crawl", status="stopped"),
+        make_session("d", tag="other"),
+    ])
+
+    assert [s.session_id for s in store.find_by_tag("crawl")] == ["c", "b", "a"]
+    assert [s.session_id for s in store.find_by_tag("crawl", active=True)] == ["b", "a"]
+    assert [s.session_id for s in store.find_by_tag("crawl", active=False)] == ["c"]
+
+
+def test_retagging_moves_the_session_between_tags(store):
+    session = make_session("a", tag="old")
+    store.put(session)
+    session.tag = "new"
+    store.put(session)
+
+    assert store.find_by_tag("old") == []
+    assert [s.session_id for s in store.find_by_tag("new")] == ["a"]
+
+
+def test_list_and_delete(store):
+    store.put_many([make_session("a", minutes=1), make_session("b", status="stopped")])
+
+    assert [s.session_id for s in store.list()] == ["b", "a"]
+    assert [s.session_id for s in store.list(active=True)] == ["a"]
+    assert [s.session_id for s in store.list(limit=1)] == ["b"]
+    store.delete("a")
+    assert store.get("a") is None
+
+
+def test_writes_from_another_connection_are_noticed(tmp_path, store):
+    assert not store.has_external_changes()
+    other = SQLiteSessionStore(tmp_path / "sessions.db")
+    other.put(make_session("a"))
+    other.close()
+
+    assert store.has_external_changes()
+    assert not store.has_external_changes()
+
+
+def test_migrate_pickles_imports_once(tmp_path, store):
+    active = tmp_path / "sessions.pkl"
+    closed = tmp_path / "closed_sessions.pkl"
+    active.write_bytes(pickle.dumps({"a": make_session("a")}))
+    closed.write_bytes(pickle.dumps({"b": make_session("b", status="stopped")}))
+
+    assert migrate_pickles(store, active, closed, tmp_path / "missing.pkl") == 2
+    assert migrate_pickles(store, active, closed) == 0
+    assert {s.session_id for s in store.list()} == {"a", "b"}
+    assert (tmp_path / "sessions.pkl.migrated").exists()
+    assert not active.exists()
+
+
+def test_corrupt_pickle_is_left_in_place(tmp_path, store):
+    path = tmp_path / "sessions.pkl"
+    path.write_bytes(b"not a pickle")
+
+    assert migrate_pickles(store, path) == 0
+    assert path.exists()
+
+
+def test_store_requires_the_abstract_methods():
+    class Incomplete(SessionStore):
+        def get(self, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()